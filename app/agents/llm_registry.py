@@ -0,0 +1,231 @@
+import asyncio
+import importlib.util
+import math
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+
+import httpx
+
+from app.core.config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    MODEL_NAME,
+    LLM_TIMEOUT_SECONDS,
+    LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
+    LLM_KEEPALIVE_SECONDS,
+    LLM_HTTP2,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_QUANTILE,
+    LLM_HEDGE_MIN_DELAY_SECONDS,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_LATENCY_WINDOW,
+    PHASE_MODELS,
+)
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+_lock = threading.Lock()
+_models: dict[tuple[str, float], "ChatOpenAI"] = {}
+_http_clients: tuple[httpx.Client, httpx.AsyncClient] | None = None
+# Um semaforo por event loop: asyncio.Semaphore fica preso ao loop em uso
+_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _http2_available() -> bool:
+    return LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _get_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    """Clientes HTTP compartilhados pelo processo (pool + keep-alive)."""
+    global _http_clients
+    if _http_clients is None:
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+        )
+        timeout = httpx.Timeout(
+            LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS, pool=None
+        )
+        http2 = _http2_available()
+        _http_clients = (
+            httpx.Client(limits=limits, timeout=timeout, http2=http2),
+            httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2),
+        )
+    return _http_clients
+
+
+def get_llm(
+    model: str | None = None, temperature: float = 0.3
+) -> "ChatOpenAI":
+    """Retorna o ChatOpenAI do registro, criando-o apenas na primeira vez.
+
+    Todas as instancias compartilham o mesmo pool de conexoes HTTP, entao
+    chamadas consecutivas reaproveitam conexoes TLS ja abertas.
+    """
+    key = (model or MODEL_NAME, temperature)
+    llm = _models.get(key)
+    if llm is not None:
+        return llm
+    with _lock:
+        if key not in _models:
+            # import adiado: langchain_openai/openai levam ~0.8s
+            from langchain_openai import ChatOpenAI
+
+            sync_client, async_client = _get_http_clients()
+            _models[key] = ChatOpenAI(
+                model=key[0],
+                api_key=OPENAI_API_KEY,
+                base_url=OPENAI_BASE_URL,
+                temperature=temperature,
+                timeout=LLM_TIMEOUT_SECONDS,
+                max_retries=LLM_MAX_RETRIES,
+                # usage_metadata tambem no streaming (tokens em cache)
+                stream_usage=True,
+                http_client=sync_client,
+                http_async_client=async_client,
+            )
+        return _models[key]
+
+
+def phase_models(phase: str) -> list[str]:
+    """Cadeia de modelos da fase: o primeiro e o principal, os demais fallback."""
+    return PHASE_MODELS.get(phase) or [MODEL_NAME]
+
+
+class LatencyStats:
+    """Janela movel das ultimas latencias por (fase, modelo, tipo)."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: dict[tuple, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: tuple, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, key: tuple, q: float) -> float | None:
+        """Quantil das amostras; None com menos de LLM_HEDGE_MIN_SAMPLES."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+
+latency_stats = LatencyStats(LLM_LATENCY_WINDOW)
+
+
+def record_latency(phase: str, model: str, kind: str, seconds: float):
+    """kind: "total" (chamada inteira) ou "ttft" (ate o primeiro token)."""
+    latency_stats.record((phase, model, kind), seconds)
+
+
+def hedge_delay(phase: str, model: str, kind: str) -> float | None:
+    """Quanto esperar antes de duplicar a chamada; None = nao duplicar."""
+    if not LLM_HEDGE_ENABLED:
+        return None
+    threshold = latency_stats.quantile((phase, model, kind), LLM_HEDGE_QUANTILE)
+    if threshold is None:
+        return None
+    return max(threshold, LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Limita as chamadas simultaneas ao provedor a LLM_MAX_CONCURRENCY."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores.setdefault(
+            loop, asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        )
+    async with semaphore:
+        yield
+
+
+class TokenBucket:
+    """Balde de tokens por minuto, reabastecido continuamente.
+
+    So usa asyncio.sleep, entao serve a qualquer event loop. A reserva e
+    feita com a estimativa do prompt + resposta e acertada depois com o
+    uso real; o saldo pode ficar negativo e atrasa as proximas chamadas.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.capacity / 60,
+        )
+        self.updated = now
+
+    async def acquire(self, tokens: int) -> int:
+        tokens = min(tokens, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return tokens
+            await asyncio.sleep((tokens - self.tokens) * 60 / self.capacity)
+
+    def settle(self, reserved: int, used: int):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + reserved - used)
+
+
+_token_bucket: TokenBucket | None = (
+    TokenBucket(LLM_TOKENS_PER_MINUTE) if LLM_TOKENS_PER_MINUTE > 0 else None
+)
+
+
+def set_tokens_per_minute(tokens_per_minute: int):
+    """Troca a cota de tokens por minuto (0 desliga o controle)."""
+    global _token_bucket
+    _token_bucket = (
+        TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+    )
+
+
+def token_budget_enabled() -> bool:
+    return _token_bucket is not None
+
+
+async def reserve_tokens(estimated: int) -> int:
+    """Espera ate a cota comportar `estimated` tokens; retorna o reservado."""
+    if _token_bucket is None:
+        return 0
+    return await _token_bucket.acquire(estimated)
+
+
+def settle_tokens(reserved: int, used: int):
+    if _token_bucket is not None and reserved:
+        _token_bucket.settle(reserved, used)
+
+
+async def aclose_llm_clients():
+    global _http_clients
+    with _lock:
+        clients, _http_clients = _http_clients, None
+        _models.clear()
+    if clients:
+        clients[0].close()
+        await clients[1].aclose()
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import json
+import logging
+import weakref
+from typing import TypedDict
+
+from app.core.config import PIPELINE_CHECKPOINT_DB
+from app.agents.llm_registry import phase_models
+from app.models.schemas import PipelineRequest, PipelineResult
+from app.agents.spec_agent import run_phase, run_implement_parallel
+from app.services.project_service import (
+    PHASE_ARTIFACTS,
+    get_artifact_meta,
+    has_artifact,
+    save_artifact,
+)
+from app.services.phase_prompts import (
+    PHASE_REQUESTS,
+    PhasePreconditionError,
+    build_phase_prompt,
+)
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_PHASES = ("specify", "plan", "tasks", "implement")
+
+# O que cada fase le: artefatos anteriores e campos do pedido. A fase so
+# roda de novo quando o hash disso muda (ou o artefato dela sumiu).
+UPSTREAM_ARTIFACTS = {
+    "specify": (),
+    "plan": ("ESPEC.md",),
+    "tasks": ("ESPEC.md", "DP.md"),
+    "implement": ("ESPEC.md", "DP.md", "TASKS.md"),
+}
+PHASE_PARAMS = {
+    "specify": ("description",),
+    "plan": ("stack", "constraints", "dp_template_id", "dp_top_k"),
+    "tasks": (),
+    "implement": ("parallel",),
+}
+
+
+class PipelineState(TypedDict):
+    project_name: str
+    request: dict
+    fingerprints: dict[str, str]
+    results: dict[str, str]
+
+
+def phase_fingerprint(phase: str, project_name: str, request: dict) -> str:
+    """Hash das entradas da fase: artefatos anteriores, parametros e modelo."""
+    upstream = [
+        get_artifact_meta(project_name, filename).sha256
+        for filename in UPSTREAM_ARTIFACTS[phase]
+    ]
+    params = {key: request.get(key) for key in PHASE_PARAMS[phase]}
+    payload = json.dumps(
+        [phase_models(phase)[0], upstream, params], sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _generate(phase: str, project_name: str, request: dict) -> str:
+    if phase == "specify" and not request.get("description"):
+        raise PhasePreconditionError("Informe a descricao para gerar a ESPEC.md")
+    if phase == "plan" and not request.get("stack"):
+        raise PhasePreconditionError("Informe a stack para gerar o DP.md")
+
+    use_cache = not request.get("bypass_cache", False)
+    if phase == "implement" and request.get("parallel"):
+        return await run_implement_parallel(
+            project_name, request.get("max_concurrency"), use_cache
+        )
+    model = PHASE_REQUESTS[phase][0]
+    fields = {k: v for k, v in request.items() if k in model.model_fields}
+    req = model.model_validate({**fields, "project_name": project_name})
+    prompt = await build_phase_prompt(phase, req)
+    return await run_phase(phase, project_name, prompt, use_cache)
+
+
+def _phase_node(phase: str):
+    async def node(state: PipelineState) -> dict:
+        project_name, request = state["project_name"], state["request"]
+        artifact = PHASE_ARTIFACTS[phase]
+        fingerprint = await asyncio.to_thread(
+            phase_fingerprint, phase, project_name, request
+        )
+        exists = await asyncio.to_thread(has_artifact, project_name, artifact)
+        up_to_date = (
+            exists
+            and phase not in request.get("force", [])
+            and (
+                state["fingerprints"].get(phase) == fingerprint
+                # ESPEC.md ja existe e nenhuma descricao nova foi enviada
+                or (phase == "specify" and not request.get("description"))
+            )
+        )
+        if not up_to_date:
+            content = await _generate(phase, project_name, request)
+            await asyncio.to_thread(save_artifact, project_name, artifact, content)
+        logger.info(
+            "pipeline %s/%s: %s",
+            project_name, phase, "pulada" if up_to_date else "executada",
+        )
+        return {
+            "fingerprints": {**state["fingerprints"], phase: fingerprint},
+            "results": {
+                **state["results"], phase: "skipped" if up_to_date else "ran"
+            },
+        }
+
+    return node
+
+
+def build_pipeline_graph():
+    from langgraph.graph import StateGraph, START, END
+
+    graph = StateGraph(PipelineState)
+    previous = START
+    for phase in PIPELINE_PHASES:
+        graph.add_node(phase, _phase_node(phase))
+        graph.add_edge(previous, phase)
+        previous = phase
+    graph.add_edge(previous, END)
+    return graph
+
+
+# Grafo compilado + conexao do checkpointer, um por event loop
+_compiled: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# Um lock por projeto enquanto alguem o segura ou espera por ele (cada
+# chamada guarda uma referencia); depois sai sozinho do dicionario
+_project_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+async def _get_pipeline_graph():
+    loop = asyncio.get_running_loop()
+    entry = _compiled.get(loop)
+    if entry is not None:
+        return entry[0]
+    conn = None
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:  # langgraph-checkpoint-sqlite e opcional
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        logger.warning(
+            "langgraph-checkpoint-sqlite nao instalado; checkpoints do "
+            "pipeline ficam so em memoria"
+        )
+        checkpointer = InMemorySaver()
+    else:
+        PIPELINE_CHECKPOINT_DB.parent.mkdir(parents=True, exist_ok=True)
+        conn = await aiosqlite.connect(str(PIPELINE_CHECKPOINT_DB))
+        checkpointer = AsyncSqliteSaver(conn)
+    if loop in _compiled:
+        # outra corrotina compilou enquanto esta abria a conexao
+        if conn is not None:
+            await conn.close()
+        return _compiled[loop][0]
+    graph = build_pipeline_graph().compile(checkpointer=checkpointer)
+    _compiled[loop] = (graph, conn)
+    return graph
+
+
+async def aclose_pipeline():
+    entry = _compiled.pop(asyncio.get_running_loop(), None)
+    if entry and entry[1] is not None:
+        await entry[1].close()
+
+
+def _thread(project_name: str) -> dict:
+    return {"configurable": {"thread_id": project_name}}
+
+
+async def get_pipeline_state(project_name: str) -> PipelineResult:
+    graph = await _get_pipeline_graph()
+    values = (await graph.aget_state(_thread(project_name))).values
+    return PipelineResult(
+        project_name=project_name,
+        phases=values.get("results", {}),
+        fingerprints=values.get("fingerprints", {}),
+    )
+
+
+async def run_pipeline(req: PipelineRequest) -> PipelineResult:
+    """Executa specify -> plan -> tasks -> implement, pulando as fases em dia.
+
+    O checkpoint do projeto guarda o hash das entradas de cada fase na
+    ultima execucao e os parametros usados; campos omitidos no pedido
+    reaproveitam esses parametros.
+    """
+    graph = await _get_pipeline_graph()
+    config = _thread(req.project_name)
+    lock = _project_locks.get(req.project_name)
+    if lock is None:
+        lock = _project_locks[req.project_name] = asyncio.Lock()
+    async with lock:
+        previous = (await graph.aget_state(config)).values
+        request = {
+            **previous.get("request", {}),
+            **req.model_dump(exclude_none=True, exclude={"project_name"}),
+        }
+        result = await graph.ainvoke(
+            {
+                "project_name": req.project_name,
+                "request": request,
+                "fingerprints": previous.get("fingerprints", {}),
+                "results": {},
+            },
+            config,
+        )
+    return PipelineResult(
+        project_name=req.project_name,
+        phases=result["results"],
+        fingerprints=result["fingerprints"],
+    )
@@ -1,17 +1,97 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
-from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Annotated
+import asyncio
+import logging
+import threading
+import time
+
+from typing import TYPE_CHECKING, AsyncIterator, TypedDict, Annotated
 from operator import add
 
-from app.core.config import OPENAI_API_KEY, MODEL_NAME
+from app.core.config import (
+    IMPLEMENT_MAX_CONCURRENCY,
+    LLM_COMPLETION_TOKENS_ESTIMATE,
+    LLM_PRICE_INPUT_PER_1M,
+    LLM_PRICE_CACHED_INPUT_PER_1M,
+    LLM_PRICE_OUTPUT_PER_1M,
+    PHASE_TEMPERATURES,
+)
+from app.core.metrics import (
+    ARTIFACT_PATCH,
+    LLM_CACHE,
+    LLM_COST,
+    LLM_DURATION,
+    LLM_ERRORS,
+    LLM_FALLBACKS,
+    LLM_HEDGES,
+    LLM_TOKENS,
+    LLM_TTFT,
+    PHASE_DURATION,
+    PHASE_ERRORS,
+)
 from app.core.prompts import (
     SPECIFY_SYSTEM,
     PLAN_SYSTEM,
     TASKS_SYSTEM,
     IMPLEMENT_SYSTEM,
+    UPDATE_SYSTEM,
+)
+from app.agents.llm_registry import (
+    get_llm,
+    hedge_delay,
+    llm_slot,
+    phase_models,
+    record_latency,
+    reserve_tokens,
+    settle_tokens,
+    token_budget_enabled,
+)
+from app.services.project_service import (
+    PHASE_ARTIFACTS,
+    read_artifact,
+    read_base_snapshot,
+)
+from app.services.artifact_patch import (
+    PatchError,
+    apply_patch,
+    check_tasks,
+    parse_patch,
+    upstream_diff,
+)
+from app.services.llm_cache import (
+    cache_key,
+    get_cached,
+    put_cached,
+    record_prompt_usage,
 )
-from app.services.project_service import read_file_safe, get_project_dir
+from app.services.tasks_parser import parse_tasks, topological_order
+from app.services.context_budget import (
+    build_context,
+    count_tokens,
+    fit_dependency_code,
+    log_context_savings,
+    tail_budget,
+    task_slice,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+# LangChain/LangGraph custam ~1s de import: so entram na primeira chamada
+# (ou no preload do serve.py), nao no import do app.
+
+
+def _messages():
+    import langchain_core.messages as messages
+
+    return messages
+
+
+def _stream_writer():
+    from langgraph.config import get_stream_writer
+
+    return get_stream_writer()
 
 
 class AgentState(TypedDict):
@@ -19,81 +99,421 @@ class AgentState(TypedDict):
     phase: str
     project_name: str
     output: str
+    stream: bool
+    use_cache: bool
+    task_index: int | None
+    mode: str
+
+
+def _get_llm(phase: str = "", model: str | None = None) -> "ChatOpenAI":
+    return get_llm(model, temperature=PHASE_TEMPERATURES.get(phase, 0.3))
+
+
+def _model_label(llm, model: str) -> str:
+    return getattr(llm, "model_name", None) or model
+
+
+async def _read_artifacts(project_name: str, *filenames: str) -> list[str]:
+    """Le os artefatos em threads para nao bloquear o event loop."""
+    return await asyncio.gather(*(
+        asyncio.to_thread(read_artifact, project_name, name)
+        for name in filenames
+    ))
+
+
+async def _call_llm(state: AgentState, messages: list) -> "BaseMessage":
+    """Chama o LLM consultando antes o cache de respostas por conteudo.
 
+    Com `use_cache` desligado a consulta e ignorada, mas a resposta nova
+    ainda substitui a entrada do cache. A chamada percorre a cadeia de
+    modelos da fase (ver `_call_models`).
+    """
+    phase = state["phase"]
+    chain = phase_models(phase)
+    llm = _get_llm(phase, chain[0])
+    temperature = getattr(llm, "temperature", None)
+    key = cache_key(phase, _model_label(llm, chain[0]), temperature, messages)
+    if state.get("use_cache", True):
+        cached = await asyncio.to_thread(get_cached, key)
+        LLM_CACHE.inc(phase=phase, result="miss" if cached is None else "hit")
+        if cached is not None:
+            if state.get("stream"):
+                _stream_writer()({"token": cached})
+            return _messages().AIMessage(content=cached)
 
-def _get_llm() -> ChatOpenAI:
-    return ChatOpenAI(
-        model=MODEL_NAME,
-        api_key=OPENAI_API_KEY,
-        temperature=0.3,
+    # A cota de tokens por minuto e reservada antes de ocupar um slot
+    reserved = 0
+    if token_budget_enabled():
+        reserved = await reserve_tokens(
+            sum(count_tokens(str(m.content)) for m in messages)
+            + LLM_COMPLETION_TOKENS_ESTIMATE
+        )
+    try:
+        response, model = await _call_models(state, messages, chain)
+    except BaseException:
+        settle_tokens(reserved, 0)
+        raise
+    usage = getattr(response, "usage_metadata", None) or {}
+    settle_tokens(reserved, usage.get("total_tokens", reserved))
+    _record_usage(state, response, model)
+    # guardada sob o modelo que respondeu, que pode ser um fallback
+    key = cache_key(phase, model, temperature, messages)
+    await asyncio.to_thread(put_cached, key, state["phase"], response.content)
+    return response
+
+
+async def _call_models(
+    state: AgentState, messages: list, chain: list[str]
+) -> tuple["BaseMessage", str]:
+    """Tenta os modelos da cadeia em ordem ate um responder.
+
+    Erros (inclusive timeout, depois dos retries do cliente) passam a vez
+    ao proximo modelo, salvo se tokens ja foram enviados ao stream:
+    trocar de modelo ai duplicaria o texto para o cliente.
+    """
+    phase = state["phase"]
+    emitted: list[bool] = []
+    for i, name in enumerate(chain):
+        alternate = chain[i + 1] if i + 1 < len(chain) else name
+        try:
+            return await _hedged_call(state, messages, name, alternate, emitted)
+        except Exception as e:
+            if emitted or i == len(chain) - 1:
+                raise
+            LLM_FALLBACKS.inc(phase=phase, model=chain[i + 1])
+            logger.warning(
+                "modelo %s falhou na fase %s (%s); tentando %s",
+                name, phase, e, chain[i + 1],
+            )
+    raise RuntimeError("Cadeia de modelos vazia.")
+
+
+async def _hedged_call(
+    state: AgentState,
+    messages: list,
+    model: str,
+    alternate: str,
+    emitted: list[bool],
+) -> tuple["BaseMessage", str]:
+    """Chama `model`; se passar do quantil de latencia, duplica em `alternate`.
+
+    Vale a primeira resposta. No stream, vence quem emite o primeiro token
+    e a outra chamada e cancelada na hora, entao o cliente so ve um texto.
+    """
+    phase = state["phase"]
+    writer = _stream_writer() if state.get("stream") else None
+    kind = "ttft" if writer else "total"
+    tasks: list[asyncio.Task] = []
+    winner: list[int] = []
+
+    def gated(index: int):
+        if writer is None:
+            return None
+
+        def write(token: str):
+            if not winner:
+                winner.append(index)
+                for other, task in enumerate(tasks):
+                    if other != index:
+                        task.cancel()
+            if winner[0] == index:
+                if not emitted:
+                    emitted.append(True)
+                writer({"token": token})
+
+        return write
+
+    started = time.perf_counter()
+    tasks.append(asyncio.create_task(
+        _attempt(phase, messages, model, gated(0))
+    ))
+    label = _model_label(_get_llm(phase, model), model)
+    try:
+        delay = hedge_delay(phase, label, kind)
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and not winner:
+                logger.info(
+                    "fase %s: %s passou de %.1fs; duplicando em %s",
+                    phase, label, delay, alternate,
+                )
+                tasks.append(asyncio.create_task(
+                    _attempt(phase, messages, alternate, gated(1))
+                ))
+
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    error = task.exception()
+                    if winner and tasks.index(task) == winner[0]:
+                        raise error
+                    continue
+                if len(tasks) > 1:
+                    hedge_won = tasks.index(task) == 1
+                    LLM_HEDGES.inc(
+                        phase=phase, model=task.result()[1],
+                        result="won" if hedge_won else "lost",
+                    )
+                    if hedge_won:
+                        # a chamada lenta nao terminou, mas levou pelo menos
+                        # isso; sem a amostra o quantil so cairia
+                        record_latency(
+                            phase, label, kind, time.perf_counter() - started
+                        )
+                return task.result()
+        raise error or RuntimeError("Nenhuma chamada ao LLM terminou.")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _attempt(
+    phase: str, messages: list, model_name: str, write=None
+) -> tuple["BaseMessage", str]:
+    llm = _get_llm(phase, model_name)
+    model = _model_label(llm, model_name)
+    async with llm_slot():
+        start = time.perf_counter()
+        try:
+            response = await _invoke_llm(llm, messages, write, phase, model)
+        except Exception:
+            LLM_ERRORS.inc(phase=phase, model=model)
+            raise
+        elapsed = time.perf_counter() - start
+    LLM_DURATION.observe(elapsed, phase=phase, model=model)
+    record_latency(phase, model, "total", elapsed)
+    return response, model
+
+
+def _record_usage(state: AgentState, response: "BaseMessage", model: str = ""):
+    """Registra tokens e custo, separando o que veio do cache de prefixo."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    prompt_tokens = usage.get("input_tokens", 0)
+    completion_tokens = usage.get("output_tokens", 0)
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    record_prompt_usage(prompt_tokens, cached)
+    labels = {"phase": state["phase"], "model": model}
+    LLM_TOKENS.inc(prompt_tokens, kind="prompt", **labels)
+    LLM_TOKENS.inc(cached, kind="prompt_cached", **labels)
+    LLM_TOKENS.inc(completion_tokens, kind="completion", **labels)
+    LLM_COST.inc(
+        (
+            (prompt_tokens - cached) * LLM_PRICE_INPUT_PER_1M
+            + cached * LLM_PRICE_CACHED_INPUT_PER_1M
+            + completion_tokens * LLM_PRICE_OUTPUT_PER_1M
+        ) / 1e6,
+        **labels,
+    )
+    logger.info(
+        "prompt %s/%s: %d tokens (%d em cache, %d sem cache)",
+        state["project_name"], state["phase"],
+        prompt_tokens, cached, prompt_tokens - cached,
     )
 
 
-def specify_node(state: AgentState) -> dict:
-    llm = _get_llm()
-    response = llm.invoke(
-        [SystemMessage(content=SPECIFY_SYSTEM)] + state["messages"]
+async def _invoke_llm(
+    llm, messages: list, write=None, phase: str = "", model: str = ""
+) -> "BaseMessage":
+    """Com `write`, usa streaming e repassa cada token a ele."""
+    if write is None:
+        return await llm.ainvoke(messages)
+
+    response = None
+    start = time.perf_counter()
+    first_token = True
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            if first_token:
+                ttft = time.perf_counter() - start
+                LLM_TTFT.observe(ttft, phase=phase, model=model)
+                record_latency(phase, model, "ttft", ttft)
+                first_token = False
+            write(chunk.content)
+        response = chunk if response is None else response + chunk
+    return response
+
+
+async def specify_node(state: AgentState) -> dict:
+    response = await _call_llm(
+        state,
+        [_messages().SystemMessage(content=SPECIFY_SYSTEM)] + state["messages"],
     )
     return {"output": response.content, "messages": [response]}
 
 
-def plan_node(state: AgentState) -> dict:
-    llm = _get_llm()
-    project_dir = get_project_dir(state["project_name"])
-    espec = read_file_safe(project_dir / "ESPEC.md")
-    context = f"## ESPEC.md existente:\n\n{espec}\n\n"
-    messages = [
-        SystemMessage(content=PLAN_SYSTEM),
-        HumanMessage(content=context),
-    ] + state["messages"]
-    response = llm.invoke(messages)
+def _user_text(state: AgentState) -> str:
+    return "\n".join(
+        m.content for m in state["messages"]
+        if isinstance(m, _messages().HumanMessage)
+    )
+
+
+def _assemble(system: str, prefix: str, tail: str) -> list:
+    """Prefixo estavel primeiro (sistema + artefatos), o que varia por ultimo.
+
+    O provedor so reaproveita o cache de prompt quando o inicio da
+    requisicao e identico byte a byte; por isso nada que mude entre
+    chamadas (tarefa, instrucoes do usuario) pode vir antes dos artefatos.
+    """
+    lc = _messages()
+    messages = [lc.SystemMessage(content=system)]
+    if prefix:
+        messages.append(lc.HumanMessage(content=prefix))
+    messages.append(lc.HumanMessage(content=tail))
+    return messages
+
+
+async def plan_node(state: AgentState) -> dict:
+    espec, = await _read_artifacts(state["project_name"], "ESPEC.md")
+    prefix, _, original, final = build_context(
+        "plan", [("ESPEC.md existente", espec)]
+    )
+    log_context_savings("plan", state["project_name"], original, final)
+    messages = _assemble(PLAN_SYSTEM, prefix, _user_text(state))
+    response = await _call_llm(state, messages)
     return {"output": response.content, "messages": [response]}
 
 
-def tasks_node(state: AgentState) -> dict:
-    llm = _get_llm()
-    project_dir = get_project_dir(state["project_name"])
-    espec = read_file_safe(project_dir / "ESPEC.md")
-    dp = read_file_safe(project_dir / "DP.md")
-    context = f"## ESPEC.md:\n\n{espec}\n\n## DP.md:\n\n{dp}\n\n"
-    messages = [
-        SystemMessage(content=TASKS_SYSTEM),
-        HumanMessage(content=context + "Gere a lista de tarefas."),
-    ]
-    response = llm.invoke(messages)
+async def tasks_node(state: AgentState) -> dict:
+    espec, dp = await _read_artifacts(state["project_name"], "ESPEC.md", "DP.md")
+    prefix, _, original, final = build_context(
+        "tasks", [("ESPEC.md", espec), ("DP.md", dp)]
+    )
+    log_context_savings("tasks", state["project_name"], original, final)
+    messages = _assemble(TASKS_SYSTEM, prefix, "Gere a lista de tarefas.")
+    response = await _call_llm(state, messages)
     return {"output": response.content, "messages": [response]}
 
 
-def implement_node(state: AgentState) -> dict:
-    llm = _get_llm()
-    project_dir = get_project_dir(state["project_name"])
-    espec = read_file_safe(project_dir / "ESPEC.md")
-    dp = read_file_safe(project_dir / "DP.md")
-    tasks = read_file_safe(project_dir / "TASKS.md")
-    context = (
-        f"## ESPEC.md:\n\n{espec}\n\n"
-        f"## DP.md:\n\n{dp}\n\n"
-        f"## TASKS.md:\n\n{tasks}\n\n"
+async def implement_node(state: AgentState) -> dict:
+    espec, dp, tasks = await _read_artifacts(
+        state["project_name"], "ESPEC.md", "DP.md", "TASKS.md"
+    )
+    frozen = [("ESPEC.md", espec), ("DP.md", dp)]
+    volatile = []
+    # Com task_index, so a tarefa e suas dependencias entram, depois do
+    # prefixo comum a todas as tarefas
+    sliced_away = 0
+    task_index = state.get("task_index")
+    selected = task_slice(tasks, task_index) if task_index is not None else None
+    if selected:
+        sliced_away = count_tokens(tasks) - count_tokens(selected)
+        volatile.append(("Tarefa e dependencias (TASKS.md)", selected))
+    else:
+        frozen.append(("TASKS.md", tasks))
+    prefix, tail, original, final = build_context("implement", frozen, volatile)
+    log_context_savings(
+        "implement", state["project_name"], original + sliced_away, final
     )
-    messages = [
-        SystemMessage(content=IMPLEMENT_SYSTEM),
-        HumanMessage(content=context),
-    ] + state["messages"]
-    response = llm.invoke(messages)
+    messages = _assemble(IMPLEMENT_SYSTEM, prefix, tail + _user_text(state))
+    response = await _call_llm(state, messages)
     return {"output": response.content, "messages": [response]}
 
 
+async def _update_artifact(state: AgentState, phase: str, full_node) -> dict:
+    """Modo update: pede ao modelo so o patch das secoes afetadas pelo diff.
+
+    Sem base salva, com patch invalido ou que nao se aplica, cai na
+    geracao completa.
+    """
+    project_name = state["project_name"]
+    artifact = PHASE_ARTIFACTS[phase]
+    current, = await _read_artifacts(project_name, artifact)
+    base = await asyncio.to_thread(read_base_snapshot, project_name, artifact)
+    if not current or base is None:
+        logger.info(
+            "%s/%s sem versao base; gerando do zero", project_name, artifact
+        )
+        ARTIFACT_PATCH.inc(phase=phase, result="fallback")
+        return await full_node(state)
+
+    upstream = await _read_artifacts(project_name, *base)
+    diffs = [
+        upstream_diff(name, base[name], text)
+        for name, text in zip(base, upstream)
+    ]
+    diffs = [d for d in diffs if d]
+    output, result = current, "noop"
+    if diffs:
+        changes = "\n\n".join(f"```diff\n{d}\n```" for d in diffs)
+        messages = _assemble(
+            UPDATE_SYSTEM.format(artifact=artifact),
+            f"## {artifact} atual:\n\n{current}\n\n",
+            f"## Mudancas desde a ultima geracao:\n\n{changes}\n\n"
+            + _user_text(state),
+        )
+        # a resposta e um patch, nao o documento: nada vai para o stream
+        response = await _call_llm({**state, "stream": False}, messages)
+        try:
+            ops = parse_patch(response.content)
+            if ops is not None:
+                output, result = apply_patch(current, ops), "applied"
+                if phase == "tasks":
+                    check_tasks(output)
+        except PatchError as e:
+            logger.warning(
+                "patch de %s/%s descartado (%s); gerando do zero",
+                project_name, artifact, e,
+            )
+            ARTIFACT_PATCH.inc(phase=phase, result="fallback")
+            return await full_node(state)
+    ARTIFACT_PATCH.inc(phase=phase, result=result)
+    logger.info(
+        "%s/%s atualizado por patch: %s", project_name, artifact, result
+    )
+    if state.get("stream"):
+        _stream_writer()({"token": output})
+    return {
+        "output": output, "messages": [_messages().AIMessage(content=output)],
+    }
+
+
+def _updatable(phase: str, node):
+    """No modo update, tenta o patch antes da geracao completa do no."""
+    async def wrapper(state: AgentState) -> dict:
+        if state.get("mode") == "update":
+            return await _update_artifact(state, phase, node)
+        return await node(state)
+
+    return wrapper
+
+
+def _timed(phase: str, node):
+    """Envolve o no do grafo com as metricas de duracao e falhas."""
+    async def wrapper(state: AgentState) -> dict:
+        start = time.perf_counter()
+        try:
+            return await node(state)
+        except Exception:
+            PHASE_ERRORS.inc(phase=phase)
+            raise
+        finally:
+            PHASE_DURATION.observe(time.perf_counter() - start, phase=phase)
+
+    return wrapper
+
+
 def route_phase(state: AgentState) -> str:
     return state["phase"]
 
 
-def build_spec_graph() -> StateGraph:
+def build_spec_graph():
+    from langgraph.graph import StateGraph, START, END
+
     graph = StateGraph(AgentState)
 
-    graph.add_node("specify", specify_node)
-    graph.add_node("plan", plan_node)
-    graph.add_node("tasks", tasks_node)
-    graph.add_node("implement", implement_node)
+    graph.add_node("specify", _timed("specify", specify_node))
+    graph.add_node("plan", _timed("plan", _updatable("plan", plan_node)))
+    graph.add_node("tasks", _timed("tasks", _updatable("tasks", tasks_node)))
+    graph.add_node("implement", _timed("implement", implement_node))
 
     graph.add_conditional_edges(START, route_phase, {
         "specify": "specify",
@@ -110,14 +530,187 @@ def build_spec_graph() -> StateGraph:
     return graph.compile()
 
 
-spec_graph = build_spec_graph()
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_spec_graph():
+    """Grafo compilado na primeira fase executada, nao no import."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_spec_graph()
+    return _graph
 
 
-async def run_phase(phase: str, project_name: str, user_input: str) -> str:
-    result = spec_graph.invoke({
-        "messages": [HumanMessage(content=user_input)],
+def warm_up() -> None:
+    """Adianta os imports pesados e a compilacao do grafo.
+
+    Usado no preload do serve.py (antes do fork, para os workers ja
+    nascerem com tudo carregado) e com APP_WARMUP.
+    """
+    import langchain_openai  # noqa: F401
+
+    get_spec_graph()
+
+
+def _initial_state(
+    phase: str,
+    project_name: str,
+    user_input: str,
+    stream: bool = False,
+    use_cache: bool = True,
+    task_index: int | None = None,
+    mode: str = "full",
+) -> AgentState:
+    return {
+        "messages": [_messages().HumanMessage(content=user_input)],
         "phase": phase,
         "project_name": project_name,
         "output": "",
-    })
+        "stream": stream,
+        "use_cache": use_cache,
+        "task_index": task_index,
+        "mode": mode,
+    }
+
+
+async def run_phase(
+    phase: str,
+    project_name: str,
+    user_input: str,
+    use_cache: bool = True,
+    task_index: int | None = None,
+    mode: str = "full",
+) -> str:
+    result = await get_spec_graph().ainvoke(_initial_state(
+        phase, project_name, user_input,
+        use_cache=use_cache, task_index=task_index, mode=mode,
+    ))
     return result["output"]
+
+
+async def astream_phase(
+    phase: str,
+    project_name: str,
+    user_input: str,
+    use_cache: bool = True,
+    task_index: int | None = None,
+    mode: str = "full",
+) -> AsyncIterator[str]:
+    """Executa a fase emitindo os tokens do LLM a medida que chegam."""
+    state = _initial_state(
+        phase, project_name, user_input,
+        stream=True, use_cache=use_cache, task_index=task_index, mode=mode,
+    )
+    async for event in get_spec_graph().astream(state, stream_mode="custom"):
+        yield event["token"]
+
+
+# ── Implementacao paralela por tarefa ────────────────────────────────
+
+
+def _task_prompt(task: dict, dep_outputs: list[tuple[str, str]]) -> str:
+    # O corpo da tarefa ja vai no contexto, pelo recorte do TASKS.md; o
+    # codigo das dependencias diretas vem aqui, para a tarefa usar as
+    # mesmas interfaces em vez de inventa-las
+    prompt = f"Implemente somente a tarefa {task['id']} - {task['title']}.\n"
+    if dep_outputs:
+        deps = ", ".join(dep for dep, _ in dep_outputs)
+        prompt += (
+            f"\nAs dependencias ({deps}) ja foram implementadas em chamadas "
+            f"separadas, com o codigo abaixo. Use as mesmas interfaces "
+            f"(nomes, assinaturas, caminhos) e nao repita esses arquivos.\n"
+        )
+        for dep, code in dep_outputs:
+            prompt += f"\n## Codigo de {dep}:\n\n{code.strip()}\n"
+    return prompt
+
+
+def _dependency_code(
+    tasks_md: str, task: dict, outputs: list[str]
+) -> list[tuple[str, str]]:
+    """Codigo das dependencias, dentro do que sobra da reserva da cauda.
+
+    A reserva (CONTEXT_TAIL_RESERVE) ja leva o recorte da tarefa; o codigo
+    fica com o resto e, se nao couber, e reduzido as assinaturas.
+    """
+    budget = tail_budget("implement")
+    if budget is not None:
+        selected = task_slice(tasks_md, int(task["id"][1:])) or ""
+        budget -= count_tokens(selected)
+    return fit_dependency_code(list(zip(task["depends_on"], outputs)), budget)
+
+
+async def iter_implement_parallel(
+    project_name: str,
+    max_concurrency: int | None = None,
+    use_cache: bool = True,
+) -> AsyncIterator[tuple[dict, str]]:
+    """Implementa as tarefas do TASKS.md em paralelo, respeitando o DAG.
+
+    Cada tarefa espera apenas as suas dependencias, recebe o codigo que
+    elas geraram (dentro do orcamento de contexto) e disputa um semaforo
+    limitado a `max_concurrency`. Emite (tarefa, saida) na ordem em que as
+    tarefas terminam.
+    """
+    tasks_md = await asyncio.to_thread(read_artifact, project_name, "TASKS.md")
+    tasks = parse_tasks(tasks_md)
+    if not tasks:
+        raise ValueError("Nenhuma tarefa (T001, T002...) encontrada no TASKS.md.")
+
+    semaphore = asyncio.Semaphore(max_concurrency or IMPLEMENT_MAX_CONCURRENCY)
+    running: dict[str, asyncio.Task] = {}
+
+    async def implement_task(task: dict) -> str:
+        outputs = await asyncio.gather(*(running[d] for d in task["depends_on"]))
+        dep_code = await asyncio.to_thread(
+            _dependency_code, tasks_md, task, outputs
+        )
+        prompt = _task_prompt(task, dep_code)
+        async with semaphore:
+            return await run_phase(
+                "implement", project_name, prompt, use_cache,
+                task_index=int(task["id"][1:]),
+            )
+
+    for task in topological_order(tasks):
+        running[task["id"]] = asyncio.create_task(implement_task(task))
+    task_of = {running[t["id"]]: t for t in tasks}
+
+    pending = set(running.values())
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for fut in done:
+                yield task_of[fut], fut.result()
+    finally:
+        for fut in running.values():
+            fut.cancel()
+
+
+def format_task_section(task: dict, output: str) -> str:
+    return f"## {task['id']} - {task['title']}\n\n{output.strip()}\n"
+
+
+def merge_task_outputs(results: list[tuple[dict, str]]) -> str:
+    """Junta as saidas por tarefa no IMPLEMENTATION.md, na ordem dos IDs."""
+    ordered = sorted(results, key=lambda r: int(r[0]["id"][1:]))
+    sections = [format_task_section(task, output) for task, output in ordered]
+    return "# IMPLEMENTATION.md\n\n" + "\n".join(sections)
+
+
+async def run_implement_parallel(
+    project_name: str,
+    max_concurrency: int | None = None,
+    use_cache: bool = True,
+) -> str:
+    results = []
+    async for task, output in iter_implement_parallel(
+        project_name, max_concurrency, use_cache
+    ):
+        results.append((task, output))
+    return merge_task_outputs(results)
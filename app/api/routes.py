@@ -1,5 +1,26 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+import hashlib
+import json
+from typing import AsyncIterator, Callable
+
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    UploadFile,
+    File,
+    Form,
+    Header,
+    Query,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from app.models.schemas import (
     SpecifyRequest,
     PlanRequest,
@@ -7,21 +28,71 @@ from app.models.schemas import (
     ImplementRequest,
     PhaseResponse,
     ProjectStatus,
+    ProjectMeta,
+    ProjectSummary,
     DPTemplateInfo,
+    DPIngestJob,
+    CacheStats,
+    SearchHit,
+    JobRequest,
+    PhaseJob,
+    PipelineRequest,
+    PipelineResult,
+    BatchRequest,
 )
-from app.agents.spec_agent import run_phase
+from app.agents.spec_agent import (
+    run_phase,
+    astream_phase,
+    run_implement_parallel,
+    iter_implement_parallel,
+    format_task_section,
+    merge_task_outputs,
+)
+from app.agents.pipeline import run_pipeline, get_pipeline_state
+from app.services.batch_service import iter_batch, validate_batch
 from app.services.project_service import (
     save_artifact,
+    ARTIFACTS,
+    PHASE_ARTIFACTS,
     get_project_status,
+    get_project_meta,
+    get_project_fields,
+    get_artifact_meta,
+    has_artifact,
+    read_artifact,
     list_projects,
+    list_project_summaries,
 )
 from app.services.dp_catalog_service import (
-    save_dp_template,
     list_dp_templates,
+    count_dp_templates,
     get_dp_template_content,
     delete_dp_template,
 )
-from app.services.zip_service import build_project_zip
+from app.services.zip_service import get_cached_zip, iter_project_zip
+from app.services.llm_cache import cache_stats, clear_cache
+from app.services.ingest_service import submit_ingest, get_ingest_job
+from app.services.search_service import search
+from app.services.storage import PreconditionFailed
+from app.services.phase_prompts import (
+    PHASE_REQUESTS,
+    PhasePreconditionError,
+    build_phase_prompt,
+)
+from app.services.prefetch_service import (
+    discard_drafts,
+    prefetch_enabled,
+    remember_params,
+    schedule_next,
+    take_draft,
+)
+from app.services.job_service import (
+    submit_phase_job,
+    get_job,
+    list_jobs,
+    cancel_job,
+    iter_job_updates,
+)
 
 router = APIRouter(prefix="/api")
 
@@ -31,112 +102,512 @@ router = APIRouter(prefix="/api")
 
 @router.get("/projects", response_model=list[str])
 async def get_projects():
-    return list_projects()
+    return await run_in_threadpool(list_projects)
+
+
+@router.get("/project-summaries", response_model=list[ProjectSummary])
+async def get_project_summaries(
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    sort: str = "name",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    stage: str | None = Query(
+        None, pattern="^(new|specify|plan|tasks|implement)$"
+    ),
+    has: list[str] = Query([]),
+    q: str | None = None,
+):
+    """Projetos com fase e tamanhos, paginados; o total vai em X-Total-Count."""
+    try:
+        summaries, total = await run_in_threadpool(
+            list_project_summaries,
+            offset=offset,
+            limit=limit,
+            sort=sort,
+            descending=order == "desc",
+            stage=stage,
+            has=has,
+            q=q,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    response.headers["X-Total-Count"] = str(total)
+    return summaries
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
 
 
 @router.get("/projects/{project_name}", response_model=ProjectStatus)
-async def get_project(project_name: str):
-    return get_project_status(project_name)
+async def get_project(project_name: str, fields: str | None = None):
+    if not fields:
+        return await run_in_threadpool(get_project_status, project_name)
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    try:
+        data = await run_in_threadpool(
+            get_project_fields, project_name, selected
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return JSONResponse(data)
+
+
+@router.get("/projects/{project_name}/status", response_model=ProjectMeta)
+async def get_project_status_meta(
+    project_name: str, if_none_match: str | None = Header(None)
+):
+    meta = await run_in_threadpool(get_project_meta, project_name)
+    digests = "".join(a.sha256 or "-" for a in meta.artifacts.values())
+    etag = f'"{hashlib.sha256(digests.encode()).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(meta.model_dump(), headers=headers)
+
+
+@router.get("/projects/{project_name}/artifacts/{artifact}")
+async def get_artifact(
+    project_name: str, artifact: str, if_none_match: str | None = Header(None)
+):
+    if artifact not in ARTIFACTS.values():
+        raise HTTPException(
+            400, f"Artefato deve ser um de: {set(ARTIFACTS.values())}"
+        )
+    meta = await run_in_threadpool(get_artifact_meta, project_name, artifact)
+    if not meta.exists:
+        raise HTTPException(404, f"{artifact} nao encontrado.")
+    etag = f'"{meta.sha256}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    content = await run_in_threadpool(read_artifact, project_name, artifact)
+    return PlainTextResponse(
+        content, media_type="text/markdown; charset=utf-8", headers=headers
+    )
 
 
 # ── Fases do Spec-Driven Flow ────────────────────────────────────────
 
 
+async def _phase_prompt(phase: str, req) -> str:
+    try:
+        return await build_phase_prompt(phase, req)
+    except PhasePreconditionError as e:
+        raise HTTPException(400, str(e))
+    except FileNotFoundError:
+        raise HTTPException(404, "Template de DP nao encontrado.")
+
+
+async def _speculate(phase: str, req) -> None:
+    """Guarda os parametros da fase e, se pedido, adianta a proxima."""
+    remember_params(phase, req)
+    if prefetch_enabled(getattr(req, "prefetch", None)):
+        await schedule_next(phase, req.project_name)
+
+
+async def _run_and_save(
+    phase: str,
+    project_name: str,
+    prompt: str,
+    use_cache: bool = True,
+    task_index: int | None = None,
+    req=None,
+) -> PhaseResponse:
+    """Roda a fase e salva o artefato.
+
+    Com `req`, usa o rascunho especulativo da fase quando as entradas
+    batem e, depois de salvar, agenda o rascunho da fase seguinte.
+    """
+    mode = getattr(req, "mode", "full")
+    content = (
+        await take_draft(phase, req)
+        if req is not None and mode == "full" else None
+    )
+    if content is None:
+        content = await run_phase(
+            phase, project_name, prompt, use_cache,
+            task_index=task_index, mode=mode,
+        )
+    await run_in_threadpool(
+        save_artifact, project_name, PHASE_ARTIFACTS[phase], content
+    )
+    if req is not None:
+        await _speculate(phase, req)
+    return PhaseResponse(phase=phase, content=content, project_name=project_name)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_and_save(
+    phase: str,
+    project_name: str,
+    prompt: str,
+    use_cache: bool = True,
+    task_index: int | None = None,
+    req=None,
+) -> StreamingResponse:
+    """Responde em SSE com os tokens da fase e salva o artefato ao final."""
+    mode = getattr(req, "mode", "full")
+
+    async def tokens():
+        draft = (
+            await take_draft(phase, req)
+            if req is not None and mode == "full" else None
+        )
+        if draft is not None:
+            yield draft
+            return
+        async for token in astream_phase(
+            phase, project_name, prompt, use_cache,
+            task_index=task_index, mode=mode,
+        ):
+            yield token
+
+    return _sse_response(phase, project_name, tokens(), "".join, req)
+
+
+def _sse_response(
+    phase: str,
+    project_name: str,
+    chunks: AsyncIterator[str],
+    finalize: Callable[[list[str]], str],
+    req=None,
+) -> StreamingResponse:
+    async def events():
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield _sse("token", {"token": chunk})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        content = finalize(parts)
+        await run_in_threadpool(
+            save_artifact, project_name, PHASE_ARTIFACTS[phase], content
+        )
+        if req is not None:
+            await _speculate(phase, req)
+        yield _sse("done", {
+            "phase": phase,
+            "project_name": project_name,
+            "artifact": PHASE_ARTIFACTS[phase],
+            "length": len(content),
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/specify", response_model=PhaseResponse)
 async def specify(req: SpecifyRequest):
-    prompt = (
-        f"Projeto: {req.project_name}\n\n"
-        f"Descricao:\n{req.description}"
+    prompt = await _phase_prompt("specify", req)
+    return await _run_and_save(
+        "specify", req.project_name, prompt, not req.bypass_cache,
+        req=req,
     )
-    content = await run_phase("specify", req.project_name, prompt)
-    save_artifact(req.project_name, "ESPEC.md", content)
-    return PhaseResponse(
-        phase="specify", content=content, project_name=req.project_name
+
+
+@router.post("/specify/stream")
+async def specify_stream(req: SpecifyRequest):
+    prompt = await _phase_prompt("specify", req)
+    return _stream_and_save(
+        "specify", req.project_name, prompt, not req.bypass_cache,
+        req=req,
     )
 
 
 @router.post("/plan", response_model=PhaseResponse)
 async def plan(req: PlanRequest):
-    status = get_project_status(req.project_name)
-    if not status.has_espec:
-        raise HTTPException(400, "Execute /specify antes de /plan")
+    prompt = await _phase_prompt("plan", req)
+    return await _run_and_save(
+        "plan", req.project_name, prompt, not req.bypass_cache,
+        req=req,
+    )
 
-    dp_context = ""
-    if req.dp_template_id:
-        try:
-            dp_text = get_dp_template_content(req.dp_template_id)
-            dp_context = (
-                f"\n\n## Design Pattern de referencia (cadastrado previamente):\n\n"
-                f"{dp_text}\n\n"
-                f"Use este design pattern como base e adapte ao projeto.\n"
-            )
-        except FileNotFoundError:
-            raise HTTPException(404, "Template de DP nao encontrado.")
 
-    prompt = (
-        f"Stack desejada: {req.stack}\n"
-        f"Restricoes: {req.constraints}\n"
-        f"{dp_context}\n"
-        f"Gere o DP.md (Design Pattern) para o projeto {req.project_name}."
-    )
-    content = await run_phase("plan", req.project_name, prompt)
-    save_artifact(req.project_name, "DP.md", content)
-    return PhaseResponse(
-        phase="plan", content=content, project_name=req.project_name
+@router.post("/plan/stream")
+async def plan_stream(req: PlanRequest):
+    prompt = await _phase_prompt("plan", req)
+    return _stream_and_save(
+        "plan", req.project_name, prompt, not req.bypass_cache,
+        req=req,
     )
 
 
 @router.post("/tasks", response_model=PhaseResponse)
 async def tasks(req: TasksRequest):
-    status = get_project_status(req.project_name)
-    if not status.has_dp:
-        raise HTTPException(400, "Execute /plan antes de /tasks")
-    content = await run_phase("tasks", req.project_name, "Gere as tarefas.")
-    save_artifact(req.project_name, "TASKS.md", content)
-    return PhaseResponse(
-        phase="tasks", content=content, project_name=req.project_name
+    prompt = await _phase_prompt("tasks", req)
+    return await _run_and_save(
+        "tasks", req.project_name, prompt, not req.bypass_cache,
+        req=req,
+    )
+
+
+@router.post("/tasks/stream")
+async def tasks_stream(req: TasksRequest):
+    prompt = await _phase_prompt("tasks", req)
+    return _stream_and_save(
+        "tasks", req.project_name, prompt, not req.bypass_cache,
+        req=req,
     )
 
 
 @router.post("/implement", response_model=PhaseResponse)
 async def implement(req: ImplementRequest):
-    status = get_project_status(req.project_name)
-    if not status.has_tasks:
-        raise HTTPException(400, "Execute /tasks antes de /implement")
-    task_msg = (
-        f"Implemente a tarefa #{req.task_index}"
-        if req.task_index is not None
-        else "Implemente todas as tarefas listadas."
+    prompt = await _phase_prompt("implement", req)
+    if req.parallel and req.task_index is None:
+        try:
+            content = await run_implement_parallel(
+                req.project_name, req.max_concurrency, not req.bypass_cache
+            )
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        await run_in_threadpool(
+            save_artifact, req.project_name, "IMPLEMENTATION.md", content
+        )
+        return PhaseResponse(
+            phase="implement", content=content, project_name=req.project_name
+        )
+    return await _run_and_save(
+        "implement", req.project_name, prompt, not req.bypass_cache,
+        task_index=req.task_index,
     )
-    content = await run_phase("implement", req.project_name, task_msg)
-    save_artifact(req.project_name, "IMPLEMENTATION.md", content)
-    return PhaseResponse(
-        phase="implement", content=content, project_name=req.project_name
+
+
+@router.post("/implement/stream")
+async def implement_stream(req: ImplementRequest):
+    prompt = await _phase_prompt("implement", req)
+    if req.parallel and req.task_index is None:
+        results = []
+
+        async def sections():
+            async for task, output in iter_implement_parallel(
+                req.project_name, req.max_concurrency, not req.bypass_cache
+            ):
+                results.append((task, output))
+                yield format_task_section(task, output) + "\n"
+
+        return _sse_response(
+            "implement",
+            req.project_name,
+            sections(),
+            lambda parts: merge_task_outputs(results),
+        )
+    return _stream_and_save(
+        "implement", req.project_name, prompt, not req.bypass_cache,
+        task_index=req.task_index,
     )
 
 
+# ── Pipeline completo (specify -> plan -> tasks -> implement) ────────
+
+
+@router.post("/pipeline", response_model=PipelineResult)
+async def pipeline(req: PipelineRequest):
+    """Roda as fases em cadeia, refazendo so as que tiveram entradas alteradas."""
+    try:
+        return await run_pipeline(req)
+    except PhasePreconditionError as e:
+        raise HTTPException(400, str(e))
+    except FileNotFoundError:
+        raise HTTPException(404, "Template de DP nao encontrado.")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+@router.get("/pipeline/{project_name}", response_model=PipelineResult)
+async def pipeline_state(project_name: str):
+    return await get_pipeline_state(project_name)
+
+
+@router.post("/batch")
+async def batch(req: BatchRequest):
+    """Pipeline de varios projetos; responde em NDJSON, uma linha por projeto."""
+    try:
+        validate_batch(req.projects)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    async def lines():
+        async for result in iter_batch(req.projects, req.max_concurrency):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# ── Jobs em segundo plano ────────────────────────────────────────────
+
+
+@router.post("/jobs", response_model=PhaseJob, status_code=202)
+async def create_job(body: JobRequest):
+    """Enfileira a fase e responde na hora; acompanhe por /jobs/{id}."""
+    model = PHASE_REQUESTS[body.phase][0]
+    try:
+        req = model.model_validate(body.payload)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    prompt = await _phase_prompt(body.phase, req)
+    task_index = getattr(req, "task_index", None)
+    params = {
+        "prompt": prompt,
+        "use_cache": not req.bypass_cache,
+        "task_index": task_index,
+        "parallel": getattr(req, "parallel", False) and task_index is None,
+        "max_concurrency": getattr(req, "max_concurrency", None),
+        "mode": getattr(req, "mode", "full"),
+    }
+    return await submit_phase_job(
+        body.phase, req.project_name, req.model_dump(), params
+    )
+
+
+@router.get("/jobs", response_model=list[PhaseJob])
+async def get_jobs(
+    project_name: str | None = None,
+    status: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    return await run_in_threadpool(list_jobs, project_name, status, limit)
+
+
+@router.get("/jobs/{job_id}", response_model=PhaseJob)
+async def get_phase_job(job_id: str):
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        raise HTTPException(404, "Job nao encontrado.")
+    return job
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_phase_job(job_id: str):
+    """SSE com a saida parcial do job; pode ser reaberto a qualquer momento."""
+    if await run_in_threadpool(get_job, job_id) is None:
+        raise HTTPException(404, "Job nao encontrado.")
+
+    async def events():
+        sent = 0
+        async for job in iter_job_updates(job_id):
+            if len(job.output) < sent:
+                # o job foi reiniciado (retomado apos um restart)
+                sent = 0
+                yield _sse("reset", {"status": job.status})
+            if len(job.output) > sent:
+                yield _sse("token", {"token": job.output[sent:]})
+                sent = len(job.output)
+            if job.status == "done":
+                yield _sse("done", {
+                    "phase": job.phase,
+                    "project_name": job.project_name,
+                    "artifact": PHASE_ARTIFACTS[job.phase],
+                })
+            elif job.status == "error":
+                yield _sse("error", {"detail": job.error})
+            elif job.status not in ("queued", "running"):
+                yield _sse(job.status, {"job_id": job.job_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=PhaseJob)
+async def cancel_phase_job(job_id: str):
+    job = await cancel_job(job_id)
+    if job is None:
+        raise HTTPException(404, "Job nao encontrado.")
+    return job
+
+
+# ── Cache de respostas do LLM ────────────────────────────────────────
+
+
+@router.get("/cache/stats", response_model=CacheStats)
+async def get_cache_stats():
+    return await run_in_threadpool(cache_stats)
+
+
+@router.delete("/cache")
+async def delete_cache():
+    removed = await run_in_threadpool(clear_cache)
+    return {"status": "cleared", "removed": removed}
+
+
+# ── Busca no catalogo de DPs e nos projetos ─────────────────────────
+
+
+@router.get("/search", response_model=list[SearchHit])
+async def search_design_patterns(
+    q: str = Query(..., min_length=1),
+    k: int = Query(5, ge=1, le=50),
+    source: str | None = Query(None, pattern="^(catalog|project)$"),
+):
+    return await run_in_threadpool(search, q, k, source)
+
+
 # ── Edicao manual de artefatos ───────────────────────────────────────
 
 
 @router.put("/projects/{project_name}/{artifact}")
-async def update_artifact(project_name: str, artifact: str, body: dict):
+async def update_artifact(
+    project_name: str,
+    artifact: str,
+    body: dict,
+    if_match: str | None = Header(None),
+):
+    """Com If-Match (ETag do GET do artefato), 412 se ele mudou desde entao."""
     allowed = {"ESPEC.md", "DP.md", "TASKS.md", "IMPLEMENTATION.md"}
     if artifact not in allowed:
         raise HTTPException(400, f"Artefato deve ser um de: {allowed}")
     content = body.get("content", "")
-    save_artifact(project_name, artifact, content)
-    return {"status": "saved", "artifact": artifact}
+    expected = None
+    if if_match:
+        expected = if_match.strip().removeprefix("W/").strip('"')
+    try:
+        meta = await run_in_threadpool(
+            save_artifact, project_name, artifact, content, expected
+        )
+    except PreconditionFailed:
+        raise HTTPException(
+            412,
+            f"{artifact} foi alterado desde a leitura; recarregue antes de salvar.",
+        )
+    discard_drafts(project_name, artifact)
+    return JSONResponse(
+        {"status": "saved", "artifact": artifact},
+        headers={"ETag": f'"{meta.sha256}"'},
+    )
 
 
 # ── Catalogo de Design Patterns (upload PDF/DOCX) ───────────────────
 
 
 @router.get("/dp-catalog", response_model=list[DPTemplateInfo])
-async def get_dp_catalog():
-    return list_dp_templates()
+async def get_dp_catalog(
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1, le=1000),
+):
+    templates = await run_in_threadpool(list_dp_templates, offset, limit)
+    response.headers["X-Total-Count"] = str(
+        await run_in_threadpool(count_dp_templates)
+    )
+    return templates
 
 
-@router.post("/dp-catalog/upload", response_model=DPTemplateInfo)
+@router.post("/dp-catalog/upload", response_model=DPIngestJob, status_code=202)
 async def upload_dp_template(
     file: UploadFile = File(...),
     name: str = Form(""),
@@ -149,16 +620,21 @@ async def upload_dp_template(
     file_bytes = await file.read()
     if len(file_bytes) > 20 * 1024 * 1024:
         raise HTTPException(400, "Arquivo muito grande (max 20MB).")
-    try:
-        return save_dp_template(file.filename, file_bytes, name)
-    except ValueError as e:
-        raise HTTPException(400, str(e))
+    return await submit_ingest(file.filename, file_bytes, name)
+
+
+@router.get("/dp-catalog/jobs/{job_id}", response_model=DPIngestJob)
+async def get_dp_ingest_job(job_id: str):
+    job = await run_in_threadpool(get_ingest_job, job_id)
+    if job is None:
+        raise HTTPException(404, "Job nao encontrado.")
+    return job
 
 
 @router.get("/dp-catalog/{template_id}")
 async def get_dp_template(template_id: str):
     try:
-        content = get_dp_template_content(template_id)
+        content = await run_in_threadpool(get_dp_template_content, template_id)
         return {"id": template_id, "content": content}
     except FileNotFoundError:
         raise HTTPException(404, "Template nao encontrado.")
@@ -166,7 +642,7 @@ async def get_dp_template(template_id: str):
 
 @router.delete("/dp-catalog/{template_id}")
 async def remove_dp_template(template_id: str):
-    if delete_dp_template(template_id):
+    if await run_in_threadpool(delete_dp_template, template_id):
         return {"status": "deleted", "id": template_id}
     raise HTTPException(404, "Template nao encontrado.")
 
@@ -176,12 +652,16 @@ async def remove_dp_template(template_id: str):
 
 @router.get("/projects/{project_name}/download")
 async def download_project(project_name: str):
-    status = get_project_status(project_name)
-    if not status.has_espec:
+    if not await run_in_threadpool(has_artifact, project_name, "ESPEC.md"):
         raise HTTPException(400, "Projeto sem artefatos para download.")
-    zip_buffer = build_project_zip(project_name)
+    cached = await run_in_threadpool(get_cached_zip, project_name)
+    if cached:
+        return FileResponse(
+            cached, media_type="application/zip", filename=f"{project_name}.zip"
+        )
+    # Iterador sincrono: o Starlette o consome no threadpool, fora do event loop
     return StreamingResponse(
-        zip_buffer,
+        iter_project_zip(project_name),
         media_type="application/zip",
         headers={
             "Content-Disposition": f'attachment; filename="{project_name}.zip"'
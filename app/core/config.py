@@ -5,11 +5,140 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
-SPECS_DIR = BASE_DIR / "specs"
+SPECS_DIR = Path(os.getenv("SPECS_DIR", str(BASE_DIR / "specs")))
 TEMPLATES_DIR = BASE_DIR / "app" / "templates"
+CACHE_DIR = Path(os.getenv("CACHE_DIR", str(BASE_DIR / ".cache")))
+DP_CATALOG_DIR = Path(os.getenv("DP_CATALOG_DIR", str(BASE_DIR / "dp_catalog")))
+
+# Onde ficam projetos e catalogo: "local" (SPECS_DIR/DP_CATALOG_DIR) ou
+# "s3" (bucket compartilhado entre instancias; credenciais pelas variaveis
+# AWS_* padrao). S3_ENDPOINT_URL aponta para MinIO e outros compativeis.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+STORAGE_CACHE_DIR = Path(
+    os.getenv("STORAGE_CACHE_DIR", str(CACHE_DIR / "storage"))
+)
+# Intervalo entre sincronizacoes do indice local do catalogo com o storage
+DP_CATALOG_SYNC_SECONDS = float(os.getenv("DP_CATALOG_SYNC_SECONDS", "5"))
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 APP_NAME = os.getenv("APP_NAME", "lemmAIngs")
 APP_HOST = os.getenv("APP_HOST", "0.0.0.0")
 APP_PORT = int(os.getenv("APP_PORT", "8000"))
+
+# Producao (serve.py): workers, reciclagem apos N requisicoes (0 = nunca)
+# e quanto esperar as chamadas em andamento ao desligar
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 2)))
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", "5000"))
+WEB_MAX_REQUESTS_JITTER = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "500"))
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "60"))
+# Importa LangChain e compila o grafo em segundo plano ao subir o worker
+APP_WARMUP = os.getenv("APP_WARMUP", "false").lower() == "true"
 MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+
+def _model_chain(value: str) -> list[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+# Modelos por fase, em ordem de fallback: MODEL_PLAN=gpt-4o-mini,gpt-4o.
+# Sem MODEL_<FASE>, usa MODEL_NAME seguido de MODEL_FALLBACKS.
+MODEL_FALLBACKS = _model_chain(os.getenv("MODEL_FALLBACKS", ""))
+PHASE_MODELS = {
+    phase: _model_chain(os.getenv(f"MODEL_{phase.upper()}", ""))
+    or [MODEL_NAME, *MODEL_FALLBACKS]
+    for phase in ("specify", "plan", "tasks", "implement")
+}
+PHASE_TEMPERATURES = {
+    phase: float(os.getenv(f"TEMPERATURE_{phase.upper()}", "0.3"))
+    for phase in PHASE_MODELS
+}
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+
+# Hedging: sem resposta ate o quantil de latencia da fase (janela movel das
+# ultimas chamadas), dispara a mesma chamada no proximo modelo da cadeia e
+# fica com a primeira que responder
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+IMPLEMENT_MAX_CONCURRENCY = int(os.getenv("IMPLEMENT_MAX_CONCURRENCY", "4"))
+
+# Cada worker web tem o seu pool de extracao: o padrao divide as CPUs do
+# host entre os WEB_WORKERS, para os pools somados nao passarem delas
+DP_INGEST_WORKERS = int(os.getenv(
+    "DP_INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) // WEB_WORKERS))
+))
+DP_INGEST_DB = Path(os.getenv("DP_INGEST_DB", str(CACHE_DIR / "ingest.sqlite3")))
+DP_INGEST_PAGES_PER_CHUNK = int(os.getenv("DP_INGEST_PAGES_PER_CHUNK", "8"))
+DP_CONTENT_CACHE_SIZE = int(os.getenv("DP_CONTENT_CACHE_SIZE", "256"))
+
+SEARCH_INDEX_REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "5"))
+SEARCH_CHUNK_CHARS = int(os.getenv("SEARCH_CHUNK_CHARS", "1500"))
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Orcamento de tokens dos artefatos injetados em cada fase (0 = sem limite)
+CONTEXT_BUDGETS = {
+    "plan": int(os.getenv("CONTEXT_BUDGET_PLAN", "24000")),
+    "tasks": int(os.getenv("CONTEXT_BUDGET_TASKS", "24000")),
+    "implement": int(os.getenv("CONTEXT_BUDGET_IMPLEMENT", "32000")),
+}
+# Parte do orcamento guardada para o que muda a cada pedido (recorte da
+# tarefa); os artefatos dividem o resto, sempre do mesmo tamanho
+CONTEXT_TAIL_RESERVE = int(os.getenv("CONTEXT_TAIL_RESERVE", "4000"))
+
+JOBS_DB = Path(os.getenv("JOBS_DB", str(CACHE_DIR / "jobs.sqlite3")))
+JOBS_MAX_CONCURRENCY_PER_MODEL = int(os.getenv("JOBS_MAX_CONCURRENCY_PER_MODEL", "4"))
+JOBS_RESUME_ON_STARTUP = os.getenv("JOBS_RESUME_ON_STARTUP", "true").lower() == "true"
+JOBS_STALE_SECONDS = float(os.getenv("JOBS_STALE_SECONDS", "900"))
+
+# Indice de metadados dos projetos (listagem sem varrer SPECS_DIR)
+PROJECT_INDEX_DB = Path(
+    os.getenv("PROJECT_INDEX_DB", str(CACHE_DIR / "projects.sqlite3"))
+)
+PROJECT_INDEX_WATCH = os.getenv("PROJECT_INDEX_WATCH", "true").lower() == "true"
+PROJECT_INDEX_RESCAN_SECONDS = float(os.getenv("PROJECT_INDEX_RESCAN_SECONDS", "300"))
+
+# Teto em bytes do cache de artefatos em memoria (LRU por processo)
+ARTIFACT_CACHE_MAX_BYTES = int(
+    os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+PIPELINE_CHECKPOINT_DB = Path(
+    os.getenv("PIPELINE_CHECKPOINT_DB", str(CACHE_DIR / "pipeline.sqlite3"))
+)
+
+# Cota do provedor em tokens por minuto (0 = sem limite) e reserva para a
+# resposta, ja que o tamanho dela so e conhecido no fim da chamada
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "2000"))
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# Geracao especulativa da proxima fase (specify -> plan -> tasks)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "1800"))
+
+# Precos do modelo em USD por milhao de tokens, para a metrica de custo
+LLM_PRICE_INPUT_PER_1M = float(os.getenv("LLM_PRICE_INPUT_PER_1M", "2.50"))
+LLM_PRICE_CACHED_INPUT_PER_1M = float(os.getenv("LLM_PRICE_CACHED_INPUT_PER_1M", "1.25"))
+LLM_PRICE_OUTPUT_PER_1M = float(os.getenv("LLM_PRICE_OUTPUT_PER_1M", "10.00"))
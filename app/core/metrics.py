@@ -0,0 +1,196 @@
+"""Registro de metricas em memoria, exportado no formato texto do Prometheus.
+
+Contadores e histogramas simples, sem dependencias; cada processo
+(worker do uvicorn) mantem os seus valores.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0, 120.0, 300.0,
+)
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            plain = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {total}")
+            lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# ── Metricas da aplicacao ────────────────────────────────────────────
+
+HTTP_REQUESTS = Counter(
+    "lemmaing_http_requests_total", "Requisicoes HTTP",
+    ("method", "route", "status"),
+)
+HTTP_DURATION = Histogram(
+    "lemmaing_http_request_duration_seconds",
+    "Duracao das requisicoes HTTP ate o fim do corpo",
+    ("method", "route"),
+)
+PHASE_DURATION = Histogram(
+    "lemmaing_phase_duration_seconds", "Duracao de cada no do grafo",
+    ("phase",),
+)
+PHASE_ERRORS = Counter(
+    "lemmaing_phase_errors_total", "Falhas nos nos do grafo", ("phase",),
+)
+LLM_DURATION = Histogram(
+    "lemmaing_llm_request_duration_seconds", "Duracao das chamadas ao LLM",
+    ("phase", "model"),
+)
+LLM_TTFT = Histogram(
+    "lemmaing_llm_time_to_first_token_seconds",
+    "Tempo ate o primeiro token (chamadas em streaming)",
+    ("phase", "model"),
+)
+LLM_TOKENS = Counter(
+    "lemmaing_llm_tokens_total",
+    "Tokens por tipo (prompt, prompt_cached, completion)",
+    ("phase", "model", "kind"),
+)
+LLM_COST = Counter(
+    "lemmaing_llm_cost_usd_total", "Custo estimado das chamadas ao LLM",
+    ("phase", "model"),
+)
+LLM_ERRORS = Counter(
+    "lemmaing_llm_errors_total", "Chamadas ao LLM que falharam",
+    ("phase", "model"),
+)
+LLM_FALLBACKS = Counter(
+    "lemmaing_llm_fallbacks_total",
+    "Chamadas repassadas ao proximo modelo da cadeia apos falha",
+    ("phase", "model"),
+)
+LLM_HEDGES = Counter(
+    "lemmaing_llm_hedged_requests_total",
+    "Chamadas duplicadas por demora; result=won|lost para a chamada extra",
+    ("phase", "model", "result"),
+)
+LLM_CACHE = Counter(
+    "lemmaing_llm_response_cache_total", "Consultas ao cache de respostas",
+    ("phase", "result"),
+)
+PREFETCH = Counter(
+    "lemmaing_prefetch_total",
+    "Rascunhos especulativos (started, hit, miss, discarded, error)",
+    ("phase", "result"),
+)
+ARTIFACT_PATCH = Counter(
+    "lemmaing_artifact_patch_total",
+    "Atualizacoes por patch (applied, noop, fallback)",
+    ("phase", "result"),
+)
+ARTIFACT_IO = Histogram(
+    "lemmaing_artifact_io_seconds", "Leitura/escrita de artefatos em disco",
+    ("op",),
+)
+DP_EXTRACTION = Histogram(
+    "lemmaing_dp_extraction_seconds", "Extracao de texto de templates de DP",
+    ("kind", "status"),
+)
+ZIP_BUILD = Histogram(
+    "lemmaing_zip_build_seconds",
+    "Tempo gasto gerando o ZIP (sem a espera pelo cliente)",
+)
+ZIP_CACHE = Counter(
+    "lemmaing_zip_cache_total", "Downloads servidos do cache de ZIP",
+    ("result",),
+)
+ZIP_BYTES = Counter("lemmaing_zip_bytes_total", "Bytes de ZIP gerados")
@@ -59,3 +59,24 @@ O formato de saida deve incluir:
 3. Instrucoes de integracao (se necessario)
 
 Escreva comentarios em portugues brasileiro."""
+
+
+UPDATE_SYSTEM = """Voce mantem um artefato de um projeto spec-driven ({artifact}).
+Os artefatos dos quais ele deriva mudaram desde a ultima geracao; voce recebe
+o {artifact} atual e o diff dessas mudancas. Atualize so o que o diff afeta.
+
+Responda APENAS com um patch por secao, neste formato:
+
+@@ REPLACE <heading exato da secao>
+<secao completa nova, comecando pelo heading, incluindo subsecoes>
+@@ INSERT AFTER <heading exato da secao>
+<secao nova, comecando pelo heading>
+@@ DELETE <heading exato da secao>
+@@ APPEND
+<secao nova no fim do documento, comecando pelo heading>
+@@ END
+
+Uma secao vai do heading ate o proximo heading de nivel igual ou superior.
+Use os headings exatamente como aparecem no {artifact} atual. Nao repita
+secoes que nao mudam. Se nada precisar mudar, responda apenas @@ NOOP.
+Escreva em portugues brasileiro, no mesmo estilo do documento."""
@@ -0,0 +1,55 @@
+import json
+import logging
+import time
+
+from app.core.metrics import HTTP_DURATION, HTTP_REQUESTS
+
+logger = logging.getLogger("app.timing")
+
+
+class TimingMiddleware:
+    """Mede cada requisicao HTTP e grava uma linha de log estruturada (JSON).
+
+    ASGI puro, para nao bufferizar respostas em streaming: o tempo ate o
+    inicio da resposta (ttfb) e o total ate o ultimo byte sao medidos
+    separadamente.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        ttfb = None
+
+        async def timed_send(message):
+            nonlocal status, ttfb
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                ttfb = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Rota com os parametros ({project_name}), para nao explodir a
+            # cardinalidade das metricas com um rotulo por projeto
+            route = getattr(scope.get("route"), "path", None) or "desconhecida"
+            HTTP_REQUESTS.inc(
+                method=scope["method"], route=route, status=str(status)
+            )
+            HTTP_DURATION.observe(elapsed, method=scope["method"], route=route)
+            logger.info(json.dumps({
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "ttfb_ms": round(ttfb * 1000, 1) if ttfb is not None else None,
+                "duration_ms": round(elapsed * 1000, 1),
+            }))
@@ -1,11 +1,65 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.api.routes import router
-from app.core.config import APP_NAME, TEMPLATES_DIR, BASE_DIR
+from app.agents.llm_registry import aclose_llm_clients
+from app.agents.pipeline import aclose_pipeline
+from app.agents.spec_agent import warm_up
+from app.services.dp_catalog_service import (
+    start_catalog_sync,
+    stop_catalog_sync,
+)
+from app.services.ingest_service import shutdown_ingest_pool
+from app.services.job_service import drain_jobs, resume_jobs, suspend_jobs
+from app.services.prefetch_service import cancel_all_drafts
+from app.services.project_service import (
+    start_project_watcher,
+    stop_project_watcher,
+)
+from app.core.config import (
+    APP_NAME,
+    APP_WARMUP,
+    TEMPLATES_DIR,
+    BASE_DIR,
+    LOG_LEVEL,
+    SHUTDOWN_GRACE_SECONDS,
+)
+from app.core.metrics import render_metrics
+from app.core.timing import TimingMiddleware
+
+logging.basicConfig(
+    level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if APP_WARMUP:
+        # em thread, para o worker ja aceitar requisicoes enquanto isso
+        app.state.warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    await resume_jobs()
+    start_project_watcher()
+    start_catalog_sync()
+    yield
+    await stop_catalog_sync()
+    await stop_project_watcher()
+    cancel_all_drafts()
+    # o servidor ja esperou as requisicoes abertas; os jobs em segundo
+    # plano tem o mesmo prazo antes de voltarem para a fila
+    await drain_jobs(SHUTDOWN_GRACE_SECONDS)
+    await suspend_jobs()
+    await aclose_pipeline()
+    await aclose_llm_clients()
+    shutdown_ingest_pool()
 
-app = FastAPI(title=APP_NAME, version="1.0.0")
+
+app = FastAPI(title=APP_NAME, version="1.0.0", lifespan=lifespan)
+app.add_middleware(TimingMiddleware)
 app.include_router(router)
 
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
@@ -28,3 +82,10 @@ async def tutorial(request: Request):
 @app.get("/health")
 async def health():
     return {"status": "ok", "app": APP_NAME}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
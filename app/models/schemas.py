@@ -1,9 +1,15 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field
 
 
 class SpecifyRequest(BaseModel):
     project_name: str
     description: str
+    bypass_cache: bool = False
+    # Gera o DP.md em segundo plano com a ultima stack usada no projeto
+    # (None = PREFETCH_ENABLED)
+    prefetch: bool | None = None
 
 
 class PlanRequest(BaseModel):
@@ -11,15 +17,28 @@ class PlanRequest(BaseModel):
     stack: str
     constraints: str = ""
     dp_template_id: str | None = None
+    # Se definido, injeta so os k trechos mais relevantes em vez do DP inteiro
+    dp_top_k: int | None = Field(default=None, ge=1, le=50)
+    bypass_cache: bool = False
+    # "update": aplica ao DP.md atual so as mudancas da ESPEC.md desde a
+    # ultima geracao, em vez de regerar o documento inteiro
+    mode: Literal["full", "update"] = "full"
+    # Gera o TASKS.md em segundo plano (None = PREFETCH_ENABLED)
+    prefetch: bool | None = None
 
 
 class TasksRequest(BaseModel):
     project_name: str
+    bypass_cache: bool = False
+    mode: Literal["full", "update"] = "full"
 
 
 class ImplementRequest(BaseModel):
     project_name: str
     task_index: int | None = None
+    bypass_cache: bool = False
+    parallel: bool = False
+    max_concurrency: int | None = Field(default=None, ge=1)
 
 
 class PhaseResponse(BaseModel):
@@ -42,8 +61,128 @@ class ProjectStatus(BaseModel):
     implementation_content: str = ""
 
 
+class ArtifactMeta(BaseModel):
+    name: str
+    exists: bool
+    size: int = 0
+    mtime: float | None = None
+    sha256: str | None = None
+
+
+class ProjectMeta(BaseModel):
+    project_name: str
+    has_espec: bool
+    has_dp: bool
+    has_plan: bool
+    has_tasks: bool
+    has_implementation: bool
+    artifacts: dict[str, ArtifactMeta]
+
+
+class ProjectSummary(BaseModel):
+    project_name: str
+    # Ultima fase concluida: new, specify, plan, tasks ou implement
+    stage: str
+    has_espec: bool = False
+    has_dp: bool = False
+    has_plan: bool = False
+    has_tasks: bool = False
+    has_implementation: bool = False
+    total_size: int = 0
+    updated_at: float | None = None
+    artifacts: dict[str, ArtifactMeta] = {}
+
+
 class DPTemplateInfo(BaseModel):
     id: str
     name: str
     filename: str
     preview: str
+
+
+class DPIngestJob(BaseModel):
+    job_id: str
+    filename: str
+    status: str  # queued | running | done | error
+    created_at: float
+    updated_at: float
+    template: DPTemplateInfo | None = None
+    error: str | None = None
+
+
+class CacheStats(BaseModel):
+    enabled: bool
+    entries: int
+    bytes: int = 0
+    hits: int
+    misses: int
+    stores: int
+    evictions: int
+    prompt_tokens: int = 0
+    prompt_cached_tokens: int = 0
+
+
+class SearchHit(BaseModel):
+    source: str  # catalog | project
+    source_id: str
+    name: str
+    heading: str
+    score: float
+    text: str
+
+
+class JobRequest(BaseModel):
+    phase: Literal["specify", "plan", "tasks", "implement"]
+    # Corpo da rota da fase (SpecifyRequest, PlanRequest, ...)
+    payload: dict
+
+
+class PhaseJob(BaseModel):
+    job_id: str
+    project_name: str
+    phase: str
+    status: str  # queued | running | done | error | cancelled | interrupted
+    model: str
+    created_at: float
+    updated_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    output: str = ""
+    error: str | None = None
+    deduplicated: bool = False
+
+
+PipelinePhase = Literal["specify", "plan", "tasks", "implement"]
+
+
+class PipelineRequest(BaseModel):
+    project_name: str
+    # Campos omitidos reaproveitam os valores da execucao anterior
+    description: str | None = None
+    stack: str | None = None
+    constraints: str | None = None
+    dp_template_id: str | None = None
+    dp_top_k: int | None = Field(default=None, ge=1, le=50)
+    parallel: bool | None = None
+    max_concurrency: int | None = Field(default=None, ge=1)
+    bypass_cache: bool = False
+    force: list[PipelinePhase] = []
+
+
+class PipelineResult(BaseModel):
+    project_name: str
+    phases: dict[str, str]  # fase -> ran | skipped
+    fingerprints: dict[str, str] = {}
+
+
+class BatchRequest(BaseModel):
+    projects: list[PipelineRequest] = Field(min_length=1)
+    max_concurrency: int | None = Field(default=None, ge=1)
+
+
+class BatchItemResult(BaseModel):
+    project_name: str
+    status: str  # done | error
+    phases: dict[str, str] = {}
+    error: str | None = None
+    elapsed_seconds: float
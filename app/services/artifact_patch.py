@@ -0,0 +1,182 @@
+"""Patches por secao para atualizar DP.md/TASKS.md sem regerar o documento.
+
+Formato pedido ao modelo (ver UPDATE_SYSTEM):
+
+    @@ REPLACE ## 2. Stack Tecnologica
+    ## 2. Stack Tecnologica
+    ...conteudo novo da secao, com as subsecoes...
+    @@ INSERT AFTER ### T004 - Cadastro
+    ### T005 - Nova tarefa
+    ...
+    @@ DELETE ### T009 - Exportar CSV
+    @@ APPEND
+    ## Nova secao no fim
+    @@ END
+
+Uma secao e o heading e tudo ate o proximo heading de nivel igual ou
+superior, entao substituir `## X` substitui tambem as subsecoes. Sem
+mudancas a fazer, o modelo responde `@@ NOOP`.
+"""
+import difflib
+import re
+from dataclasses import dataclass
+
+from app.services.tasks_parser import parse_tasks, topological_order
+
+_HEADING = re.compile(r"^(#{1,6})\s+\S")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_OP = re.compile(r"^@@\s*(REPLACE|INSERT AFTER|DELETE|APPEND|NOOP|END)\b\s*(.*)$")
+
+
+class PatchError(ValueError):
+    """Patch mal formado ou que nao se aplica ao documento atual."""
+
+
+@dataclass
+class PatchOp:
+    action: str   # REPLACE, INSERT AFTER, DELETE ou APPEND
+    target: str   # heading alvo (vazio no APPEND)
+    body: str
+
+
+def upstream_diff(label: str, base: str, current: str) -> str:
+    """Diff unificado do artefato anterior desde a ultima geracao."""
+    return "\n".join(difflib.unified_diff(
+        base.splitlines(),
+        current.splitlines(),
+        fromfile=f"{label} (versao usada na ultima geracao)",
+        tofile=f"{label} (versao atual)",
+        lineterm="",
+        n=2,
+    ))
+
+
+def _normalize(heading: str) -> str:
+    return " ".join(heading.strip().lstrip("#").replace("*", "").split()).lower()
+
+
+def _sections(lines: list[str]) -> list[tuple[int, int, str]]:
+    """(inicio, fim, heading normalizado) de cada secao, fora de blocos de codigo."""
+    headings = []
+    in_fence = False
+    for i, line in enumerate(lines):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and (match := _HEADING.match(line)):
+            headings.append((i, len(match.group(1)), _normalize(line)))
+    sections = []
+    for n, (start, level, name) in enumerate(headings):
+        end = next(
+            (s for s, lvl, _ in headings[n + 1:] if lvl <= level), len(lines)
+        )
+        sections.append((start, end, name))
+    return sections
+
+
+def parse_patch(text: str) -> list[PatchOp] | None:
+    """Le o patch do modelo; None quando ele indica que nada muda."""
+    lines = text.strip().splitlines()
+    if len(lines) >= 2 and _FENCE.match(lines[0]) and _FENCE.match(lines[-1]):
+        lines = lines[1:-1]
+
+    ops: list[PatchOp] = []
+    current: PatchOp | None = None
+    body: list[str] = []
+    noop = False
+
+    def close():
+        if current is not None:
+            current.body = "\n".join(body).strip("\n")
+            ops.append(current)
+
+    for line in lines:
+        match = _OP.match(line)
+        if not match:
+            body.append(line)  # texto antes do primeiro @@ e ignorado
+            continue
+        close()
+        current, body = None, []
+        action, target = match.group(1), match.group(2).strip()
+        if action == "END":
+            break
+        if action == "NOOP":
+            noop = True
+            continue
+        if action != "APPEND" and not target:
+            raise PatchError(f"@@ {action} sem heading alvo")
+        current = PatchOp(action, target, "")
+    close()
+
+    if not ops:
+        if noop:
+            return None
+        raise PatchError("resposta sem operacoes @@")
+    for op in ops:
+        if op.action == "DELETE":
+            continue
+        if not op.body.strip():
+            raise PatchError(f"@@ {op.action} {op.target} sem conteudo")
+        first = op.body.lstrip("\n").splitlines()[0]
+        if not _HEADING.match(first):
+            raise PatchError(
+                f"@@ {op.action} {op.target}: o conteudo deve comecar por um heading"
+            )
+    return ops
+
+
+def _find(lines: list[str], target: str) -> tuple[int, int]:
+    wanted = _normalize(target)
+    matches = [(s, e) for s, e, name in _sections(lines) if name == wanted]
+    if not matches:
+        raise PatchError(f"secao nao encontrada: {target}")
+    if len(matches) > 1:
+        raise PatchError(f"heading repetido no documento: {target}")
+    return matches[0]
+
+
+def _join(*parts: list[str]) -> list[str]:
+    """Emenda os trechos com exatamente uma linha em branco entre eles."""
+    joined: list[str] = []
+    for part in parts:
+        while part and not part[0].strip():
+            part = part[1:]
+        while part and not part[-1].strip():
+            part = part[:-1]
+        if part:
+            joined.extend(([""] if joined else []) + part)
+    return joined
+
+
+def apply_patch(document: str, ops: list[PatchOp]) -> str:
+    """Aplica as operacoes em ordem; levanta PatchError se alguma nao casar."""
+    lines = document.strip("\n").splitlines()
+    # artefatos gerados as vezes vem inteiros dentro de ```markdown
+    wrapper = None
+    if len(lines) >= 2 and _FENCE.match(lines[0]) and _FENCE.match(lines[-1]):
+        wrapper, lines = (lines[0], lines[-1]), lines[1:-1]
+    for op in ops:
+        new = op.body.splitlines()
+        if op.action == "APPEND":
+            lines = _join(lines, new)
+            continue
+        start, end = _find(lines, op.target)
+        if op.action == "REPLACE":
+            lines = _join(lines[:start], new, lines[end:])
+        elif op.action == "INSERT AFTER":
+            lines = _join(lines[:end], new, lines[end:])
+        else:  # DELETE
+            lines = _join(lines[:start], lines[end:])
+    if wrapper:
+        lines = [wrapper[0], *lines, wrapper[1]]
+    return "\n".join(lines) + "\n"
+
+
+def check_tasks(document: str) -> None:
+    """O TASKS.md atualizado ainda precisa ter tarefas e dependencias sem ciclo."""
+    tasks = parse_tasks(document)
+    if not tasks:
+        raise PatchError("TASKS.md ficou sem tarefas")
+    try:
+        topological_order(tasks)
+    except ValueError as e:
+        raise PatchError(str(e))
@@ -0,0 +1,57 @@
+import asyncio
+import time
+from typing import AsyncIterator
+
+from app.core.config import BATCH_MAX_CONCURRENCY
+from app.models.schemas import PipelineRequest, BatchItemResult
+from app.agents.pipeline import run_pipeline
+
+
+def validate_batch(projects: list[PipelineRequest]):
+    seen = set()
+    for req in projects:
+        if req.project_name in seen:
+            raise ValueError(f"Projeto repetido no lote: {req.project_name}")
+        seen.add(req.project_name)
+
+
+async def _run_one(
+    req: PipelineRequest, semaphore: asyncio.Semaphore
+) -> BatchItemResult:
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            result = await run_pipeline(req)
+        except Exception as e:
+            return BatchItemResult(
+                project_name=req.project_name,
+                status="error",
+                error=str(e) or type(e).__name__,
+                elapsed_seconds=round(time.perf_counter() - start, 3),
+            )
+        return BatchItemResult(
+            project_name=req.project_name,
+            status="done",
+            phases=result.phases,
+            elapsed_seconds=round(time.perf_counter() - start, 3),
+        )
+
+
+async def iter_batch(
+    projects: list[PipelineRequest], max_concurrency: int | None = None
+) -> AsyncIterator[BatchItemResult]:
+    """Roda o pipeline de varios projetos, emitindo cada resultado ao terminar.
+
+    No maximo `max_concurrency` projetos ficam em andamento; as chamadas
+    ao LLM de todos eles ainda dividem o limite global do llm_slot e a
+    cota de tokens por minuto (LLM_TOKENS_PER_MINUTE).
+    """
+    validate_batch(projects)
+    semaphore = asyncio.Semaphore(max_concurrency or BATCH_MAX_CONCURRENCY)
+    tasks = [asyncio.create_task(_run_one(req, semaphore)) for req in projects]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for task in tasks:
+            task.cancel()
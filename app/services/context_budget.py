@@ -0,0 +1,248 @@
+import logging
+import re
+from functools import lru_cache
+
+from app.core.config import MODEL_NAME, CONTEXT_BUDGETS, CONTEXT_TAIL_RESERVE
+from app.services.tasks_parser import parse_tasks
+
+logger = logging.getLogger(__name__)
+
+_HEADING = re.compile(r"^#{1,3}\s+\S")
+# Linhas que declaram a interface de um arquivo de codigo, em linguagens
+# comuns: funcoes, classes, tipos, exports
+_SIGNATURE = re.compile(
+    r"^\s*(?:export\s+|public\s+|pub\s+|async\s+)*"
+    r"(?:def|class|function|interface|type|struct|enum|trait|fn|func|const"
+    r"|module\.exports)\b"
+)
+_FENCE = re.compile(r"^\s*(```|~~~)")
+OMITTED = "_(secao omitida por limite de contexto)_"
+MIN_PARTIAL_TOKENS = 64
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """Encoder do tiktoken para o modelo, ou None se indisponivel/offline."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(MODEL_NAME)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            return None
+    except Exception:
+        # o tiktoken baixa o vocabulario na primeira vez; sem rede, estima
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoder = _encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def split_sections(text: str) -> list[str]:
+    """Quebra o markdown nos headings #..### fora de blocos de codigo."""
+    sections: list[list[str]] = [[]]
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and _HEADING.match(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+    return ["".join(s) for s in sections if s]
+
+
+def _placeholder(section: str) -> str:
+    first = section.splitlines()[0] if section.strip() else ""
+    if _HEADING.match(first):
+        return f"{first.rstrip()}\n\n{OMITTED}\n\n"
+    return ""
+
+
+def select_sections(text: str, budget: int) -> str:
+    """Reduz o artefato ao orcamento mantendo as secoes na ordem do texto.
+
+    A primeira secao (titulo/visao geral) entra primeiro, depois as
+    seguintes enquanto couberem. Secoes que nao cabem viram so o heading,
+    para o modelo saber que existem.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    sections = split_sections(text)
+    costs = [count_tokens(s) for s in sections]
+    placeholders = [_placeholder(s) for s in sections]
+    placeholder_costs = [count_tokens(p) for p in placeholders]
+
+    remaining = budget - sum(placeholder_costs)
+    chosen = list(placeholders)
+    for i in range(len(sections)):
+        extra = costs[i] - placeholder_costs[i]
+        if extra <= remaining:
+            chosen[i] = sections[i]
+            remaining -= extra
+        elif remaining - placeholder_costs[i] > MIN_PARTIAL_TOKENS:
+            # Secao grande demais: entra o inicio, paragrafo a paragrafo
+            partial = _truncate(sections[i], remaining + placeholder_costs[i])
+            if partial:
+                chosen[i] = partial
+                remaining -= count_tokens(partial) - placeholder_costs[i]
+    return "".join(chosen)
+
+
+def _truncate(section: str, budget: int) -> str:
+    kept, used = [], count_tokens(OMITTED)
+    for paragraph in section.split("\n\n"):
+        cost = count_tokens(paragraph + "\n\n")
+        if used + cost > budget:
+            break
+        kept.append(paragraph)
+        used += cost
+    if not kept:
+        return ""
+    return "\n\n".join(kept) + f"\n\n{OMITTED}\n\n"
+
+
+def task_slice(tasks_md: str, task_index: int) -> str | None:
+    """So a tarefa pedida e suas dependencias (transitivas) do TASKS.md."""
+    tasks = parse_tasks(tasks_md)
+    by_id = {t["id"]: t for t in tasks}
+    target = next(
+        (t for t in tasks if int(t["id"][1:]) == task_index), None
+    )
+    if target is None:
+        return None
+
+    needed: list[str] = []
+
+    def visit(task_id: str):
+        for dep in by_id[task_id]["depends_on"]:
+            if dep not in needed:
+                visit(dep)
+                needed.append(dep)
+
+    visit(target["id"])
+    parts = [
+        f"### {by_id[d]['id']} - {by_id[d]['title']} (dependencia)\n\n"
+        f"{by_id[d]['body']}\n"
+        for d in needed
+    ]
+    parts.append(f"### {target['id']} - {target['title']}\n\n{target['body']}\n")
+    return "\n".join(parts)
+
+
+def build_context(
+    phase: str,
+    frozen: list[tuple[str, str]],
+    volatile: list[tuple[str, str]] | None = None,
+    budget: int | None = None,
+) -> tuple[str, str, int, int]:
+    """Monta os blocos de artefatos da fase dentro do orcamento de tokens.
+
+    `frozen` sao os artefatos do projeto, que formam o prefixo estavel do
+    prompt. Eles dividem o orcamento menos CONTEXT_TAIL_RESERVE, um valor
+    fixo: a selecao de secoes nao depende do pedido, entao o prefixo se
+    repete entre chamadas (ex.: entre as tarefas do implement) e aproveita
+    o cache do provedor. `volatile` (ex.: o recorte da tarefa) entra
+    inteiro, na reserva. Retorna (prefixo, volatil, tokens_originais,
+    tokens_finais).
+    """
+    volatile = volatile or []
+    if budget is None:
+        budget = CONTEXT_BUDGETS.get(phase, 0)
+    frozen_budget = _frozen_budget(budget)
+    volatile_tokens = sum(count_tokens(text) for _, text in volatile)
+    sizes = [count_tokens(text) for _, text in frozen]
+    original = sum(sizes) + volatile_tokens
+    texts = [text for _, text in frozen]
+    # So o orcamento fixo decide o corte, nunca o tamanho de `volatile`
+    if budget and sum(sizes) > frozen_budget:
+        # Do menor para o maior: os pequenos entram inteiros e a sobra de
+        # cada um passa para os seguintes
+        remaining = frozen_budget
+        order = sorted(range(len(texts)), key=lambda i: sizes[i])
+        for n, i in enumerate(order):
+            share = remaining // (len(texts) - n)
+            texts[i] = select_sections(texts[i], share)
+            remaining -= count_tokens(texts[i])
+    prefix = _format_artifacts(
+        [(label, text) for (label, _), text in zip(frozen, texts)]
+    )
+    final = sum(count_tokens(text) for text in texts) + volatile_tokens
+    return prefix, _format_artifacts(volatile), original, final
+
+
+def _frozen_budget(budget: int) -> int:
+    return max(budget - CONTEXT_TAIL_RESERVE, budget // 2)
+
+
+def tail_budget(phase: str) -> int | None:
+    """Tokens para a parte variavel do prompt da fase; None = sem limite."""
+    budget = CONTEXT_BUDGETS.get(phase, 0)
+    return budget - _frozen_budget(budget) if budget else None
+
+
+def code_signatures(code: str) -> str:
+    """So os cabecalhos de arquivo e as linhas de assinatura do codigo."""
+    kept = [
+        line for line in code.splitlines(keepends=True)
+        if _HEADING.match(line) or line.lstrip().startswith("**")
+        or _FENCE.match(line) or _SIGNATURE.match(line)
+    ]
+    return "".join(kept)
+
+
+def fit_dependency_code(
+    outputs: list[tuple[str, str]], budget: int | None
+) -> list[tuple[str, str]]:
+    """Encaixa o codigo das dependencias em `budget` tokens.
+
+    Como em build_context, do menor para o maior, cada um com a sua parte
+    da sobra. O que nao cabe inteiro fica so com as assinaturas; se nem
+    elas cabem, com o inicio delas.
+    """
+    if budget is None:
+        return outputs
+    texts = [code for _, code in outputs]
+    sizes = [count_tokens(code) for code in texts]
+    remaining = max(0, budget)
+    order = sorted(range(len(texts)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        share = remaining // (len(texts) - n)
+        if sizes[i] > share:
+            texts[i] = _fit_signatures(texts[i], share)
+        remaining -= count_tokens(texts[i])
+    return [(name, text) for (name, _), text in zip(outputs, texts)]
+
+
+def _fit_signatures(code: str, budget: int) -> str:
+    note = "_(codigo resumido as assinaturas por limite de contexto)_\n"
+    kept, used = [], count_tokens(note)
+    for line in code_signatures(code).splitlines(keepends=True):
+        cost = count_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if sum(1 for line in kept if _FENCE.match(line)) % 2:
+        kept.append("```\n")  # fecha o bloco cortado no meio
+    return note + "".join(kept)
+
+
+def _format_artifacts(artifacts: list[tuple[str, str]]) -> str:
+    return "".join(f"## {label}:\n\n{text}\n\n" for label, text in artifacts)
+
+
+def log_context_savings(
+    phase: str, project_name: str, original: int, final: int
+):
+    logger.info(
+        "contexto %s/%s: %d -> %d tokens (%d economizados)",
+        project_name, phase, original, final, original - final,
+    )
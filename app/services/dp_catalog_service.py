@@ -1,34 +1,223 @@
+import asyncio
 import json
 import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from PyPDF2 import PdfReader
-from docx import Document
 
-from app.core.config import BASE_DIR
+from app.core.config import (
+    CACHE_DIR,
+    DP_CATALOG_DIR,
+    DP_CATALOG_SYNC_SECONDS,
+    DP_CONTENT_CACHE_SIZE,
+    STORAGE_BACKEND,
+)
 from app.models.schemas import DPTemplateInfo
+from app.services.storage import LocalStorage, PreconditionFailed, get_storage
 
-CATALOG_DIR = BASE_DIR / "dp_catalog"
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR = DP_CATALOG_DIR
 CATALOG_INDEX = CATALOG_DIR / "_index.json"
+# O indice SQLite e so para consulta; a fonte de verdade sao os arquivos
+# <id>.meta.json no storage. No S3 cada instancia tem o seu indice.
+CATALOG_DB = (
+    CATALOG_DIR / "_catalog.sqlite3" if STORAGE_BACKEND == "local"
+    else CACHE_DIR / "dp_catalog.sqlite3"
+)
+META_SUFFIX = ".meta.json"
+_COLUMNS = (
+    "id", "name", "filename", "original_file", "md_file", "preview",
+    "created_at", "etag",
+)
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+# LRU dos markdowns extraidos: id -> conteudo
+_content_cache: "OrderedDict[str, str]" = OrderedDict()
+_catalog = get_storage("dp_catalog")
+_synced = False
+_sync_lock = threading.Lock()
+_syncer: asyncio.Task | None = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Conexao unica do processo; criada sob `_lock`."""
+    global _conn
+    if _conn is None:
+        CATALOG_DB.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(CATALOG_DB), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS templates ("
+            " id TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " original_file TEXT NOT NULL,"
+            " md_file TEXT NOT NULL,"
+            " preview TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " etag TEXT)"
+        )
+        columns = {
+            row[1] for row in conn.execute("PRAGMA table_info(templates)")
+        }
+        if "etag" not in columns:
+            # indices anteriores ao storage: o etag fica NULL ate a
+            # primeira sincronizacao publicar o .meta.json do template
+            conn.execute("ALTER TABLE templates ADD COLUMN etag TEXT")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_templates_created"
+            " ON templates (created_at, id)"
+        )
+        _import_legacy_index(conn)
+        conn.commit()
+        _conn = conn
+    return _conn
+
 
+def _upsert(conn: sqlite3.Connection, record: dict, etag: str | None):
+    conn.execute(
+        f"INSERT OR REPLACE INTO templates ({', '.join(_COLUMNS)})"
+        f" VALUES ({', '.join('?' * len(_COLUMNS))})",
+        tuple({**record, "etag": etag}[c] for c in _COLUMNS),
+    )
 
-def _ensure_catalog():
-    CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+
+def _import_legacy_index(conn: sqlite3.Connection):
+    """Migra o antigo _index.json para o SQLite na primeira abertura."""
     if not CATALOG_INDEX.exists():
-        CATALOG_INDEX.write_text("[]", encoding="utf-8")
+        return
+    if conn.execute("SELECT 1 FROM templates LIMIT 1").fetchone():
+        return
+    entries = json.loads(CATALOG_INDEX.read_text(encoding="utf-8") or "[]")
+    for position, e in enumerate(entries):
+        _upsert(conn, {**e, "created_at": float(position)}, None)
 
 
-def _load_index() -> list[dict]:
-    _ensure_catalog()
-    return json.loads(CATALOG_INDEX.read_text(encoding="utf-8"))
+def _publish(record: dict) -> str:
+    """Grava os metadados do template no storage; devolve o ETag."""
+    data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+    return _catalog.write(record["id"] + META_SUFFIX, data).etag
 
 
-def _save_index(index: list[dict]):
-    _ensure_catalog()
-    CATALOG_INDEX.write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+def _sync_catalog():
+    """Alinha o indice local com os .meta.json do storage.
+
+    Varre o storage inteiro: roda uma vez por processo (na primeira
+    consulta) e, no S3, em segundo plano a cada DP_CATALOG_SYNC_SECONDS.
+    As escritas deste modulo atualizam o indice direto, sem varredura.
+    """
+    # O indice e lido antes da listagem: um template gravado no meio
+    # aparece na listagem e entra, em vez de ser tomado por removido
+    with _lock:
+        rows = _get_conn().execute("SELECT * FROM templates").fetchall()
+    local = {row["id"]: row for row in rows}
+    remote = {
+        st.key[:-len(META_SUFFIX)]: st.etag
+        for st in _catalog.list_objects()
+        if st.key.endswith(META_SUFFIX) and "/" not in st.key
+    }
+
+    updates = []
+    for template_id, etag in remote.items():
+        row = local.get(template_id)
+        if row is not None and row["etag"] == etag:
+            continue
+        result = _catalog.read(template_id + META_SUFFIX)
+        if result is not None:
+            updates.append((json.loads(result[0]), result[1].etag))
+    for template_id, row in local.items():
+        if template_id not in remote and row["etag"] is None:
+            record = {c: row[c] for c in _COLUMNS if c != "etag"}
+            updates.append((record, _publish(record)))
+    gone = [
+        template_id for template_id, row in local.items()
+        if template_id not in remote and row["etag"] is not None
+    ]
+    if not updates and not gone:
+        return
+    with _lock:
+        conn = _get_conn()
+        for record, etag in updates:
+            _upsert(conn, record, etag)
+        for template_id in gone:
+            conn.execute("DELETE FROM templates WHERE id = ?", (template_id,))
+            _content_cache.pop(template_id, None)
+        conn.commit()
+    for template_id in gone:
+        row = local[template_id]
+        for key in (template_id + META_SUFFIX, row["original_file"], row["md_file"]):
+            if key:
+                _catalog.forget(key)
+
+
+def _ensure_synced():
+    """Sincroniza na primeira consulta do processo; depois, nada."""
+    global _synced
+    if _synced:
+        return
+    with _sync_lock:
+        if not _synced:
+            _sync_catalog()
+            _synced = True
+
+
+async def _sync_in_background(periodic: bool):
+    try:
+        await asyncio.to_thread(_ensure_synced)
+    except Exception:
+        logger.exception("falha ao sincronizar o catalogo de DPs")
+    while periodic:
+        await asyncio.sleep(DP_CATALOG_SYNC_SECONDS)
+        try:
+            await asyncio.to_thread(_sync_catalog)
+        except Exception:
+            logger.exception("falha ao sincronizar o catalogo de DPs")
+
+
+def start_catalog_sync():
+    """Sincroniza o indice na partida, fora das requisicoes.
+
+    No S3 continua em segundo plano, para ver o que outras instancias
+    gravam. No disco local todas as escritas passam por este modulo e o
+    indice SQLite e compartilhado entre os workers: basta a primeira.
+    """
+    global _syncer
+    if _syncer is None or _syncer.done():
+        _syncer = asyncio.create_task(
+            _sync_in_background(not isinstance(_catalog, LocalStorage))
+        )
+
+
+async def stop_catalog_sync():
+    global _syncer
+    if _syncer is None:
+        return
+    _syncer.cancel()
+    try:
+        await _syncer
+    except asyncio.CancelledError:
+        pass
+    _syncer = None
+
+
+def _cache_content(template_id: str, content: str):
+    with _lock:
+        _content_cache[template_id] = content
+        _content_cache.move_to_end(template_id)
+        while len(_content_cache) > DP_CONTENT_CACHE_SIZE:
+            _content_cache.popitem(last=False)
 
 
 def extract_text_from_pdf(file_bytes: bytes) -> str:
     import io
+    from PyPDF2 import PdfReader
     reader = PdfReader(io.BytesIO(file_bytes))
     pages = []
     for page in reader.pages:
@@ -40,6 +229,7 @@ def extract_text_from_pdf(file_bytes: bytes) -> str:
 
 def extract_text_from_docx(file_bytes: bytes) -> str:
     import io
+    from docx import Document
     doc = Document(io.BytesIO(file_bytes))
     paragraphs = []
     for para in doc.paragraphs:
@@ -53,81 +243,175 @@ def extract_text_from_docx(file_bytes: bytes) -> str:
     return "\n\n".join(paragraphs)
 
 
-def save_dp_template(filename: str, file_bytes: bytes, name: str) -> DPTemplateInfo:
-    _ensure_catalog()
+def count_pdf_pages(path: Path) -> int:
+    from PyPDF2 import PdfReader
+    return len(PdfReader(str(path)).pages)
 
-    ext = Path(filename).suffix.lower()
-    if ext == ".pdf":
-        text_content = extract_text_from_pdf(file_bytes)
-    elif ext in (".docx", ".doc"):
-        text_content = extract_text_from_docx(file_bytes)
-    else:
-        raise ValueError(f"Formato nao suportado: {ext}. Use PDF ou DOCX.")
 
-    template_id = hashlib.md5(file_bytes).hexdigest()[:12]
+def extract_pdf_pages(path: Path, start: int, end: int) -> list[str]:
+    """Extrai o texto das paginas [start, end) de um PDF ja salvo em disco."""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(str(path))
+    pages = []
+    for page in reader.pages[start:end]:
+        text = page.extract_text()
+        if text:
+            pages.append(text)
+    return pages
 
-    original_path = CATALOG_DIR / f"{template_id}_{filename}"
-    original_path.write_bytes(file_bytes)
 
-    md_path = CATALOG_DIR / f"{template_id}.md"
-    md_path.write_text(text_content, encoding="utf-8")
+def template_id_for(file_bytes: bytes) -> str:
+    return hashlib.md5(file_bytes).hexdigest()[:12]
+
+
+def save_original_file(
+    template_id: str, filename: str, file_bytes: bytes
+) -> bool:
+    """Grava o arquivo original; False se ele ja existia.
+
+    O id e o hash do conteudo, entao um arquivo existente tem os mesmos
+    bytes (ex.: reenvio de um template do catalogo) e fica como esta.
+    """
+    try:
+        _catalog.write(
+            f"{template_id}_{filename}", file_bytes, if_none_match=True
+        )
+    except PreconditionFailed:
+        return False
+    return True
+
+
+def discard_original_file(template_id: str, filename: str):
+    _catalog.delete(f"{template_id}_{filename}")
+
+
+def store_dp_template(
+    template_id: str, filename: str, name: str, text_content: str
+) -> DPTemplateInfo:
+    """Grava o markdown extraido e os metadados, e registra no indice."""
+    md_file = f"{template_id}.md"
+    _catalog.write(md_file, text_content.encode("utf-8"))
 
     preview = text_content[:300].replace("\n", " ").strip()
     if len(text_content) > 300:
         preview += "..."
 
-    index = _load_index()
-    entry = {
+    info = DPTemplateInfo(
+        id=template_id,
+        name=name or Path(filename).stem,
+        filename=filename,
+        preview=preview,
+    )
+    record = {
         "id": template_id,
-        "name": name or Path(filename).stem,
+        "name": info.name,
         "filename": filename,
-        "original_file": original_path.name,
-        "md_file": md_path.name,
+        "original_file": f"{template_id}_{filename}",
+        "md_file": md_file,
         "preview": preview,
+        "created_at": time.time(),
     }
-    index = [e for e in index if e["id"] != template_id]
-    index.append(entry)
-    _save_index(index)
+    etag = _publish(record)
+    with _lock:
+        conn = _get_conn()
+        _upsert(conn, record, etag)
+        conn.commit()
+    _cache_content(template_id, text_content)
+    return info
+
+
+def save_dp_template(filename: str, file_bytes: bytes, name: str) -> DPTemplateInfo:
+    ext = Path(filename).suffix.lower()
+    if ext == ".pdf":
+        text_content = extract_text_from_pdf(file_bytes)
+    elif ext in (".docx", ".doc"):
+        text_content = extract_text_from_docx(file_bytes)
+    else:
+        raise ValueError(f"Formato nao suportado: {ext}. Use PDF ou DOCX.")
+
+    template_id = template_id_for(file_bytes)
+    save_original_file(template_id, filename, file_bytes)
+    return store_dp_template(template_id, filename, name, text_content)
 
+
+def _row_to_info(row: sqlite3.Row) -> DPTemplateInfo:
     return DPTemplateInfo(
-        id=template_id,
-        name=entry["name"],
-        filename=filename,
-        preview=preview,
+        id=row["id"],
+        name=row["name"],
+        filename=row["filename"],
+        preview=row["preview"],
     )
 
 
-def list_dp_templates() -> list[DPTemplateInfo]:
-    index = _load_index()
-    return [
-        DPTemplateInfo(
-            id=e["id"],
-            name=e["name"],
-            filename=e["filename"],
-            preview=e["preview"],
-        )
-        for e in index
-    ]
+def list_dp_templates(
+    offset: int = 0, limit: int | None = None
+) -> list[DPTemplateInfo]:
+    _ensure_synced()
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT * FROM templates ORDER BY created_at, id LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+    return [_row_to_info(row) for row in rows]
+
+
+def count_dp_templates() -> int:
+    _ensure_synced()
+    with _lock:
+        row = _get_conn().execute("SELECT COUNT(*) FROM templates").fetchone()
+    return row[0]
+
+
+def get_dp_template_info(template_id: str) -> DPTemplateInfo | None:
+    _ensure_synced()
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT * FROM templates WHERE id = ?", (template_id,)
+        ).fetchone()
+    return _row_to_info(row) if row else None
 
 
 def get_dp_template_content(template_id: str) -> str:
-    md_path = CATALOG_DIR / f"{template_id}.md"
-    if md_path.exists():
-        return md_path.read_text(encoding="utf-8")
-    raise FileNotFoundError(f"Template {template_id} nao encontrado.")
+    # O indice e consultado mesmo com o LRU quente, para que uma remocao
+    # feita por outro worker nao continue servindo o conteudo em cache.
+    _ensure_synced()
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT md_file FROM templates WHERE id = ?", (template_id,)
+        ).fetchone()
+        if row is None:
+            _content_cache.pop(template_id, None)
+            raise FileNotFoundError(f"Template {template_id} nao encontrado.")
+        content = _content_cache.get(template_id)
+        if content is not None:
+            _content_cache.move_to_end(template_id)
+            return content
+    result = _catalog.read(row["md_file"])
+    if result is None:
+        raise FileNotFoundError(f"Template {template_id} nao encontrado.")
+    content = result[0].decode("utf-8")
+    _cache_content(template_id, content)
+    return content
 
 
 def delete_dp_template(template_id: str) -> bool:
-    index = _load_index()
-    entry = next((e for e in index if e["id"] == template_id), None)
-    if not entry:
+    _ensure_synced()
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT original_file, md_file FROM templates WHERE id = ?",
+            (template_id,),
+        ).fetchone()
+    if not row:
         return False
 
+    # Metadados primeiro: sem eles, nenhuma instancia volta a listar o
+    # template enquanto os outros arquivos sao removidos
+    _catalog.delete(template_id + META_SUFFIX)
     for key in ("original_file", "md_file"):
-        fpath = CATALOG_DIR / entry[key]
-        if fpath.exists():
-            fpath.unlink()
-
-    index = [e for e in index if e["id"] != template_id]
-    _save_index(index)
+        _catalog.delete(row[key])
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM templates WHERE id = ?", (template_id,))
+        conn.commit()
+        _content_cache.pop(template_id, None)
     return True
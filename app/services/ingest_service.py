@@ -0,0 +1,274 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app.core.config import (
+    CACHE_DIR,
+    DP_INGEST_DB,
+    DP_INGEST_WORKERS,
+    DP_INGEST_PAGES_PER_CHUNK,
+)
+from app.core.metrics import DP_EXTRACTION
+from app.models.schemas import DPIngestJob, DPTemplateInfo
+from app.services.dp_catalog_service import (
+    count_pdf_pages,
+    discard_original_file,
+    extract_pdf_pages,
+    extract_text_from_docx,
+    save_original_file,
+    store_dp_template,
+    template_id_for,
+)
+
+MAX_TRACKED_JOBS = 500
+# Copia local do upload para os processos de extracao (o original vai para
+# o storage, que pode nao ser o disco local)
+STAGING_DIR = CACHE_DIR / "ingest"
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_background: set[asyncio.Task] = set()
+
+# Os jobs ficam em SQLite, como os de fase: com varios workers web, o
+# polling do status pode cair em outro processo que nao o da extracao
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+
+
+def _worker_id() -> str:
+    # na hora, nao no import: o preload do serve.py importa antes do fork
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        DP_INGEST_DB.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(str(DP_INGEST_DB), check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            " id TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " template TEXT,"
+            " error TEXT,"
+            " worker TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        _conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ingest_updated"
+            " ON ingest_jobs (updated_at)"
+        )
+        _conn.commit()
+    return _conn
+
+
+def _save_job(job: DPIngestJob):
+    template = job.template.model_dump_json() if job.template else None
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO ingest_jobs (id, filename, status,"
+            " template, error, worker, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.job_id, job.filename, job.status, template, job.error,
+             _worker_id(), job.created_at, job.updated_at),
+        )
+        conn.commit()
+
+
+def _row_to_job(row: sqlite3.Row) -> DPIngestJob:
+    template = row["template"]
+    return DPIngestJob(
+        job_id=row["id"],
+        filename=row["filename"],
+        status=row["status"],
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+        template=DPTemplateInfo(**json.loads(template)) if template else None,
+        error=row["error"],
+    )
+
+
+def _worker_gone(worker: str) -> bool:
+    """O processo que rodava o job morreu (ex.: reciclado no meio)."""
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: os workers nao herdam threads/conexoes do servidor
+            _executor = ProcessPoolExecutor(
+                max_workers=DP_INGEST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_ingest_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _stage_upload(filename: str, file_bytes: bytes) -> Path:
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(
+        suffix=Path(filename).suffix.lower(), dir=STAGING_DIR
+    )
+    with os.fdopen(fd, "wb") as f:
+        f.write(file_bytes)
+    return Path(name)
+
+
+def _extract_docx_file(path: Path) -> str:
+    return extract_text_from_docx(path.read_bytes())
+
+
+async def _extract_pdf(path: Path) -> str:
+    """Extrai o PDF em paralelo, um bloco de paginas por processo."""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    total = await loop.run_in_executor(executor, count_pdf_pages, path)
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(
+            executor,
+            extract_pdf_pages,
+            path,
+            start,
+            min(start + DP_INGEST_PAGES_PER_CHUNK, total),
+        )
+        for start in range(0, total, DP_INGEST_PAGES_PER_CHUNK)
+    ))
+    return "\n\n".join(page for chunk in chunks for page in chunk)
+
+
+async def _run_ingest(job: DPIngestJob, file_bytes: bytes, name: str):
+    job.status = "running"
+    job.updated_at = time.time()
+    await asyncio.to_thread(_save_job, job)
+    path = template_id = None
+    created = False
+    kind = Path(job.filename).suffix.lower().lstrip(".") or "desconhecido"
+    start = time.perf_counter()
+    try:
+        template_id = await asyncio.to_thread(template_id_for, file_bytes)
+        path = await asyncio.to_thread(_stage_upload, job.filename, file_bytes)
+        created = await asyncio.to_thread(
+            save_original_file, template_id, job.filename, file_bytes
+        )
+        del file_bytes
+        if path.suffix.lower() == ".pdf":
+            text_content = await _extract_pdf(path)
+        else:
+            text_content = await asyncio.get_running_loop().run_in_executor(
+                _get_executor(), _extract_docx_file, path
+            )
+        job.template = await asyncio.to_thread(
+            store_dp_template, template_id, job.filename, name, text_content
+        )
+        job.status = "done"
+    except Exception as e:
+        job.status = "error"
+        job.error = str(e) or type(e).__name__
+        # So apaga o original que este job criou: com o mesmo conteudo,
+        # ele pode ser de um template que ja esta no catalogo
+        if created:
+            await asyncio.to_thread(
+                _discard_quietly, template_id, job.filename
+            )
+    finally:
+        if path is not None:
+            path.unlink(missing_ok=True)
+    DP_EXTRACTION.observe(
+        time.perf_counter() - start, kind=kind, status=job.status
+    )
+    job.updated_at = time.time()
+    await asyncio.to_thread(_save_job, job)
+
+
+def _discard_quietly(template_id: str, filename: str):
+    try:
+        discard_original_file(template_id, filename)
+    except Exception:
+        pass  # o erro que importa e o da extracao, ja registrado no job
+
+
+def _forget_old_jobs():
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "DELETE FROM ingest_jobs WHERE status IN ('done', 'error')"
+            " AND id NOT IN (SELECT id FROM ingest_jobs"
+            " ORDER BY updated_at DESC LIMIT ?)",
+            (MAX_TRACKED_JOBS,),
+        )
+        conn.commit()
+
+
+async def submit_ingest(
+    filename: str, file_bytes: bytes, name: str
+) -> DPIngestJob:
+    """Agenda a extracao do arquivo e retorna o job imediatamente."""
+    now = time.time()
+    job = DPIngestJob(
+        job_id=uuid.uuid4().hex,
+        filename=filename,
+        status="queued",
+        created_at=now,
+        updated_at=now,
+    )
+    await asyncio.to_thread(_save_job, job)
+    await asyncio.to_thread(_forget_old_jobs)
+    task = asyncio.create_task(_run_ingest(job, file_bytes, name))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return job
+
+
+def get_ingest_job(job_id: str) -> DPIngestJob | None:
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    job = _row_to_job(row)
+    if job.status in ("queued", "running") and _worker_gone(row["worker"]):
+        job.status = "error"
+        job.error = "Extracao interrompida (o processo foi encerrado)."
+        job.updated_at = time.time()
+        with _lock:
+            conn = _get_conn()
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, error = ?, updated_at = ?"
+                " WHERE id = ? AND status IN ('queued', 'running')",
+                (job.status, job.error, job.updated_at, job_id),
+            )
+            conn.commit()
+    return job
@@ -0,0 +1,433 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from typing import AsyncIterator
+
+from app.core.config import (
+    JOBS_DB,
+    JOBS_MAX_CONCURRENCY_PER_MODEL,
+    JOBS_RESUME_ON_STARTUP,
+    JOBS_STALE_SECONDS,
+)
+from app.models.schemas import PhaseJob
+from app.agents.llm_registry import phase_models
+from app.agents.spec_agent import (
+    astream_phase,
+    iter_implement_parallel,
+    format_task_section,
+    merge_task_outputs,
+)
+from app.services.project_service import PHASE_ARTIFACTS, save_artifact
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+FLUSH_SECONDS = 0.5
+POLL_SECONDS = 0.5
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_running: dict[str, asyncio.Task] = {}
+# Um dict modelo -> semaforo por event loop, como em llm_slot
+_slots: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _worker_id() -> str:
+    """Processo dono do job, para retomar jobs de workers mortos.
+
+    Calculado na hora, nao no import: com o preload do serve.py o modulo
+    e importado no processo mestre, antes do fork dos workers.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        JOBS_DB.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(str(JOBS_DB), check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " project_name TEXT NOT NULL,"
+            " phase TEXT NOT NULL,"
+            " params TEXT NOT NULL,"
+            " dedupe_key TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " output TEXT NOT NULL DEFAULT '',"
+            " error TEXT,"
+            " worker TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        # No maximo um job ativo por (projeto, fase, parametros)
+        _conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active"
+            " ON jobs (dedupe_key) WHERE status IN ('queued', 'running')"
+        )
+        _conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_project"
+            " ON jobs (project_name, created_at)"
+        )
+        _conn.commit()
+    return _conn
+
+
+def _row_to_job(row: sqlite3.Row) -> PhaseJob:
+    return PhaseJob(
+        job_id=row["id"],
+        project_name=row["project_name"],
+        phase=row["phase"],
+        status=row["status"],
+        model=row["model"],
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+        started_at=row["started_at"],
+        finished_at=row["finished_at"],
+        output=row["output"],
+        error=row["error"],
+    )
+
+
+def _dedupe_key(project_name: str, phase: str, request: dict) -> str:
+    payload = json.dumps(
+        [project_name, phase, request], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _insert_or_existing(
+    project_name: str, phase: str, request: dict, params: dict
+) -> tuple[PhaseJob, bool]:
+    key = _dedupe_key(project_name, phase, request)
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        for _ in range(2):
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE dedupe_key = ?"
+                " AND status IN ('queued', 'running')",
+                (key,),
+            ).fetchone()
+            if row:
+                return _row_to_job(row), False
+            try:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, project_name, phase, params,"
+                    " dedupe_key, model, status, worker, created_at,"
+                    " updated_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (
+                        job_id, project_name, phase, json.dumps(params),
+                        key, phase_models(phase)[0], _worker_id(), now, now,
+                    ),
+                )
+                conn.commit()
+            except sqlite3.IntegrityError:
+                # outro worker inseriu o mesmo job entre o SELECT e o INSERT
+                conn.rollback()
+                continue
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return _row_to_job(row), True
+    raise RuntimeError("Nao foi possivel registrar o job.")
+
+
+def _execute(sql: str, args: tuple) -> int:
+    with _lock:
+        conn = _get_conn()
+        count = conn.execute(sql, args).rowcount
+        conn.commit()
+        return count
+
+
+def _claim(job_id: str) -> bool:
+    now = time.time()
+    return _execute(
+        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?,"
+        " updated_at = ? WHERE id = ? AND status = 'queued'",
+        (_worker_id(), now, now, job_id),
+    ) == 1
+
+
+def _progress(job_id: str, output: str) -> bool:
+    """Grava a saida parcial; False se o job foi cancelado nesse meio tempo."""
+    return _execute(
+        "UPDATE jobs SET output = ?, updated_at = ?"
+        " WHERE id = ? AND status = 'running'",
+        (output, time.time(), job_id),
+    ) == 1
+
+
+def _finish(job_id: str, status: str, error: str | None = None) -> bool:
+    now = time.time()
+    return _execute(
+        "UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ?"
+        " WHERE id = ? AND status = 'running'",
+        (status, error, now, now, job_id),
+    ) == 1
+
+
+def get_job(job_id: str) -> PhaseJob | None:
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(
+    project_name: str | None = None,
+    status: str | None = None,
+    limit: int = 100,
+) -> list[PhaseJob]:
+    sql = "SELECT * FROM jobs WHERE 1 = 1"
+    args: list = []
+    if project_name:
+        sql += " AND project_name = ?"
+        args.append(project_name)
+    if status:
+        sql += " AND status = ?"
+        args.append(status)
+    sql += " ORDER BY created_at DESC LIMIT ?"
+    args.append(limit)
+    with _lock:
+        rows = _get_conn().execute(sql, args).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+# ── Execucao ─────────────────────────────────────────────────────────
+
+
+def _model_slot(model: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    per_model = _slots.setdefault(loop, {})
+    if model not in per_model:
+        per_model[model] = asyncio.Semaphore(JOBS_MAX_CONCURRENCY_PER_MODEL)
+    return per_model[model]
+
+
+def _schedule(job_id: str):
+    task = asyncio.create_task(_run_job(job_id))
+    _running[job_id] = task
+    task.add_done_callback(lambda _: _running.pop(job_id, None))
+
+
+async def _phase_output(
+    job_id: str, phase: str, project_name: str, params: dict
+) -> str | None:
+    """Roda a fase gravando a saida parcial; None se o job foi cancelado."""
+    if params.get("parallel"):
+        results = []
+
+        async def chunks():
+            async for task, output in iter_implement_parallel(
+                project_name, params.get("max_concurrency"), params["use_cache"]
+            ):
+                results.append((task, output))
+                yield format_task_section(task, output) + "\n"
+
+        stream = chunks()
+        finalize = lambda parts: merge_task_outputs(results)  # noqa: E731
+    else:
+        stream = astream_phase(
+            phase, project_name, params["prompt"], params["use_cache"],
+            task_index=params.get("task_index"),
+            mode=params.get("mode", "full"),
+        )
+        finalize = "".join
+
+    parts: list[str] = []
+    flushed_at = time.monotonic()
+    async for chunk in stream:
+        parts.append(chunk)
+        if time.monotonic() - flushed_at >= FLUSH_SECONDS:
+            if not await asyncio.to_thread(_progress, job_id, "".join(parts)):
+                return None
+            flushed_at = time.monotonic()
+    return finalize(parts)
+
+
+async def _run_job(job_id: str):
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None or job.status != "queued":
+        return
+    async with _model_slot(job.model):
+        if not await asyncio.to_thread(_claim, job_id):
+            return
+        with _lock:
+            params = json.loads(_get_conn().execute(
+                "SELECT params FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()[0])
+        try:
+            content = await _phase_output(
+                job_id, job.phase, job.project_name, params
+            )
+            if content is None or not await asyncio.to_thread(
+                _progress, job_id, content
+            ):
+                return
+            await asyncio.to_thread(
+                save_artifact, job.project_name,
+                PHASE_ARTIFACTS[job.phase], content,
+            )
+            await asyncio.to_thread(_finish, job_id, "done")
+        except asyncio.CancelledError:
+            # cancel_job/suspend_jobs ja gravaram o novo status
+            raise
+        except Exception as e:
+            logger.exception("job %s (%s) falhou", job_id, job.phase)
+            await asyncio.to_thread(
+                _finish, job_id, "error", str(e) or type(e).__name__
+            )
+
+
+async def submit_phase_job(
+    phase: str, project_name: str, request: dict, params: dict
+) -> PhaseJob:
+    """Enfileira a fase; um job identico ainda ativo e reaproveitado."""
+    job, created = await asyncio.to_thread(
+        _insert_or_existing, project_name, phase, request, params
+    )
+    if created:
+        _schedule(job.job_id)
+    else:
+        job.deduplicated = True
+    return job
+
+
+async def cancel_job(job_id: str) -> PhaseJob | None:
+    now = time.time()
+    await asyncio.to_thread(
+        _execute,
+        "UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ?"
+        " WHERE id = ? AND status IN ('queued', 'running')",
+        (now, now, job_id),
+    )
+    # Em outro processo, o worker percebe o cancelamento no proximo flush
+    task = _running.get(job_id)
+    if task is not None:
+        task.cancel()
+    return await asyncio.to_thread(get_job, job_id)
+
+
+async def iter_job_updates(job_id: str) -> AsyncIterator[PhaseJob]:
+    """Emite o job a cada mudanca de saida/status ate ele terminar."""
+    last = None
+    while True:
+        job = await asyncio.to_thread(get_job, job_id)
+        if job is None:
+            return
+        state = (job.status, len(job.output), job.updated_at)
+        if state != last:
+            last = state
+            yield job
+        if job.status not in ACTIVE_STATUSES:
+            return
+        await asyncio.sleep(POLL_SECONDS)
+
+
+# ── Ciclo de vida ────────────────────────────────────────────────────
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_orphan(
+    job_id: str, worker: str | None, updated_at: float, now: float
+) -> bool:
+    if not worker:
+        return True
+    host, _, pid = worker.rpartition(":")
+    if host == socket.gethostname() and pid.isdigit():
+        if int(pid) == os.getpid():
+            return job_id not in _running
+        return not _pid_alive(int(pid))
+    return now - updated_at > JOBS_STALE_SECONDS
+
+
+def _recover_orphans() -> list[str]:
+    """Retoma (ou marca como interrompidos) jobs de processos que morreram."""
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        rows = conn.execute(
+            "SELECT id, worker, updated_at FROM jobs"
+            " WHERE status IN ('queued', 'running')"
+        ).fetchall()
+        orphans = [
+            row["id"] for row in rows
+            if _is_orphan(row["id"], row["worker"], row["updated_at"], now)
+        ]
+        for job_id in orphans:
+            if JOBS_RESUME_ON_STARTUP:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', output = '',"
+                    " worker = ?, updated_at = ? WHERE id = ?",
+                    (_worker_id(), now, job_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'interrupted', finished_at = ?,"
+                    " updated_at = ? WHERE id = ?",
+                    (now, now, job_id),
+                )
+        conn.commit()
+    return orphans if JOBS_RESUME_ON_STARTUP else []
+
+
+async def resume_jobs():
+    resumed = await asyncio.to_thread(_recover_orphans)
+    for job_id in resumed:
+        _schedule(job_id)
+    if resumed:
+        logger.info("%d job(s) retomado(s) apos reinicio", len(resumed))
+
+
+async def drain_jobs(timeout: float):
+    """Espera ate `timeout` segundos os jobs deste processo terminarem."""
+    if not _running or timeout <= 0:
+        return
+    logger.info(
+        "aguardando %d job(s) em andamento (ate %.0fs)", len(_running), timeout
+    )
+    await asyncio.wait(list(_running.values()), timeout=timeout)
+
+
+async def suspend_jobs():
+    """No desligamento, devolve os jobs deste processo para a fila."""
+    if not _running:
+        return
+    now = time.time()
+    await asyncio.to_thread(
+        _execute,
+        "UPDATE jobs SET status = 'queued', output = '', updated_at = ?"
+        " WHERE status IN ('queued', 'running') AND id IN"
+        f" ({','.join('?' * len(_running))})",
+        (now, *_running),
+    )
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from app.core.config import (
+    CACHE_DIR,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_MAX_ENTRIES,
+)
+
+CACHE_DB = CACHE_DIR / "llm_cache.sqlite3"
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+    # Cache de prefixo do provedor (usage_metadata das respostas)
+    "prompt_tokens": 0,
+    "prompt_cached_tokens": 0,
+}
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(str(CACHE_DB), check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " phase TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {
+            row[1] for row in _conn.execute("PRAGMA table_info(responses)")
+        }
+        if "size" not in columns:
+            # bancos anteriores ao limite em bytes
+            _conn.execute(
+                "ALTER TABLE responses ADD COLUMN size INTEGER NOT NULL DEFAULT 0"
+            )
+            _conn.execute(
+                "UPDATE responses SET size = length(CAST(content AS BLOB))"
+            )
+            _conn.commit()
+        _conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed"
+            " ON responses (accessed_at)"
+        )
+    return _conn
+
+
+def cache_key(phase: str, model: str, temperature: float, messages: list) -> str:
+    """Chave de conteudo: fase, modelo, temperatura e hash das mensagens."""
+    payload = json.dumps(
+        [[m.type, m.content] for m in messages], ensure_ascii=False
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{phase}:{model}:{temperature}:{digest}"
+
+
+def get_cached(key: str) -> str | None:
+    if not LLM_CACHE_ENABLED:
+        return None
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute(
+            "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row and now - row[1] <= LLM_CACHE_TTL_SECONDS:
+            conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            conn.commit()
+            _stats["hits"] += 1
+            return row[0]
+        if row:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+            _stats["evictions"] += 1
+        _stats["misses"] += 1
+        return None
+
+
+def put_cached(key: str, phase: str, content: str):
+    if not LLM_CACHE_ENABLED or not content:
+        return
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses"
+            " (key, phase, content, created_at, accessed_at, size)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, phase, content, now, now, len(content.encode("utf-8"))),
+        )
+        _stats["stores"] += 1
+        _evict(conn, now)
+        conn.commit()
+
+
+def _evict(conn: sqlite3.Connection, now: float):
+    """Remove entradas expiradas e as menos acessadas acima dos limites.
+
+    Os limites sao de entradas e de bytes: saidas do implement podem ter
+    centenas de KB cada.
+    """
+    expired = conn.execute(
+        "DELETE FROM responses WHERE created_at < ?",
+        (now - LLM_CACHE_TTL_SECONDS,),
+    ).rowcount
+    overflow = conn.execute(
+        "DELETE FROM responses WHERE key IN ("
+        " SELECT key FROM responses ORDER BY accessed_at DESC"
+        " LIMIT -1 OFFSET ?)",
+        (LLM_CACHE_MAX_ENTRIES,),
+    ).rowcount
+    # Das mais acessadas para as menos, mantem enquanto a soma couber
+    oversize = conn.execute(
+        "DELETE FROM responses WHERE key IN ("
+        " SELECT key FROM (SELECT key, SUM(size) OVER"
+        " (ORDER BY accessed_at DESC, key) AS total FROM responses)"
+        " WHERE total > ?)",
+        (LLM_CACHE_MAX_BYTES,),
+    ).rowcount
+    _stats["evictions"] += expired + overflow + oversize
+
+
+def record_prompt_usage(prompt_tokens: int, cached_tokens: int):
+    with _lock:
+        _stats["prompt_tokens"] += prompt_tokens
+        _stats["prompt_cached_tokens"] += cached_tokens
+
+
+def cache_stats() -> dict:
+    with _lock:
+        entries, size = _get_conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        return {
+            **_stats, "entries": entries, "bytes": size,
+            "enabled": LLM_CACHE_ENABLED,
+        }
+
+
+def clear_cache() -> int:
+    with _lock:
+        conn = _get_conn()
+        removed = conn.execute("DELETE FROM responses").rowcount
+        conn.commit()
+        return removed
@@ -0,0 +1,112 @@
+import asyncio
+
+from app.models.schemas import (
+    SpecifyRequest,
+    PlanRequest,
+    TasksRequest,
+    ImplementRequest,
+)
+from app.services.project_service import has_artifact, read_artifact
+from app.services.dp_catalog_service import (
+    get_dp_template_info,
+    get_dp_template_content,
+)
+from app.services.search_service import search
+
+
+class PhasePreconditionError(ValueError):
+    """A fase depende de um artefato que ainda nao foi gerado."""
+
+
+async def specify_prompt(req: SpecifyRequest) -> str:
+    return (
+        f"Projeto: {req.project_name}\n\n"
+        f"Descricao:\n{req.description}"
+    )
+
+
+async def plan_prompt(req: PlanRequest) -> str:
+    if not await asyncio.to_thread(has_artifact, req.project_name, "ESPEC.md"):
+        raise PhasePreconditionError("Execute /specify antes de /plan")
+
+    dp_context = ""
+    if req.dp_top_k:
+        dp_context = await _retrieved_dp_context(req)
+    elif req.dp_template_id:
+        dp_text = await asyncio.to_thread(
+            get_dp_template_content, req.dp_template_id
+        )
+        dp_context = (
+            f"\n\n## Design Pattern de referencia (cadastrado previamente):\n\n"
+            f"{dp_text}\n\n"
+            f"Use este design pattern como base e adapte ao projeto.\n"
+        )
+
+    return (
+        f"Stack desejada: {req.stack}\n"
+        f"Restricoes: {req.constraints}\n"
+        f"{dp_context}\n"
+        f"Gere o DP.md (Design Pattern) para o projeto {req.project_name}."
+    )
+
+
+async def _retrieved_dp_context(req: PlanRequest) -> str:
+    """Trechos de DP relevantes para a ESPEC, do template ou do catalogo todo."""
+    if req.dp_template_id and not await asyncio.to_thread(
+        get_dp_template_info, req.dp_template_id
+    ):
+        raise FileNotFoundError(req.dp_template_id)
+    espec = await asyncio.to_thread(read_artifact, req.project_name, "ESPEC.md")
+    hits = await asyncio.to_thread(
+        search,
+        f"{req.stack}\n{req.constraints}\n{espec}",
+        req.dp_top_k,
+        "catalog" if req.dp_template_id else None,
+        req.dp_template_id,
+        ("project", req.project_name),
+    )
+    if not hits:
+        return ""
+    excerpts = "\n\n".join(
+        f"### {hit.name} — {hit.heading or 'trecho'}\n\n{hit.text}"
+        for hit in hits
+    )
+    return (
+        f"\n\n## Trechos de Design Patterns de referencia:\n\n"
+        f"{excerpts}\n\n"
+        f"Use estes trechos como base e adapte ao projeto.\n"
+    )
+
+
+async def tasks_prompt(req: TasksRequest) -> str:
+    if not await asyncio.to_thread(has_artifact, req.project_name, "DP.md"):
+        raise PhasePreconditionError("Execute /plan antes de /tasks")
+    return "Gere as tarefas."
+
+
+async def implement_prompt(req: ImplementRequest) -> str:
+    if not await asyncio.to_thread(has_artifact, req.project_name, "TASKS.md"):
+        raise PhasePreconditionError("Execute /tasks antes de /implement")
+    return (
+        f"Implemente a tarefa #{req.task_index}"
+        if req.task_index is not None
+        else "Implemente todas as tarefas listadas."
+    )
+
+
+# Fase -> (schema do pedido, montador do prompt)
+PHASE_REQUESTS = {
+    "specify": (SpecifyRequest, specify_prompt),
+    "plan": (PlanRequest, plan_prompt),
+    "tasks": (TasksRequest, tasks_prompt),
+    "implement": (ImplementRequest, implement_prompt),
+}
+
+
+async def build_phase_prompt(phase: str, req) -> str:
+    """Monta o prompt da fase.
+
+    Levanta PhasePreconditionError se faltar um artefato anterior e
+    FileNotFoundError se o template de DP pedido nao existir.
+    """
+    return await PHASE_REQUESTS[phase][1](req)
@@ -0,0 +1,148 @@
+"""Geracao especulativa da proxima fase (opt-in).
+
+Depois que /specify ou /plan salva o artefato, a fase seguinte comeca em
+segundo plano com os ultimos parametros usados no projeto. O resultado
+fica como rascunho, indexado pelo hash das entradas da fase (artefatos
+anteriores + parametros); um pedido com as mesmas entradas usa o
+rascunho, pronto ou ainda em andamento, em vez de chamar o LLM de novo.
+
+Os rascunhos ficam em memoria, por processo.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from app.core.config import PREFETCH_ENABLED, PREFETCH_TTL_SECONDS
+from app.core.metrics import PREFETCH
+from app.agents.pipeline import UPSTREAM_ARTIFACTS, phase_fingerprint
+from app.agents.spec_agent import run_phase
+from app.services.phase_prompts import PHASE_REQUESTS, build_phase_prompt
+
+logger = logging.getLogger(__name__)
+
+NEXT_PHASE = {"specify": "plan", "plan": "tasks"}
+# Campos que nao sao entrada da fase
+_IGNORED_PARAMS = {"project_name", "bypass_cache", "prefetch", "mode"}
+
+
+@dataclass
+class _Draft:
+    fingerprint: str
+    task: asyncio.Task
+    created_at: float
+
+
+_drafts: dict[tuple[str, str], _Draft] = {}
+# (projeto, fase) -> parametros do ultimo pedido da fase
+_last_params: dict[tuple[str, str], dict] = {}
+
+
+def prefetch_enabled(requested: bool | None) -> bool:
+    return PREFETCH_ENABLED if requested is None else requested
+
+
+def remember_params(phase: str, req) -> None:
+    _last_params[(req.project_name, phase)] = req.model_dump(
+        exclude=_IGNORED_PARAMS
+    )
+
+
+def _expired(draft: _Draft) -> bool:
+    return time.monotonic() - draft.created_at > PREFETCH_TTL_SECONDS
+
+
+def _drop(key: tuple[str, str], result: str) -> None:
+    draft = _drafts.pop(key, None)
+    if draft is None:
+        return
+    if not draft.task.done():
+        draft.task.cancel()
+    PREFETCH.inc(phase=key[1], result=result)
+
+
+def _log_failure(phase: str, project_name: str):
+    def callback(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            PREFETCH.inc(phase=phase, result="error")
+            logger.warning(
+                "rascunho %s/%s falhou: %s",
+                project_name, phase, task.exception(),
+            )
+    return callback
+
+
+async def schedule_next(phase: str, project_name: str) -> None:
+    """Comeca a gerar a fase seguinte a `phase` em segundo plano."""
+    next_phase = NEXT_PHASE.get(phase)
+    if next_phase is None:
+        return
+    for key in [k for k, d in _drafts.items() if _expired(d)]:
+        _drop(key, "discarded")
+
+    model = PHASE_REQUESTS[next_phase][0]
+    params = _last_params.get((project_name, next_phase), {})
+    try:
+        req = model.model_validate({**params, "project_name": project_name})
+        prompt = await build_phase_prompt(next_phase, req)
+    except (ValueError, FileNotFoundError) as e:
+        # ex.: nenhum /plan anterior, entao nao ha stack para reaproveitar
+        logger.info("sem rascunho de %s/%s: %s", project_name, next_phase, e)
+        return
+    fingerprint = await asyncio.to_thread(
+        phase_fingerprint, next_phase, project_name, req.model_dump()
+    )
+
+    key = (project_name, next_phase)
+    _drop(key, "discarded")
+    task = asyncio.create_task(run_phase(next_phase, project_name, prompt))
+    task.add_done_callback(_log_failure(next_phase, project_name))
+    _drafts[key] = _Draft(fingerprint, task, time.monotonic())
+    PREFETCH.inc(phase=next_phase, result="started")
+    logger.info("rascunho %s/%s iniciado", project_name, next_phase)
+
+
+async def take_draft(phase: str, req) -> str | None:
+    """Conteudo do rascunho da fase, se as entradas dele batem com `req`.
+
+    Retorna None (e descarta o rascunho) quando nao ha rascunho, quando as
+    entradas mudaram desde que ele comecou ou quando ele falhou.
+    """
+    key = (req.project_name, phase)
+    draft = _drafts.get(key)
+    if draft is None:
+        return None
+    fingerprint = await asyncio.to_thread(
+        phase_fingerprint, phase, req.project_name, req.model_dump()
+    )
+    if req.bypass_cache or _expired(draft) or fingerprint != draft.fingerprint:
+        _drop(key, "miss")
+        return None
+    # O rascunho continua registrado enquanto termina: um PUT no meio da
+    # espera precisa acha-lo em discard_drafts para cancela-lo
+    try:
+        content = await draft.task
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            raise
+        return None  # descartado por uma edicao enquanto esperava
+    except Exception:
+        return None
+    if _drafts.get(key) is not draft:
+        return None  # descartado depois de pronto, antes de chegar aqui
+    _drafts.pop(key, None)
+    PREFETCH.inc(phase=phase, result="hit")
+    logger.info("rascunho %s/%s aproveitado", req.project_name, phase)
+    return content
+
+
+def discard_drafts(project_name: str, artifact: str) -> None:
+    """Cancela os rascunhos que dependem de `artifact` (ex.: apos um PUT)."""
+    for key in list(_drafts):
+        if key[0] == project_name and artifact in UPSTREAM_ARTIFACTS[key[1]]:
+            _drop(key, "discarded")
+
+
+def cancel_all_drafts() -> None:
+    for key in list(_drafts):
+        _drop(key, "discarded")
@@ -0,0 +1,174 @@
+"""Indice SQLite com o resumo de cada projeto (fase, flags, tamanhos, mtimes).
+
+Atualizado por `save_artifact` e pelo watcher (ou revarredura periodica)
+do storage em project_service; a listagem de projetos consulta so o
+indice. Cada instancia do app tem o seu indice, em CACHE_DIR.
+"""
+import json
+import sqlite3
+import threading
+
+from app.core.config import PROJECT_INDEX_DB
+from app.models.schemas import ArtifactMeta, ProjectSummary
+
+STAGES = ("new", "specify", "plan", "tasks", "implement")
+SORT_COLUMNS = {
+    "name": "name",
+    "updated_at": "updated_at",
+    "size": "total_size",
+    "stage": "stage_rank",
+}
+_FLAGS = ("espec", "dp", "plan", "tasks", "implementation")
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Conexao unica do processo; criada sob `_lock`."""
+    global _conn
+    if _conn is None:
+        PROJECT_INDEX_DB.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(PROJECT_INDEX_DB), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS projects ("
+            " name TEXT PRIMARY KEY,"
+            " stage TEXT NOT NULL,"
+            " stage_rank INTEGER NOT NULL,"
+            + "".join(f" has_{flag} INTEGER NOT NULL," for flag in _FLAGS)
+            + " total_size INTEGER NOT NULL,"
+            " updated_at REAL,"
+            " artifacts TEXT NOT NULL)"
+        )
+        for column in ("updated_at", "stage_rank", "total_size"):
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_projects_{column}"
+                f" ON projects ({column}, name)"
+            )
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def _to_row(summary: ProjectSummary) -> tuple:
+    artifacts = {
+        name: [meta.size, meta.mtime] for name, meta in summary.artifacts.items()
+    }
+    return (
+        summary.project_name,
+        summary.stage,
+        STAGES.index(summary.stage),
+        *(int(getattr(summary, f"has_{flag}")) for flag in _FLAGS),
+        summary.total_size,
+        summary.updated_at,
+        json.dumps(artifacts, separators=(",", ":")),
+    )
+
+
+def _row_to_summary(row: sqlite3.Row) -> ProjectSummary:
+    artifacts = {
+        name: ArtifactMeta(name=name, exists=size > 0, size=size, mtime=mtime)
+        for name, (size, mtime) in json.loads(row["artifacts"]).items()
+    }
+    return ProjectSummary(
+        project_name=row["name"],
+        stage=row["stage"],
+        total_size=row["total_size"],
+        updated_at=row["updated_at"],
+        artifacts=artifacts,
+        **{f"has_{flag}": bool(row[f"has_{flag}"]) for flag in _FLAGS},
+    )
+
+
+def upsert_projects(summaries: list[ProjectSummary]) -> None:
+    if not summaries:
+        return
+    rows = [_to_row(s) for s in summaries]
+    placeholders = ", ".join("?" * len(rows[0]))
+    with _lock:
+        conn = _get_conn()
+        conn.executemany(
+            f"INSERT OR REPLACE INTO projects VALUES ({placeholders})", rows
+        )
+        conn.commit()
+
+
+def delete_projects(names: list[str]) -> None:
+    if not names:
+        return
+    with _lock:
+        conn = _get_conn()
+        conn.executemany(
+            "DELETE FROM projects WHERE name = ?", [(n,) for n in names]
+        )
+        conn.commit()
+
+
+def indexed_signatures() -> dict[str, str]:
+    """Projeto -> JSON dos tamanhos/mtimes, para detectar o que mudou."""
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT name, artifacts FROM projects"
+        ).fetchall()
+    return {row["name"]: row["artifacts"] for row in rows}
+
+
+def signature(summary: ProjectSummary) -> str:
+    return _to_row(summary)[-1]
+
+
+def _where(
+    stage: str | None, has: list[str], q: str | None
+) -> tuple[str, list]:
+    clauses, params = [], []
+    if stage:
+        clauses.append("stage = ?")
+        params.append(stage)
+    for flag in has:
+        if flag not in _FLAGS:
+            raise ValueError(f"Filtro desconhecido: {flag}")
+        clauses.append(f"has_{flag} = 1")
+    if q:
+        escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clauses.append("name LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_projects(
+    offset: int = 0,
+    limit: int | None = None,
+    sort: str = "name",
+    descending: bool = False,
+    stage: str | None = None,
+    has: list[str] | None = None,
+    q: str | None = None,
+) -> tuple[list[ProjectSummary], int]:
+    """Pagina de resumos e o total que casa com os filtros."""
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Ordenacao deve ser uma de: {set(SORT_COLUMNS)}")
+    where, params = _where(stage, has or [], q)
+    direction = "DESC" if descending else "ASC"
+    with _lock:
+        conn = _get_conn()
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM projects{where}", params
+        ).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM projects{where}"
+            f" ORDER BY {SORT_COLUMNS[sort]} {direction}, name {direction}"
+            " LIMIT ? OFFSET ?",
+            [*params, -1 if limit is None else limit, offset],
+        ).fetchall()
+    return [_row_to_summary(row) for row in rows], total
+
+
+def list_project_names() -> list[str]:
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT name FROM projects ORDER BY name"
+        ).fetchall()
+    return [row["name"] for row in rows]
@@ -1,12 +1,74 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from app.core.config import SPECS_DIR
-from app.models.schemas import ProjectStatus
 
+try:
+    from watchfiles import awatch
+except ImportError:  # sem watchfiles, o indice e revarrido periodicamente
+    awatch = None
 
-def get_project_dir(project_name: str) -> Path:
-    project_dir = SPECS_DIR / project_name
-    project_dir.mkdir(parents=True, exist_ok=True)
-    return project_dir
+from app.core.config import (
+    ARTIFACT_CACHE_MAX_BYTES,
+    PROJECT_INDEX_WATCH,
+    PROJECT_INDEX_RESCAN_SECONDS,
+)
+from app.core.metrics import ARTIFACT_IO
+from app.models.schemas import (
+    ProjectStatus,
+    ProjectMeta,
+    ArtifactMeta,
+    ProjectSummary,
+)
+from app.services import project_index
+from app.services.storage import (
+    LocalStorage,
+    ObjectStat,
+    PreconditionFailed,
+    get_storage,
+)
+
+logger = logging.getLogger(__name__)
+
+# Prefixo dos campos de ProjectStatus -> arquivo do artefato
+ARTIFACTS = {
+    "espec": "ESPEC.md",
+    "dp": "DP.md",
+    "plan": "PLAN.md",
+    "tasks": "TASKS.md",
+    "implementation": "IMPLEMENTATION.md",
+}
+
+# Fase -> artefato que ela gera
+PHASE_ARTIFACTS = {
+    "specify": "ESPEC.md",
+    "plan": "DP.md",
+    "tasks": "TASKS.md",
+    "implement": "IMPLEMENTATION.md",
+}
+
+# Artefato -> artefatos anteriores dos quais ele e gerado. Ao salvar o
+# artefato, a versao atual deles fica como base para o modo de atualizacao.
+ARTIFACT_UPSTREAM = {
+    "DP.md": ("ESPEC.md",),
+    "TASKS.md": ("ESPEC.md", "DP.md"),
+}
+BASE_DIRNAME = ".base"
+
+# Cache dos artefatos: (projeto, arquivo) -> (etag, tamanho, mtime,
+# conteudo, sha256). Uma entrada so vale enquanto o ETag no storage for o
+# mesmo, entao uma escrita feita por outra instancia e vista na hora. E um
+# LRU limitado a ARTIFACT_CACHE_MAX_BYTES: projetos antigos saem da memoria
+# e voltam a ser lidos do storage quando alguem abre de novo.
+_artifact_cache: OrderedDict[
+    tuple[str, str], tuple[str, int, float, str, str]
+] = OrderedDict()
+_artifact_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+_specs = get_storage("specs")
 
 
 def read_file_safe(path: Path) -> str:
@@ -15,20 +77,168 @@ def read_file_safe(path: Path) -> str:
     return ""
 
 
-def save_artifact(project_name: str, filename: str, content: str) -> Path:
-    project_dir = get_project_dir(project_name)
-    filepath = project_dir / filename
-    filepath.write_text(content, encoding="utf-8")
-    return filepath
+def _key(project_name: str, filename: str) -> str:
+    return f"{project_name}/{filename}"
+
+
+def has_artifact(project_name: str, filename: str) -> bool:
+    """Verifica se o artefato existe e nao esta vazio, sem ler o conteudo."""
+    st = _specs.stat(_key(project_name, filename))
+    return st is not None and st.size > 0
+
+
+def _digest(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _cache_entry(
+    project_name: str, filename: str, st: ObjectStat, content: str
+) -> tuple[str, int, float, str, str]:
+    global _artifact_cache_bytes
+    entry = (st.etag, st.size, st.mtime, content, _digest(content))
+    key = (project_name, filename)
+    with _cache_lock:
+        old = _artifact_cache.pop(key, None)
+        if old is not None:
+            _artifact_cache_bytes -= old[1]
+        # Artefato maior que o teto inteiro nao entra: so expulsaria o resto
+        if st.size <= ARTIFACT_CACHE_MAX_BYTES:
+            _artifact_cache[key] = entry
+            _artifact_cache_bytes += st.size
+        while _artifact_cache_bytes > ARTIFACT_CACHE_MAX_BYTES:
+            _, evicted = _artifact_cache.popitem(last=False)
+            _artifact_cache_bytes -= evicted[1]
+    return entry
+
+
+def _load_artifact(
+    project_name: str, filename: str
+) -> tuple[str, int, float, str, str] | None:
+    st = _specs.stat(_key(project_name, filename))
+    if st is None:
+        invalidate_artifact(project_name, filename)
+        return None
+
+    with _cache_lock:
+        cached = _artifact_cache.get((project_name, filename))
+        if cached and cached[0] == st.etag:
+            _artifact_cache.move_to_end((project_name, filename))
+            return cached
+
+    with ARTIFACT_IO.time(op="read"):
+        result = _specs.read(_key(project_name, filename))
+    if result is None:
+        invalidate_artifact(project_name, filename)
+        return None
+    data, st = result
+    return _cache_entry(project_name, filename, st, data.decode("utf-8"))
+
+
+def read_artifact(project_name: str, filename: str) -> str:
+    """Le o artefato pelo cache, relendo do storage so se o ETag mudou."""
+    entry = _load_artifact(project_name, filename)
+    return entry[3] if entry else ""
+
+
+def _meta(filename: str, entry: tuple | None) -> ArtifactMeta:
+    if not entry:
+        return ArtifactMeta(name=filename, exists=False)
+    return ArtifactMeta(
+        name=filename,
+        exists=entry[1] > 0,
+        size=entry[1],
+        mtime=entry[2],
+        sha256=entry[4],
+    )
+
+
+def get_artifact_meta(project_name: str, filename: str) -> ArtifactMeta:
+    return _meta(filename, _load_artifact(project_name, filename))
+
+
+def invalidate_artifact(project_name: str, filename: str | None = None):
+    global _artifact_cache_bytes
+    with _cache_lock:
+        if filename is not None:
+            keys = [(project_name, filename)]
+        else:
+            keys = [k for k in _artifact_cache if k[0] == project_name]
+        for key in keys:
+            old = _artifact_cache.pop(key, None)
+            if old is not None:
+                _artifact_cache_bytes -= old[1]
+
+
+def save_artifact(
+    project_name: str,
+    filename: str,
+    content: str,
+    expected_sha256: str | None = None,
+) -> ArtifactMeta:
+    """Grava o artefato; com `expected_sha256`, so se o atual for esse.
+
+    A checagem vira um If-Match no storage: uma escrita de outra instancia
+    entre a leitura e a gravacao tambem levanta PreconditionFailed.
+    """
+    if_match = None
+    if expected_sha256 is not None:
+        current = _load_artifact(project_name, filename)
+        if current is None or current[4] != expected_sha256:
+            raise PreconditionFailed(f"{filename} mudou desde a leitura.")
+        if_match = current[0]
+    with ARTIFACT_IO.time(op="write"):
+        st = _specs.write(
+            _key(project_name, filename), content.encode("utf-8"),
+            if_match=if_match,
+        )
+    entry = _cache_entry(project_name, filename, st, content)
+    _save_base_snapshot(project_name, filename)
+    _refresh_index(project_name)
+    return _meta(filename, entry)
+
+
+def _base_key(project_name: str, artifact: str, upstream: str) -> str:
+    return _key(
+        project_name, f"{BASE_DIRNAME}/{Path(artifact).stem}/{upstream}"
+    )
+
+
+def _save_base_snapshot(project_name: str, artifact: str):
+    """Guarda as versoes dos artefatos anteriores usadas por `artifact`."""
+    for upstream in ARTIFACT_UPSTREAM.get(artifact, ()):
+        content = read_artifact(project_name, upstream)
+        with ARTIFACT_IO.time(op="write"):
+            _specs.write(
+                _base_key(project_name, artifact, upstream),
+                content.encode("utf-8"),
+            )
+
+
+def read_base_snapshot(project_name: str, artifact: str) -> dict[str, str] | None:
+    """Artefatos anteriores como estavam quando `artifact` foi salvo.
+
+    None se o artefato nao deriva de outros ou foi salvo antes de existir
+    o snapshot.
+    """
+    upstream = ARTIFACT_UPSTREAM.get(artifact)
+    if not upstream:
+        return None
+    base = {}
+    for name in upstream:
+        with ARTIFACT_IO.time(op="read"):
+            result = _specs.read(_base_key(project_name, artifact, name))
+        if result is None:
+            return None
+        base[name] = result[0].decode("utf-8")
+    return base
 
 
 def get_project_status(project_name: str) -> ProjectStatus:
-    project_dir = get_project_dir(project_name)
-    espec = read_file_safe(project_dir / "ESPEC.md")
-    dp = read_file_safe(project_dir / "DP.md")
-    plan = read_file_safe(project_dir / "PLAN.md")
-    tasks = read_file_safe(project_dir / "TASKS.md")
-    implementation = read_file_safe(project_dir / "IMPLEMENTATION.md")
+    espec = read_artifact(project_name, "ESPEC.md")
+    dp = read_artifact(project_name, "DP.md")
+    plan = read_artifact(project_name, "PLAN.md")
+    tasks = read_artifact(project_name, "TASKS.md")
+    implementation = read_artifact(project_name, "IMPLEMENTATION.md")
 
     return ProjectStatus(
         project_name=project_name,
@@ -45,7 +255,212 @@ def get_project_status(project_name: str) -> ProjectStatus:
     )
 
 
+def get_project_meta(project_name: str) -> ProjectMeta:
+    """Status sem o corpo dos artefatos: flags, tamanhos, mtimes e hashes."""
+    artifacts = {
+        filename: get_artifact_meta(project_name, filename)
+        for filename in ARTIFACTS.values()
+    }
+    flags = {
+        f"has_{prefix}": artifacts[filename].exists
+        for prefix, filename in ARTIFACTS.items()
+    }
+    return ProjectMeta(project_name=project_name, artifacts=artifacts, **flags)
+
+
+def get_project_fields(project_name: str, fields: list[str]) -> dict:
+    """Monta so os campos pedidos de ProjectStatus, lendo apenas o necessario."""
+    result = {}
+    for field in fields:
+        if field == "project_name":
+            result[field] = project_name
+            continue
+        prefix = field.removeprefix("has_").removesuffix("_content")
+        filename = ARTIFACTS.get(prefix)
+        if filename is None or field not in ProjectStatus.model_fields:
+            raise ValueError(f"Campo desconhecido: {field}")
+        if field.startswith("has_"):
+            result[field] = has_artifact(project_name, filename)
+        else:
+            result[field] = read_artifact(project_name, filename)
+    return result
+
+
+# ── Indice de projetos ───────────────────────────────────────────────
+
+_index_ready = threading.Event()
+_index_lock = threading.Lock()
+_watcher: asyncio.Task | None = None
+# Evento de parada do awatch, enquanto ele estiver rodando
+_watch_stop: threading.Event | None = None
+
+
+def _summary(
+    project_name: str, stats: list[ObjectStat]
+) -> ProjectSummary | None:
+    relative = {st.key.split("/", 1)[1]: st for st in stats}
+    if not relative:
+        return None
+    artifacts = {}
+    for filename in ARTIFACTS.values():
+        st = relative.get(filename)
+        if st is None:
+            continue
+        artifacts[filename] = ArtifactMeta(
+            name=filename,
+            exists=st.size > 0,
+            size=st.size,
+            mtime=st.mtime,
+        )
+    flags = {
+        f"has_{prefix}": filename in artifacts and artifacts[filename].exists
+        for prefix, filename in ARTIFACTS.items()
+    }
+    stage = "new"
+    for phase, filename in PHASE_ARTIFACTS.items():
+        if filename in artifacts and artifacts[filename].exists:
+            stage = phase
+    return ProjectSummary(
+        project_name=project_name,
+        stage=stage,
+        total_size=sum(a.size for a in artifacts.values()),
+        updated_at=max((a.mtime for a in artifacts.values()), default=None),
+        artifacts=artifacts,
+        **flags,
+    )
+
+
+def project_summary(project_name: str) -> ProjectSummary | None:
+    """Resumo do projeto pela listagem do storage, sem ler o conteudo.
+
+    None quando o projeto nao tem nenhum arquivo.
+    """
+    return _summary(project_name, _specs.list_objects(f"{project_name}/"))
+
+
+def _refresh_index(*project_names: str):
+    summaries, missing = [], []
+    for name in project_names:
+        summary = project_summary(name)
+        if summary is None:
+            missing.append(name)
+        else:
+            summaries.append(summary)
+    project_index.upsert_projects(summaries)
+    project_index.delete_projects(missing)
+
+
+def reconcile_project_index() -> int:
+    """Compara o indice com o storage e regrava so os projetos que mudaram.
+
+    Uma listagem so do storage inteiro (no S3, uma requisicao por mil
+    objetos), agrupada por projeto.
+    """
+    grouped: dict[str, list[ObjectStat]] = {}
+    for st in _specs.list_objects():
+        project, sep, _ = st.key.partition("/")
+        if sep:
+            grouped.setdefault(project, []).append(st)
+    indexed = project_index.indexed_signatures()
+    changed = []
+    for name, stats in grouped.items():
+        summary = _summary(name, stats)
+        if summary and indexed.get(name) != project_index.signature(summary):
+            changed.append(summary)
+    project_index.upsert_projects(changed)
+    gone = set(indexed) - set(grouped)
+    project_index.delete_projects(sorted(gone))
+    _index_ready.set()
+    if changed or gone:
+        logger.info(
+            "indice de projetos: %d atualizados, %d removidos",
+            len(changed), len(gone),
+        )
+    return len(changed) + len(gone)
+
+
+def _ensure_index():
+    if _index_ready.is_set():
+        return
+    with _index_lock:
+        if not _index_ready.is_set():
+            reconcile_project_index()
+
+
 def list_projects() -> list[str]:
-    if not SPECS_DIR.exists():
-        return []
-    return [d.name for d in SPECS_DIR.iterdir() if d.is_dir()]
+    _ensure_index()
+    return project_index.list_project_names()
+
+
+def list_project_summaries(**filters) -> tuple[list[ProjectSummary], int]:
+    """Pagina de resumos do indice; ver project_index.query_projects."""
+    _ensure_index()
+    return project_index.query_projects(**filters)
+
+
+def _project_of(root: Path, path: str) -> str | None:
+    try:
+        parts = Path(path).resolve().relative_to(root.resolve()).parts
+    except ValueError:
+        return None
+    return parts[0] if parts else None
+
+
+async def _watch_projects():
+    global _watch_stop
+    await asyncio.to_thread(_ensure_index)
+    # No S3 nao ha eventos: as escritas de outras instancias entram na
+    # proxima revarredura
+    local = isinstance(_specs, LocalStorage)
+    if awatch is None or not PROJECT_INDEX_WATCH or not local:
+        while True:
+            await asyncio.sleep(PROJECT_INDEX_RESCAN_SECONDS)
+            try:
+                await asyncio.to_thread(reconcile_project_index)
+            except Exception:
+                logger.exception("falha ao atualizar o indice de projetos")
+    root = _specs.root
+    root.mkdir(parents=True, exist_ok=True)
+    _watch_stop = stop = threading.Event()
+    # Sem eventos por PROJECT_INDEX_RESCAN_SECONDS, revarre tudo: cobre
+    # eventos perdidos (ex.: volumes de rede)
+    async for changes in awatch(
+        root,
+        rust_timeout=int(PROJECT_INDEX_RESCAN_SECONDS * 1000),
+        yield_on_timeout=True,
+        stop_event=stop,
+    ):
+        names = {_project_of(root, path) for _, path in changes} - {None}
+        try:
+            if changes:
+                await asyncio.to_thread(_refresh_index, *names)
+            else:
+                await asyncio.to_thread(reconcile_project_index)
+        except Exception:
+            logger.exception("falha ao atualizar o indice de projetos")
+
+
+def start_project_watcher():
+    """Mantem o indice em dia com mudancas feitas fora da API."""
+    global _watcher
+    if _watcher is None or _watcher.done():
+        _watcher = asyncio.create_task(_watch_projects())
+
+
+async def stop_project_watcher():
+    global _watcher, _watch_stop
+    if _watcher is None:
+        return
+    # O awatch roda numa thread; so cancelar a task deixa a thread viva ate
+    # o fim do interpretador, que entao aborta. Com o evento ela sai sozinha
+    # (em ate ~50 ms) e o loop do awatch termina.
+    if _watch_stop is not None:
+        _watch_stop.set()
+        await asyncio.wait({_watcher}, timeout=2)
+        _watch_stop = None
+    _watcher.cancel()
+    try:
+        await _watcher
+    except asyncio.CancelledError:
+        pass
+    _watcher = None
@@ -0,0 +1,177 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from app.core.config import (
+    SEARCH_INDEX_REFRESH_SECONDS,
+    SEARCH_CHUNK_CHARS,
+)
+from app.models.schemas import SearchHit
+from app.services import dp_catalog_service, project_service
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"\w{2,}")
+_HEADING = re.compile(r"^#{1,3}\s+(.*)$", re.MULTILINE)
+_STOPWORDS = frozenset(
+    "de da do das dos em no na nos nas um uma uns umas para por com sem "
+    "que os as ao aos se ou e o a é sao ser como mais mas seu sua seus "
+    "suas the and of to in for is on with by be this that".split()
+)
+
+_lock = threading.Lock()
+# fonte -> (assinatura, chunks); cada chunk guarda o texto e os termos
+_sources: dict[tuple[str, str], tuple[tuple, list[dict]]] = {}
+_index: dict | None = None
+_checked_at = 0.0
+
+
+def tokenize(text: str) -> list[str]:
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return [t for t in _TOKEN.findall(normalized) if t not in _STOPWORDS]
+
+
+def chunk_markdown(text: str, max_chars: int = SEARCH_CHUNK_CHARS) -> list[dict]:
+    """Quebra o markdown por secoes (#..###) e limita o tamanho dos trechos."""
+    chunks = []
+    starts = [m.start() for m in _HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    for begin, end in zip(bounds, bounds[1:]):
+        section = text[begin:end].strip()
+        if not section:
+            continue
+        heading = _HEADING.match(section)
+        title = heading.group(1).strip() if heading else ""
+        buffer = ""
+        for paragraph in section.split("\n\n"):
+            if buffer and len(buffer) + len(paragraph) > max_chars:
+                chunks.append({"heading": title, "text": buffer.strip()})
+                buffer = ""
+            buffer += paragraph + "\n\n"
+        if buffer.strip():
+            chunks.append({"heading": title, "text": buffer.strip()})
+    return chunks
+
+
+def _list_sources() -> dict[tuple[str, str], tuple]:
+    """Fontes indexaveis: (tipo, id) -> (nome, versao do texto).
+
+    O id do template ja e o hash do arquivo; nos projetos, tamanho e mtime
+    do DP.md vem do indice de projetos, sem tocar no storage.
+    """
+    sources = {}
+    for template in dp_catalog_service.list_dp_templates():
+        sources[("catalog", template.id)] = (template.name, template.id)
+    summaries, _ = project_service.list_project_summaries(has=["dp"])
+    for summary in summaries:
+        dp = summary.artifacts["DP.md"]
+        sources[("project", summary.project_name)] = (
+            summary.project_name, (dp.size, dp.mtime)
+        )
+    return sources
+
+
+def _read_source(source: str, source_id: str) -> str:
+    if source == "catalog":
+        return dp_catalog_service.get_dp_template_content(source_id)
+    return project_service.read_artifact(source_id, "DP.md")
+
+
+def _refresh_index(force: bool = False):
+    """Reindexa so as fontes novas ou alteradas e recalcula as postings."""
+    global _index, _checked_at
+    now = time.monotonic()
+    if not force and _index is not None and (
+        now - _checked_at < SEARCH_INDEX_REFRESH_SECONDS
+    ):
+        return
+    current = _list_sources()
+    changed = set(current) != set(_sources)
+    for key, signature in current.items():
+        cached = _sources.get(key)
+        if cached and cached[0] == signature:
+            continue
+        try:
+            text = _read_source(*key)
+        except FileNotFoundError:
+            continue
+        chunks = chunk_markdown(text)
+        for chunk in chunks:
+            chunk["terms"] = Counter(tokenize(chunk["heading"] + "\n" + chunk["text"]))
+        _sources[key] = (signature, chunks)
+        changed = True
+    for key in set(_sources) - set(current):
+        del _sources[key]
+
+    if changed or _index is None:
+        docs = []
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for (source, source_id), (signature, chunks) in _sources.items():
+            for chunk in chunks:
+                doc_id = len(docs)
+                length = sum(chunk["terms"].values())
+                docs.append((source, source_id, signature[0], chunk, length))
+                for term, tf in chunk["terms"].items():
+                    postings.setdefault(term, []).append((doc_id, tf))
+        avgdl = sum(d[4] for d in docs) / len(docs) if docs else 0.0
+        _index = {"docs": docs, "postings": postings, "avgdl": avgdl}
+    _checked_at = now
+
+
+def search(
+    query: str,
+    k: int = 5,
+    source: str | None = None,
+    source_id: str | None = None,
+    exclude: tuple[str, str] | None = None,
+) -> list[SearchHit]:
+    """Busca BM25 nos trechos do catalogo e dos DP.md dos projetos."""
+    with _lock:
+        _refresh_index()
+        index = _index
+
+    docs, postings, avgdl = index["docs"], index["postings"], index["avgdl"]
+    n_docs = len(docs)
+    scores: dict[int, float] = {}
+    for term in set(tokenize(query)):
+        term_postings = postings.get(term)
+        if not term_postings:
+            continue
+        df = len(term_postings)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for doc_id, tf in term_postings:
+            doc = docs[doc_id]
+            if source and doc[0] != source:
+                continue
+            if source_id and doc[1] != source_id:
+                continue
+            if exclude and (doc[0], doc[1]) == exclude:
+                continue
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc[4] / avgdl)
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [
+        SearchHit(
+            source=docs[doc_id][0],
+            source_id=docs[doc_id][1],
+            name=docs[doc_id][2],
+            heading=docs[doc_id][3]["heading"],
+            score=round(score, 4),
+            text=docs[doc_id][3]["text"],
+        )
+        for doc_id, score in best
+    ]
+
+
+def invalidate_search_index():
+    """Forca a verificacao das fontes na proxima busca."""
+    global _checked_at
+    _checked_at = 0.0
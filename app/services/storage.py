@@ -0,0 +1,430 @@
+"""Armazenamento dos projetos e do catalogo de DPs: disco local ou S3.
+
+Com STORAGE_BACKEND=local (padrao) os arquivos ficam em SPECS_DIR e
+DP_CATALOG_DIR, como sempre. Com STORAGE_BACKEND=s3 ficam num bucket S3
+ou compativel (MinIO, Ceph, R2...), e varias instancias do app atras de
+um balanceador servem os mesmos projetos.
+
+Chaves sao caminhos relativos com "/" (ex.: "pac-man/ESPEC.md"). Toda
+escrita e atomica e devolve o ETag novo; com `if_match` so grava se o
+ETag atual for o informado, com `if_none_match` so se o objeto ainda nao
+existir, e senao levanta PreconditionFailed.
+
+No S3, as leituras passam por um cache em disco local (STORAGE_CACHE_DIR)
+revalidado com GET condicional: o corpo so trafega quando o objeto mudou.
+"""
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+
+try:
+    import fcntl
+except ImportError:  # Windows: so o lock entre threads
+    fcntl = None
+
+from app.core.config import (
+    DP_CATALOG_DIR,
+    S3_BUCKET,
+    S3_ENDPOINT_URL,
+    S3_PREFIX,
+    S3_REGION,
+    SPECS_DIR,
+    STORAGE_BACKEND,
+    STORAGE_CACHE_DIR,
+)
+
+NAMESPACES = {"specs": SPECS_DIR, "dp_catalog": DP_CATALOG_DIR}
+_LOCK_FILE = ".storage.lock"
+
+
+class PreconditionFailed(Exception):
+    """Escrita condicional recusada: o objeto mudou desde a leitura."""
+
+
+@dataclass
+class ObjectStat:
+    key: str
+    size: int
+    mtime: float
+    etag: str
+
+
+def _check_key(key: str) -> str:
+    parts = PurePosixPath(key).parts
+    if not parts or ".." in parts or key.startswith("/"):
+        raise ValueError(f"Chave invalida: {key}")
+    return key
+
+
+def _atomic_write(path: Path, data: bytes) -> os.stat_result:
+    """Grava num temporario e troca com os.replace; devolve o stat do novo."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return st
+
+
+class Storage:
+    """Interface comum aos backends."""
+
+    def stat(self, key: str) -> ObjectStat | None:
+        raise NotImplementedError
+
+    def read(self, key: str) -> tuple[bytes, ObjectStat] | None:
+        raise NotImplementedError
+
+    def write(
+        self,
+        key: str,
+        data: bytes,
+        if_match: str | None = None,
+        if_none_match: bool = False,
+    ) -> ObjectStat:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def list_objects(self, prefix: str = "") -> list[ObjectStat]:
+        """Objetos sob `prefix` ("" ou terminado em "/"), recursivamente."""
+        raise NotImplementedError
+
+    def list_dirs(self, prefix: str = "") -> list[str]:
+        """Nomes do primeiro nivel abaixo de `prefix` (os "diretorios")."""
+        raise NotImplementedError
+
+    def forget(self, key: str) -> None:
+        """Descarta a copia local de `key`, se houver."""
+
+    def read_text(self, key: str) -> str:
+        result = self.read(key)
+        return result[0].decode("utf-8") if result else ""
+
+
+# ── Disco local ──────────────────────────────────────────────────────
+
+
+class LocalStorage(Storage):
+    """Arquivos sob `root`; o ETag vem de mtime e tamanho.
+
+    As escritas sao serializadas por um flock em `root`, entao a checagem
+    do ETag e a troca do arquivo sao atomicas tambem entre processos do
+    mesmo host (ou de hosts que montam o mesmo volume com lock).
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / _check_key(key)
+
+    @staticmethod
+    def _etag(st: os.stat_result) -> str:
+        return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+    def _to_stat(self, key: str, st: os.stat_result) -> ObjectStat:
+        return ObjectStat(key, st.st_size, st.st_mtime, self._etag(st))
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / _LOCK_FILE, "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                yield  # fechar o arquivo libera o flock
+
+    def stat(self, key: str) -> ObjectStat | None:
+        try:
+            st = self._path(key).stat()
+        except OSError:
+            return None
+        return self._to_stat(key, st)
+
+    def read(self, key: str) -> tuple[bytes, ObjectStat] | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                # stat do mesmo inode que foi lido, mesmo se trocarem o arquivo
+                st = os.fstat(f.fileno())
+                data = f.read()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+        return data, self._to_stat(key, st)
+
+    def write(
+        self,
+        key: str,
+        data: bytes,
+        if_match: str | None = None,
+        if_none_match: bool = False,
+    ) -> ObjectStat:
+        path = self._path(key)
+        with self._locked():
+            if if_match is not None or if_none_match:
+                current = self.stat(key)
+                if if_none_match and current is not None:
+                    raise PreconditionFailed(f"{key} ja existe.")
+                if if_match is not None and (
+                    current is None or current.etag != if_match
+                ):
+                    raise PreconditionFailed(f"{key} mudou desde a leitura.")
+            return self._to_stat(key, _atomic_write(path, data))
+
+    def delete(self, key: str) -> None:
+        with self._locked():
+            self._path(key).unlink(missing_ok=True)
+
+    def _visible(self, name: str) -> bool:
+        # temporarios de _atomic_write e o arquivo de lock
+        return name != _LOCK_FILE and not (
+            name.startswith(".") and name.endswith(".tmp")
+        )
+
+    def list_objects(self, prefix: str = "") -> list[ObjectStat]:
+        base = self.root / prefix if prefix else self.root
+        stats = []
+        for dirpath, _, filenames in os.walk(base):
+            relative = Path(dirpath).relative_to(self.root).as_posix()
+            for name in filenames:
+                if not self._visible(name):
+                    continue
+                key = name if relative == "." else f"{relative}/{name}"
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                stats.append(self._to_stat(key, st))
+        return stats
+
+    def list_dirs(self, prefix: str = "") -> list[str]:
+        base = self.root / prefix if prefix else self.root
+        try:
+            with os.scandir(base) as entries:
+                return [e.name for e in entries if e.is_dir()]
+        except OSError:
+            return []
+
+
+# ── S3 (ou compativel) ───────────────────────────────────────────────
+
+
+class S3Storage(Storage):
+    """Objetos em `bucket` sob `prefix`, com cache local das leituras.
+
+    Escritas condicionais usam If-Match/If-None-Match do PutObject, que o
+    S3 e os compativeis mais comuns (MinIO, por exemplo) aplicam no
+    servidor: entre dois nos gravando ao mesmo tempo, so um vence.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str,
+        cache_dir: Path,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+    ):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        import boto3
+                    except ImportError:
+                        raise RuntimeError(
+                            "STORAGE_BACKEND=s3 requer o pacote boto3."
+                        )
+                    self._client = boto3.client(
+                        "s3",
+                        endpoint_url=self.endpoint_url,
+                        region_name=self.region,
+                    )
+        return self._client
+
+    @staticmethod
+    def _code(error) -> str:
+        return str(error.response.get("Error", {}).get("Code", ""))
+
+    def _key(self, key: str) -> str:
+        return self.prefix + _check_key(key)
+
+    # Cache local: um arquivo por chave, com ETag e mtime na primeira linha
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def _cache_get(self, key: str) -> tuple[bytes, ObjectStat] | None:
+        try:
+            raw = self._cache_path(key).read_bytes()
+        except OSError:
+            return None
+        header, _, data = raw.partition(b"\n")
+        etag, _, mtime = header.decode("ascii").partition("\t")
+        return data, ObjectStat(key, len(data), float(mtime), etag)
+
+    def _cache_put(self, st: ObjectStat, data: bytes):
+        header = f"{st.etag}\t{st.mtime}\n".encode("ascii")
+        _atomic_write(self._cache_path(st.key), header + data)
+
+    def _cache_drop(self, key: str):
+        self._cache_path(key).unlink(missing_ok=True)
+
+    def stat(self, key: str) -> ObjectStat | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._code(e) in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return ObjectStat(
+            key, head["ContentLength"], head["LastModified"].timestamp(),
+            head["ETag"],
+        )
+
+    def read(self, key: str) -> tuple[bytes, ObjectStat] | None:
+        from botocore.exceptions import ClientError
+
+        s3_key = self._key(key)
+        cached = self._cache_get(key)
+        kwargs = {"IfNoneMatch": cached[1].etag} if cached else {}
+        try:
+            obj = self.client.get_object(
+                Bucket=self.bucket, Key=s3_key, **kwargs
+            )
+        except ClientError as e:
+            code = self._code(e)
+            if code in ("304", "NotModified") and cached:
+                return cached
+            if code in ("404", "NoSuchKey", "NotFound"):
+                self._cache_drop(key)
+                return None
+            raise
+        data = obj["Body"].read()
+        st = ObjectStat(
+            key, len(data), obj["LastModified"].timestamp(), obj["ETag"]
+        )
+        self._cache_put(st, data)
+        return data, st
+
+    def write(
+        self,
+        key: str,
+        data: bytes,
+        if_match: str | None = None,
+        if_none_match: bool = False,
+    ) -> ObjectStat:
+        from botocore.exceptions import ClientError
+
+        kwargs = {}
+        if if_match is not None:
+            kwargs["IfMatch"] = if_match
+        if if_none_match:
+            kwargs["IfNoneMatch"] = "*"
+        try:
+            result = self.client.put_object(
+                Bucket=self.bucket, Key=self._key(key), Body=data, **kwargs
+            )
+        except ClientError as e:
+            if self._code(e) in (
+                "PreconditionFailed", "412", "ConditionalRequestConflict",
+            ):
+                raise PreconditionFailed(f"{key} mudou desde a leitura.")
+            if self._code(e) in ("NoSuchKey", "404") and if_match is not None:
+                raise PreconditionFailed(f"{key} nao existe mais.")
+            raise
+        # o PutObject nao devolve o LastModified; a hora local basta aqui
+        st = ObjectStat(key, len(data), time.time(), result["ETag"])
+        self._cache_put(st, data)
+        return st
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        self._cache_drop(key)
+
+    def forget(self, key: str) -> None:
+        self._cache_drop(_check_key(key))
+
+    def list_objects(self, prefix: str = "") -> list[ObjectStat]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        stats = []
+        for page in paginator.paginate(
+            Bucket=self.bucket, Prefix=self.prefix + prefix
+        ):
+            for obj in page.get("Contents", []):
+                stats.append(ObjectStat(
+                    obj["Key"][len(self.prefix):], obj["Size"],
+                    obj["LastModified"].timestamp(), obj["ETag"],
+                ))
+        return stats
+
+    def list_dirs(self, prefix: str = "") -> list[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        start = len(self.prefix + prefix)
+        names = []
+        for page in paginator.paginate(
+            Bucket=self.bucket, Prefix=self.prefix + prefix, Delimiter="/"
+        ):
+            for common in page.get("CommonPrefixes", []):
+                names.append(common["Prefix"][start:].rstrip("/"))
+        return names
+
+
+# ── Instancias por namespace ─────────────────────────────────────────
+
+_storages: dict[str, Storage] = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(namespace: str) -> Storage:
+    """Backend de `namespace` ("specs" ou "dp_catalog"), criado uma vez."""
+    if namespace not in NAMESPACES:
+        raise ValueError(f"Namespace desconhecido: {namespace}")
+    storage = _storages.get(namespace)
+    if storage is not None:
+        return storage
+    with _storages_lock:
+        if namespace not in _storages:
+            if STORAGE_BACKEND == "s3":
+                if not S3_BUCKET:
+                    raise RuntimeError("STORAGE_BACKEND=s3 requer S3_BUCKET.")
+                base = S3_PREFIX.strip("/")
+                _storages[namespace] = S3Storage(
+                    S3_BUCKET,
+                    f"{base}/{namespace}/" if base else f"{namespace}/",
+                    STORAGE_CACHE_DIR / namespace,
+                    endpoint_url=S3_ENDPOINT_URL,
+                    region=S3_REGION,
+                )
+            elif STORAGE_BACKEND == "local":
+                _storages[namespace] = LocalStorage(NAMESPACES[namespace])
+            else:
+                raise RuntimeError(
+                    f"STORAGE_BACKEND invalido: {STORAGE_BACKEND} (local ou s3)"
+                )
+        return _storages[namespace]
@@ -0,0 +1,100 @@
+import re
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_TASK_ID = re.compile(r"\bT\d{3,}\b")
+_TASK_TITLE = re.compile(
+    r"^(?:\*\*)?(?:ID:\s*)?(T\d{3,})(?:\*\*)?\s*[-–—:.]?\s*(.*)$"
+)
+_DEPS_LINE = re.compile(r"depend[eê]ncias", re.IGNORECASE)
+
+
+def parse_tasks(tasks_md: str) -> list[dict]:
+    """Extrai as tarefas T001..Tnnn do TASKS.md.
+
+    Cada tarefa comeca em um heading com o ID (ex.: `#### T001 - Titulo`)
+    e termina no proximo heading de tarefa ou em um heading de nivel igual
+    ou superior. Retorna dicts com `id`, `title`, `body` e `depends_on`.
+    """
+    tasks = []
+    current = None
+    for line in tasks_md.splitlines():
+        heading = _HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            title = _TASK_TITLE.match(heading.group(2).strip())
+            if title:
+                current = {
+                    "id": title.group(1),
+                    "title": title.group(2).strip(" *"),
+                    "level": level,
+                    "lines": [],
+                }
+                tasks.append(current)
+                continue
+            if current and level <= current["level"]:
+                current = None
+        if current is not None:
+            current["lines"].append(line)
+
+    parsed = []
+    seen = set()
+    for task in tasks:
+        if task["id"] in seen:
+            continue
+        seen.add(task["id"])
+        body = "\n".join(task["lines"]).strip()
+        body = re.sub(r"(?:\n-{3,}\s*)+$", "", body).strip()
+        parsed.append({
+            "id": task["id"],
+            "title": task["title"],
+            "body": body,
+            "depends_on": _parse_dependencies(task["lines"], task["id"]),
+        })
+
+    known = {t["id"] for t in parsed}
+    for task in parsed:
+        task["depends_on"] = [d for d in task["depends_on"] if d in known]
+    return parsed
+
+
+def _parse_dependencies(lines: list[str], task_id: str) -> list[str]:
+    deps = []
+    for line in lines:
+        if _DEPS_LINE.search(line):
+            for dep in _TASK_ID.findall(line):
+                if dep != task_id and dep not in deps:
+                    deps.append(dep)
+    return deps
+
+
+def topological_order(tasks: list[dict]) -> list[dict]:
+    """Ordena as tarefas respeitando as dependencias (ValueError se houver ciclo)."""
+    by_id = {t["id"]: t for t in tasks}
+    state: dict[str, int] = {}
+    ordered = []
+
+    def visit(task_id: str, path: list[str]):
+        if state.get(task_id) == 2:
+            return
+        if state.get(task_id) == 1:
+            cycle = " -> ".join(path[path.index(task_id):] + [task_id])
+            raise ValueError(f"Dependencia circular no TASKS.md: {cycle}")
+        state[task_id] = 1
+        for dep in by_id[task_id]["depends_on"]:
+            visit(dep, path + [task_id])
+        state[task_id] = 2
+        ordered.append(by_id[task_id])
+
+    for task in tasks:
+        visit(task["id"], [])
+    return ordered
+
+
+def critical_path_length(tasks: list[dict]) -> int:
+    """Numero de tarefas no caminho mais longo do DAG."""
+    depth: dict[str, int] = {}
+    for task in topological_order(tasks):
+        depth[task["id"]] = 1 + max(
+            (depth[d] for d in task["depends_on"]), default=0
+        )
+    return max(depth.values(), default=0)
@@ -1,14 +1,62 @@
+import hashlib
 import io
-import zipfile
+import os
 import re
+import time
+import uuid
+import zipfile
 from pathlib import Path
-from app.services.project_service import get_project_dir, read_file_safe
+from typing import Iterable, Iterator
 
+from app.core.config import CACHE_DIR
+from app.core.metrics import ZIP_BUILD, ZIP_BYTES, ZIP_CACHE
+from app.services.project_service import read_artifact, get_artifact_meta
 
-def _parse_implementation_files(impl_content: str) -> list[dict]:
+
+_FENCE_OPEN = re.compile(r"^ {0,3}(`{3,}|~{3,})([^`]*)$")
+_PATH_TAIL = re.compile(r"\.\w+$")
+
+
+def _header_path(line: str) -> str | None:
+    """Reconhece `### Arquivo: caminho.ext` ou `**caminho.ext**`.
+
+    Retorna o caminho ou None se a linha nao for um cabecalho.
+    """
+    stripped = line.strip()
+    if stripped.startswith("#"):
+        text = stripped.lstrip("#")
+        if len(stripped) - len(text) > 6:
+            return None
+    elif stripped.endswith("**") and len(stripped) > 4:
+        opening = stripped.rfind("**", 0, len(stripped) - 2)
+        if opening < 0:
+            return None
+        text = stripped[opening + 2:-2]
+        if "*" in text:
+            return None
+    else:
+        return None
+
+    text = text.strip()
+    if text[:8].lower() == "arquivo:":
+        text = text[8:].strip()
+    if text[:1] in "`\"":
+        text = text[1:]
+    if text[-1:] in "`\"":
+        text = text[:-1]
+    text = text.strip()
+    if not text or "`" in text or '"' in text or not _PATH_TAIL.search(text):
+        return None
+    return text
+
+
+def iter_implementation_files(
+    impl_content: str | Iterable[str],
+) -> Iterator[dict]:
     """Extrai arquivos de codigo do IMPLEMENTATION.md gerado pelo agente.
 
-    Busca blocos no formato:
+    Tokenizador de uma passada, por linha, que emite cada arquivo assim que
+    o bloco fecha. Reconhece blocos no formato:
         ### Arquivo: caminho/do/arquivo.py
         ```python
         conteudo aqui
@@ -18,70 +66,212 @@ def _parse_implementation_files(impl_content: str) -> list[dict]:
         ```
         conteudo aqui
         ```
+    Um bloco so fecha com uma linha de cercas do mesmo caractere e pelo
+    menos o mesmo comprimento, entao cercas mais longas (````) podem conter
+    ``` aninhados. Blocos sem fechamento sao descartados. Caminhos
+    repetidos saem uma vez por bloco; `_parse_implementation_files` junta
+    as repeticoes.
     """
-    files = []
-
-    # Padrao 1: ### Arquivo: path ou ### path
-    pattern1 = re.compile(
-        r'#{1,4}\s*(?:Arquivo:\s*)?[`"]?([^\n`"]+\.\w+)[`"]?\s*\n'
-        r'```[\w]*\n(.*?)```',
-        re.DOTALL,
+    lines = (
+        io.StringIO(impl_content) if isinstance(impl_content, str)
+        else impl_content
     )
-    for match in pattern1.finditer(impl_content):
-        filepath = match.group(1).strip()
-        content = match.group(2)
-        files.append({"path": filepath, "content": content})
-
-    # Padrao 2: **path** seguido de ```
-    pattern2 = re.compile(
-        r'\*\*([^\n*]+\.\w+)\*\*\s*\n```[\w]*\n(.*?)```',
-        re.DOTALL,
+    pending = None
+    fence = None
+    body: list[str] = []
+
+    for line in lines:
+        if fence is not None:
+            stripped = line.strip()
+            if (
+                stripped.startswith(fence)
+                and stripped == fence[0] * len(stripped)
+            ):
+                if pending:
+                    yield {"path": pending, "content": "".join(body)}
+                fence, pending, body = None, None, []
+            else:
+                body.append(line)
+            continue
+
+        opening = _FENCE_OPEN.match(line.rstrip("\r\n"))
+        if opening:
+            fence = opening.group(1)
+            continue
+        if not line.strip():
+            continue
+        pending = _header_path(line)
+
+
+def _parse_implementation_files(impl_content: str) -> list[dict]:
+    """Um arquivo por caminho, em qualquer estilo de cabecalho.
+
+    O ultimo bloco de um caminho vence, na posicao do primeiro: o ZIP nao
+    pode ter entradas repetidas.
+    """
+    files: dict[str, str] = {}
+    for f in iter_implementation_files(impl_content):
+        files[f["path"]] = f["content"]
+    return [
+        {"path": path, "content": content} for path, content in files.items()
+    ]
+
+
+ZIP_CACHE_DIR = CACHE_DIR / "zips"
+ZIP_LAYOUT_VERSION = "3"
+_CHUNK_SIZE = 64 * 1024
+_ZIP_ARTIFACTS = ("ESPEC.md", "DP.md", "TASKS.md", "IMPLEMENTATION.md")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino nao-seekable: o zipfile grava com data descriptors e os
+    bytes ficam acumulados ate o proximo `drain`."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _read_artifacts(project_name: str) -> dict[str, str]:
+    """Le cada artefato uma vez: o ZIP e a chave do cache saem do mesmo texto."""
+    return {name: read_artifact(project_name, name) for name in _ZIP_ARTIFACTS}
+
+
+def _zip_entries(
+    project_name: str, artifacts: dict[str, str]
+) -> Iterator[tuple[str, str]]:
+    root = project_name
+
+    # Adiciona artefatos .md do spec-driven flow
+    for md_file in _ZIP_ARTIFACTS:
+        content = artifacts[md_file]
+        if content:
+            yield f"{root}/docs/{md_file}", content
+
+    # Parseia IMPLEMENTATION.md e gera arquivos de codigo
+    impl_content = artifacts["IMPLEMENTATION.md"]
+    if impl_content:
+        parsed_any = False
+        for f in _parse_implementation_files(impl_content):
+            parsed_any = True
+            filepath = f["path"].lstrip("/").lstrip("\\")
+            yield f"{root}/src/{filepath}", f["content"]
+
+        if not parsed_any:
+            # Se nao encontrou blocos parseados, coloca o raw como referencia
+            yield f"{root}/src/IMPLEMENTATION_RAW.md", impl_content
+
+    # Gera README basico no ZIP
+    readme = (
+        f"# {project_name}\n\n"
+        f"Projeto gerado pelo lemmAIngs - Spec-Driven Development\n\n"
+        f"## Estrutura\n\n"
+        f"- `docs/` - Artefatos do spec-driven flow (ESPEC, DP, TASKS)\n"
+        f"- `src/` - Codigo-fonte gerado\n"
     )
-    for match in pattern2.finditer(impl_content):
-        filepath = match.group(1).strip()
-        content = match.group(2)
-        seen = {f["path"] for f in files}
-        if filepath not in seen:
-            files.append({"path": filepath, "content": content})
+    yield f"{root}/README.md", readme
+
+
+def _iter_zip_chunks(
+    project_name: str, artifacts: dict[str, str]
+) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for arcname, content in _zip_entries(project_name, artifacts):
+            data = content.encode("utf-8")
+            with zf.open(arcname, "w") as entry:
+                for offset in range(0, len(data), _CHUNK_SIZE):
+                    entry.write(data[offset:offset + _CHUNK_SIZE])
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _zip_cache_path(project_name: str, digests: list[str]) -> Path:
+    """Caminho do ZIP em cache, derivado dos hashes dos artefatos."""
+    project_key = hashlib.sha256(project_name.encode("utf-8")).hexdigest()[:16]
+    content_key = hashlib.sha256(
+        "|".join([ZIP_LAYOUT_VERSION, project_name] + digests).encode("utf-8")
+    ).hexdigest()[:32]
+    return ZIP_CACHE_DIR / project_key / f"{content_key}.zip"
+
 
-    return files
+def get_cached_zip(project_name: str) -> Path | None:
+    digests = []
+    for name in _ZIP_ARTIFACTS:
+        meta = get_artifact_meta(project_name, name)
+        digests.append(meta.sha256 if meta.exists else "-")
+    path = _zip_cache_path(project_name, digests)
+    hit = path.exists()
+    ZIP_CACHE.inc(result="hit" if hit else "miss")
+    return path if hit else None
+
+
+def iter_project_zip(project_name: str) -> Iterator[bytes]:
+    """Gera o ZIP do projeto em chunks, gravando uma copia no cache.
+
+    A copia so e publicada (rename atomico) se o ZIP for gerado por
+    inteiro; versoes anteriores do mesmo projeto sao removidas. A chave vem
+    do texto que entrou no ZIP, entao um PUT no meio da geracao nao deixa
+    conteudo velho sob a chave nova (nem o contrario).
+    """
+    artifacts = _read_artifacts(project_name)
+    target = _zip_cache_path(project_name, [
+        hashlib.sha256(artifacts[name].encode("utf-8")).hexdigest()
+        if artifacts[name] else "-"
+        for name in _ZIP_ARTIFACTS
+    ])
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    completed = False
+    # Conta so o tempo gerando os chunks, nao a espera pelo cliente
+    elapsed = 0.0
+    size = 0
+    try:
+        with open(tmp_path, "wb") as tmp:
+            chunks = _iter_zip_chunks(project_name, artifacts)
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                elapsed += time.perf_counter() - start
+                if chunk is None:
+                    break
+                tmp.write(chunk)
+                size += len(chunk)
+                yield chunk
+        os.replace(tmp_path, target)
+        completed = True
+        ZIP_BUILD.observe(elapsed)
+        ZIP_BYTES.inc(size)
+    finally:
+        if not completed:
+            tmp_path.unlink(missing_ok=True)
+    for old in target.parent.glob("*.zip"):
+        if old != target:
+            old.unlink(missing_ok=True)
 
 
 def build_project_zip(project_name: str) -> io.BytesIO:
     """Gera um ZIP com todos os artefatos e arquivos de codigo do projeto."""
-    project_dir = get_project_dir(project_name)
-
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        root = project_name
-
-        # Adiciona artefatos .md do spec-driven flow
-        for md_file in ("ESPEC.md", "DP.md", "TASKS.md", "IMPLEMENTATION.md"):
-            content = read_file_safe(project_dir / md_file)
-            if content:
-                zf.writestr(f"{root}/docs/{md_file}", content)
-
-        # Parseia IMPLEMENTATION.md e gera arquivos de codigo
-        impl_content = read_file_safe(project_dir / "IMPLEMENTATION.md")
-        if impl_content:
-            parsed_files = _parse_implementation_files(impl_content)
-            for f in parsed_files:
-                filepath = f["path"].lstrip("/").lstrip("\\")
-                zf.writestr(f"{root}/src/{filepath}", f["content"])
-
-            if not parsed_files:
-                # Se nao encontrou blocos parseados, coloca o raw como referencia
-                zf.writestr(f"{root}/src/IMPLEMENTATION_RAW.md", impl_content)
-
-        # Gera README basico no ZIP
-        readme = (
-            f"# {project_name}\n\n"
-            f"Projeto gerado pelo lemmAIngs - Spec-Driven Development\n\n"
-            f"## Estrutura\n\n"
-            f"- `docs/` - Artefatos do spec-driven flow (ESPEC, DP, TASKS)\n"
-            f"- `src/` - Codigo-fonte gerado\n"
-        )
-        zf.writestr(f"{root}/README.md", readme)
-
+    artifacts = _read_artifacts(project_name)
+    buffer = io.BytesIO(b"".join(_iter_zip_chunks(project_name, artifacts)))
     buffer.seek(0)
     return buffer
@@ -0,0 +1,66 @@
+"""Gera specs de varios projetos de uma vez, sem passar pela API HTTP.
+
+O arquivo de entrada e um JSON com uma lista de projetos (ou JSONL, um
+por linha), com os mesmos campos de POST /api/pipeline:
+
+    [{"project_name": "billing", "description": "...", "stack": "FastAPI"}]
+
+Uso:
+    python batch.py projetos.json --concurrency 4 --tpm 200000
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from app.agents.llm_registry import aclose_llm_clients, set_tokens_per_minute
+from app.agents.pipeline import aclose_pipeline
+from app.models.schemas import PipelineRequest
+from app.services.batch_service import iter_batch
+
+
+def load_projects(path: Path) -> list[PipelineRequest]:
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        items = json.loads(text)
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [PipelineRequest.model_validate(item) for item in items]
+
+
+async def main(args: argparse.Namespace) -> int:
+    projects = load_projects(args.input)
+    if args.tpm is not None:
+        set_tokens_per_minute(args.tpm)
+    output = args.output.open("w", encoding="utf-8") if args.output else None
+    failures = 0
+    try:
+        async for result in iter_batch(projects, args.concurrency):
+            line = result.model_dump_json()
+            print(line, flush=True)
+            if output:
+                output.write(line + "\n")
+            failures += result.status != "done"
+    finally:
+        if output:
+            output.close()
+        await aclose_pipeline()
+        await aclose_llm_clients()
+    print(
+        f"{len(projects) - failures}/{len(projects)} projetos concluidos",
+        file=sys.stderr,
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path)
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="projetos em andamento ao mesmo tempo")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="cota de tokens por minuto do provedor")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="grava os resultados em JSONL")
+    sys.exit(asyncio.run(main(parser.parse_args())))
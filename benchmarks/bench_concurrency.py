@@ -0,0 +1,93 @@
+"""Benchmark de concorrencia das fases com um LLM falso local.
+
+Dispara N chamadas simultaneas a /api/specify contra o app em processo e
+mede o tempo total e a latencia de /health durante a carga. Com o caminho
+assincrono, o tempo total deve ficar proximo da latencia de uma unica
+chamada, independente de N.
+
+Uso:
+    python -m benchmarks.bench_concurrency
+    python -m benchmarks.bench_concurrency --blocking   # simula o caminho antigo
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Tudo que o app grava (specs, caches, catalogo) fica no diretorio temporario
+_TMP = tempfile.mkdtemp(prefix="lemmaing-bench-")
+os.environ.setdefault("SPECS_DIR", os.path.join(_TMP, "specs"))
+os.environ.setdefault("CACHE_DIR", os.path.join(_TMP, "cache"))
+os.environ.setdefault("DP_CATALOG_DIR", os.path.join(_TMP, "dp_catalog"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from benchmarks.fake_llm import install_fake_llm  # noqa: E402
+
+
+async def _probe_health(client: httpx.AsyncClient, stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        worst = max(worst, time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    return worst
+
+
+async def _run_level(
+    client: httpx.AsyncClient, level: int
+) -> tuple[float, float]:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_health(client, stop))
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/api/specify", json={
+            "project_name": f"bench-{level}-{i}",
+            "description": f"Projeto de benchmark {i}",
+        })
+        for i in range(level)
+    ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst_health = await probe
+    for r in responses:
+        r.raise_for_status()
+    return elapsed, worst_health
+
+
+async def main(args: argparse.Namespace):
+    install_fake_llm(
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        blocking=args.blocking,
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        print(
+            f"{'concorrencia':>12} {'total (s)':>10} {'req/s':>8} "
+            f"{'/health max (ms)':>17}"
+        )
+        for level in args.levels:
+            elapsed, worst = await _run_level(client, level)
+            print(
+                f"{level:>12} {elapsed:>10.2f} {level / elapsed:>8.1f} "
+                f"{worst * 1000:>17.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--output-tokens", type=int, default=100)
+    parser.add_argument("--blocking", action="store_true")
+    asyncio.run(main(parser.parse_args()))
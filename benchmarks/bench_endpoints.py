@@ -0,0 +1,279 @@
+"""Benchmark por endpoint com um LLM falso local e o projeto pac-man.
+
+Roda o app em processo (com o lifespan) sobre diretorios temporarios,
+copia `specs/pac-man` como fixture e mede, para cada endpoint, latencia
+p50/p99, vazao e pico de memoria alocada. O LLM falso tem latencia ate o
+primeiro token, taxa de tokens e tamanho de saida configuraveis, entao
+os numeros medem o overhead do app, nao o provedor.
+
+Com --save, grava os resultados em JSON; com --baseline, compara com um
+resultado salvo e sai com codigo 1 se algum p50 piorar mais que
+--max-regression (ex.: 0.2 = 20%).
+
+Uso:
+    python -m benchmarks.bench_endpoints
+    python -m benchmarks.bench_endpoints --only plan download --requests 50
+    python -m benchmarks.bench_endpoints --save base.json
+    python -m benchmarks.bench_endpoints --baseline base.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+_ROOT = Path(__file__).resolve().parent.parent
+_TMP = Path(tempfile.mkdtemp(prefix="lemmaing-bench-"))
+os.environ["SPECS_DIR"] = str(_TMP / "specs")
+os.environ["CACHE_DIR"] = str(_TMP / "cache")
+os.environ["DP_CATALOG_DIR"] = str(_TMP / "dp_catalog")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, str(_ROOT))
+
+import httpx  # noqa: E402
+
+from app.core.config import SPECS_DIR  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.zip_service import ZIP_CACHE_DIR  # noqa: E402
+from benchmarks.fake_llm import install_fake_llm  # noqa: E402
+
+FIXTURE = _ROOT / "specs" / "pac-man"
+PROJECT = "pac-man"          # intocado: leitura e download
+WORK_PROJECT = "bench-work"  # recebe as escritas das fases
+
+
+@dataclass
+class Scenario:
+    name: str
+    send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+    prepare: Callable[[], None] | None = None  # antes de cada requisicao
+    sequential: bool = False
+
+
+@dataclass
+class Result:
+    name: str
+    requests: int
+    p50_ms: float
+    p99_ms: float
+    rps: float
+    peak_kib: float
+
+
+def _restore_work_project():
+    target = SPECS_DIR / WORK_PROJECT
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(FIXTURE, target)
+
+
+def _clear_zip_cache():
+    shutil.rmtree(ZIP_CACHE_DIR, ignore_errors=True)
+
+
+def _sample_docx() -> bytes:
+    from docx import Document
+
+    fixture_dp = (FIXTURE / "DP.md").read_text(encoding="utf-8")
+    doc = Document()
+    for line in fixture_dp.splitlines():
+        if line.startswith("#"):
+            doc.add_heading(line.lstrip("# "), level=min(line.count("#"), 3))
+        elif line.strip():
+            doc.add_paragraph(line)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+async def _wait_ingest(client: httpx.AsyncClient, job_id: str):
+    while True:
+        job = (await client.get(f"/api/dp-catalog/jobs/{job_id}")).json()
+        if job["status"] in ("done", "error"):
+            return
+        await asyncio.sleep(0.01)
+
+
+def build_scenarios() -> list[Scenario]:
+    docx = _sample_docx()
+    phase_body = {
+        "specify": {"description": (FIXTURE / "ESPEC.md").read_text(
+            encoding="utf-8")[:2000]},
+        "plan": {"stack": "Python + Pygame"},
+        "tasks": {},
+        "implement": {},
+    }
+
+    def phase(name: str, **extra) -> Callable:
+        async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+            return await client.post(f"/api/{name}", json={
+                "project_name": WORK_PROJECT,
+                "bypass_cache": True,
+                **phase_body[name],
+                **extra,
+            })
+        return send
+
+    async def projects(client, i):
+        return await client.get("/api/projects")
+
+    async def download(client, i):
+        return await client.get(f"/api/projects/{PROJECT}/download")
+
+    async def upload(client, i):
+        response = await client.post(
+            "/api/dp-catalog/upload",
+            files={"file": (f"dp-{i}.docx", docx)},
+            data={"name": f"Benchmark {i}"},
+        )
+        # o upload so responde 202; espera a extracao para nao acumular
+        # jobs entre medicoes
+        await _wait_ingest(client, response.json()["job_id"])
+        return response
+
+    return [
+        Scenario("specify", phase("specify")),
+        Scenario("plan", phase("plan")),
+        Scenario("tasks", phase("tasks")),
+        Scenario("implement", phase("implement")),
+        Scenario("implement-parallel", phase("implement", parallel=True)),
+        Scenario("projects", projects),
+        Scenario("download", download),
+        Scenario("download-cold", download, prepare=_clear_zip_cache,
+                 sequential=True),
+        Scenario("dp-upload", upload),
+    ]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _timed(client, scenario: Scenario, i: int) -> float:
+    if scenario.prepare:
+        scenario.prepare()
+    start = time.perf_counter()
+    response = await scenario.send(client, i)
+    response.raise_for_status()
+    await response.aread()
+    return time.perf_counter() - start
+
+
+async def _run_batch(client, scenario: Scenario, total: int,
+                     concurrency: int) -> tuple[list[float], float]:
+    limit = asyncio.Semaphore(1 if scenario.sequential else concurrency)
+
+    async def one(i: int) -> float:
+        async with limit:
+            return await _timed(client, scenario, i)
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(total)))
+    return list(latencies), time.perf_counter() - start
+
+
+async def run_scenario(client, scenario: Scenario,
+                       args: argparse.Namespace) -> Result:
+    _restore_work_project()
+    await _run_batch(client, scenario, args.warmup, args.concurrency)
+
+    latencies, elapsed = await _run_batch(
+        client, scenario, args.requests, args.concurrency
+    )
+
+    # Memoria numa rodada a parte: o tracemalloc deixa tudo mais lento
+    tracemalloc.start()
+    await _run_batch(client, scenario, args.memory_requests, args.concurrency)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(
+        name=scenario.name,
+        requests=len(latencies),
+        p50_ms=statistics.median(latencies) * 1000,
+        p99_ms=_percentile(latencies, 0.99) * 1000,
+        rps=len(latencies) / elapsed,
+        peak_kib=peak / 1024,
+    )
+
+
+def compare(results: list[Result], baseline: dict, max_regression: float) -> bool:
+    ok = True
+    for result in results:
+        base = baseline.get(result.name)
+        if not base:
+            continue
+        change = result.p50_ms / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+        flag = "REGRESSAO" if change > max_regression else ""
+        ok = ok and not flag
+        print(f"{result.name:>20} p50 {base['p50_ms']:.1f} -> "
+              f"{result.p50_ms:.1f} ms ({change:+.0%}) {flag}")
+    return ok
+
+
+async def main(args: argparse.Namespace) -> int:
+    install_fake_llm(
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+    )
+    shutil.copytree(FIXTURE, SPECS_DIR / PROJECT, dirs_exist_ok=True)
+    scenarios = [
+        s for s in build_scenarios() if not args.only or s.name in args.only
+    ]
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        print(f"{'endpoint':>20} {'n':>5} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+              f"{'req/s':>8} {'pico (KiB)':>11}")
+        for scenario in scenarios:
+            result = await run_scenario(client, scenario, args)
+            results.append(result)
+            print(f"{result.name:>20} {result.requests:>5} "
+                  f"{result.p50_ms:>9.1f} {result.p99_ms:>9.1f} "
+                  f"{result.rps:>8.1f} {result.peak_kib:>11.0f}")
+
+    if args.save:
+        args.save.write_text(json.dumps(
+            {r.name: asdict(r) for r in results}, indent=2
+        ), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", default=None,
+                        help="roda so os endpoints listados")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--memory-requests", type=int, default=4)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--save", type=Path, default=None,
+                        help="grava os resultados em JSON")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="JSON salvo com --save para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    try:
+        code = asyncio.run(main(parser.parse_args()))
+    finally:
+        shutil.rmtree(_TMP, ignore_errors=True)
+    sys.exit(code)
@@ -0,0 +1,108 @@
+"""Micro-benchmark: ChatOpenAI novo por chamada x registro compartilhado.
+
+Sobe um servidor local que imita /v1/chat/completions e mede o custo
+medio por chamada e o numero de conexoes novas abertas nos dois modos.
+Como o stub e HTTP puro, a diferenca medida e a construcao do cliente
+(e a conexao TCP, nas versoes do langchain-openai que nao compartilham
+o cliente HTTP padrao); contra a API real soma-se o handshake TLS de
+cada conexao nova.
+
+Uso:
+    python -m benchmarks.bench_llm_client --calls 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{_server.server_port}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langchain_openai import ChatOpenAI  # noqa: E402
+
+from app.agents.llm_registry import get_llm, aclose_llm_clients  # noqa: E402
+from app.core.config import MODEL_NAME, OPENAI_API_KEY, OPENAI_BASE_URL  # noqa: E402
+
+_COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": MODEL_NAME,
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "ok"},
+        "finish_reason": "stop",
+    }],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode("utf-8")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        _StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_COMPLETION)))
+        self.end_headers()
+        self.wfile.write(_COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def _per_call_llm() -> ChatOpenAI:
+    """Comportamento antigo do `_get_llm`: um cliente novo a cada chamada."""
+    return ChatOpenAI(
+        model=MODEL_NAME,
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        temperature=0.3,
+    )
+
+
+async def _measure(factory, calls: int) -> tuple[float, int]:
+    messages = [HumanMessage(content="ping")]
+    await factory().ainvoke(messages)  # aquecimento
+    _StubHandler.connections = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        await factory().ainvoke(messages)
+    elapsed = time.perf_counter() - start
+    return elapsed / calls * 1000, _StubHandler.connections
+
+
+async def main(calls: int):
+    _server.RequestHandlerClass = _StubHandler
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    try:
+        per_call_ms, per_call_conns = await _measure(_per_call_llm, calls)
+        shared_ms, shared_conns = await _measure(get_llm, calls)
+    finally:
+        await aclose_llm_clients()
+        _server.shutdown()
+
+    print(f"{'modo':<22} {'ms/chamada':>10} {'conexoes':>9}")
+    print(f"{'cliente por chamada':<22} {per_call_ms:>10.2f} {per_call_conns:>9}")
+    print(f"{'registro compartilhado':<22} {shared_ms:>10.2f} {shared_conns:>9}")
+    print(f"economia por chamada: {per_call_ms - shared_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    asyncio.run(main(parser.parse_args().calls))
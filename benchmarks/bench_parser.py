@@ -0,0 +1,90 @@
+"""Benchmark do parser de IMPLEMENTATION.md em documentos sinteticos grandes.
+
+Compara o tokenizador de uma passada (`iter_implementation_files`) com a
+implementacao antiga baseada em duas regex DOTALL, inclusive no caso
+patologico de um bloco sem cerca de fechamento.
+
+Uso:
+    python -m benchmarks.bench_parser --files 2000 --lines 60
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.zip_service import iter_implementation_files  # noqa: E402
+
+
+def legacy_parse(impl_content: str) -> list[dict]:
+    """Parser anterior, mantido aqui apenas como linha de base."""
+    files = []
+    pattern1 = re.compile(
+        r'#{1,4}\s*(?:Arquivo:\s*)?[`"]?([^\n`"]+\.\w+)[`"]?\s*\n'
+        r'```[\w]*\n(.*?)```',
+        re.DOTALL,
+    )
+    for match in pattern1.finditer(impl_content):
+        filepath = match.group(1).strip()
+        files.append({"path": filepath, "content": match.group(2)})
+    pattern2 = re.compile(
+        r'\*\*([^\n*]+\.\w+)\*\*\s*\n```[\w]*\n(.*?)```',
+        re.DOTALL,
+    )
+    for match in pattern2.finditer(impl_content):
+        filepath = match.group(1).strip()
+        seen = {f["path"] for f in files}
+        if filepath not in seen:
+            files.append({"path": filepath, "content": match.group(2)})
+    return files
+
+
+def synthetic_document(files: int, lines: int, unterminated: bool) -> str:
+    parts = ["# IMPLEMENTATION.md\n\nCodigo gerado.\n\n"]
+    for i in range(files):
+        if i % 2:
+            header = f"### Arquivo: src/mod_{i}.py"
+        else:
+            header = f"**src/mod_{i}.py**"
+        body = "".join(
+            f"def func_{i}_{j}(x):\n    return x * {j}  # comentario\n"
+            for j in range(lines // 2)
+        )
+        parts.append(
+            f"{header}\n```python\n{body}```\n\nNotas da tarefa {i}.\n\n"
+        )
+    if unterminated:
+        parts.append("### Arquivo: src/truncado.py\n```python\n")
+        parts.append("x = 1\n" * (files * lines // 4))
+    return "".join(parts)
+
+
+def _time(fn, doc: str) -> tuple[float, int]:
+    start = time.perf_counter()
+    count = sum(1 for _ in fn(doc))
+    return time.perf_counter() - start, count
+
+
+def main(args: argparse.Namespace):
+    print(
+        f"{'documento':<24} {'MB':>6} {'legado (s)':>11} {'novo (s)':>9} "
+        f"{'arquivos':>9}"
+    )
+    for unterminated in (False, True):
+        doc = synthetic_document(args.files, args.lines, unterminated)
+        legacy_s, legacy_n = _time(legacy_parse, doc)
+        new_s, new_n = _time(iter_implementation_files, doc)
+        label = "com bloco sem fechamento" if unterminated else "bem formado"
+        print(
+            f"{label:<24} {len(doc) / 1e6:>6.1f} {legacy_s:>11.3f} "
+            f"{new_s:>9.3f} {legacy_n:>4}/{new_n:<4}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=60)
+    main(parser.parse_args())
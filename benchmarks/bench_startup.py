@@ -0,0 +1,125 @@
+"""Orcamento de tempo de import e de partida a frio do app.
+
+Em processos Python novos (sem cache de modulos), mede:
+- o import de `app.main`, pelo `-X importtime`;
+- o tempo ate a primeira resposta de /health, com o lifespan.
+
+E confere que nenhuma dependencia pesada (LangChain, LangGraph, OpenAI,
+PyPDF2, python-docx) foi importada so por importar o app: elas entram na
+primeira chamada que precisa delas.
+
+Sai com codigo 1 se a mediana do import passar de --budget-ms ou se
+algum modulo pesado aparecer. Serve como teste de regressao no CI.
+
+Uso:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 500 --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = (
+    "langchain_core",
+    "langchain_openai",
+    "langgraph",
+    "openai",
+    "PyPDF2",
+    "docx",
+)
+
+_COLD_START = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import httpx
+from app.main import app
+imported = time.perf_counter()
+
+async def first_request():
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        (await client.get("/health")).raise_for_status()
+        return time.perf_counter()
+
+ready = asyncio.run(first_request())
+print(json.dumps({
+    "import_s": imported - start,
+    "ready_s": ready - start,
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def _env(tmp: Path) -> dict:
+    return {
+        **os.environ,
+        "SPECS_DIR": str(tmp / "specs"),
+        "CACHE_DIR": str(tmp / "cache"),
+        "DP_CATALOG_DIR": str(tmp / "dp_catalog"),
+        "LOG_LEVEL": "WARNING",
+        "APP_WARMUP": "false",
+        "PYTHONPATH": str(_ROOT),
+    }
+
+
+def import_time_ms(env: dict) -> float:
+    """Tempo cumulativo do import de app.main, em ms, pelo -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    for line in proc.stderr.splitlines():
+        fields = [f.strip() for f in line.split("|")]
+        if len(fields) == 3 and fields[2] == "app.main":
+            return int(fields[1]) / 1000
+    raise RuntimeError("app.main nao apareceu na saida do -X importtime")
+
+
+def cold_start(env: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", _COLD_START % (HEAVY_MODULES,)],
+        cwd=_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="lemmaing-startup-") as tmp:
+        env = _env(Path(tmp))
+        import_time_ms(env)  # aquece o cache de bytecode (.pyc)
+        imports = [import_time_ms(env) for _ in range(args.runs)]
+        starts = [cold_start(env) for _ in range(args.runs)]
+
+    import_ms = statistics.median(imports)
+    ready_ms = statistics.median(s["ready_s"] for s in starts) * 1000
+    heavy = sorted({m for s in starts for m in s["heavy"]})
+    print(f"import app.main: {import_ms:.0f} ms (mediana de {args.runs}, "
+          f"orcamento {args.budget_ms:.0f} ms)")
+    print(f"primeira resposta de /health: {ready_ms:.0f} ms")
+    print(f"modulos pesados carregados: {', '.join(heavy) or 'nenhum'}")
+
+    ok = True
+    if import_ms > args.budget_ms:
+        print("FALHA: import acima do orcamento")
+        ok = False
+    if heavy:
+        print("FALHA: dependencias pesadas importadas no import do app")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=600.0,
+                        help="mediana maxima do import de app.main")
+    sys.exit(main(parser.parse_args()))
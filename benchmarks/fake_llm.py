@@ -0,0 +1,102 @@
+"""LLM falso e deterministico para benchmarks offline.
+
+Simula a latencia de um provedor real (tempo ate o primeiro token e taxa
+de tokens por segundo) sem rede e sem custo. Gera sempre o mesmo texto
+para a mesma entrada.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    first_token_latency: float = 0.2
+    tokens_per_second: float = 200.0
+    output_tokens: int = 100
+    blocking: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        seed = hashlib.sha256(
+            "".join(str(m.content) for m in messages).encode("utf-8")
+        ).hexdigest()
+        return [
+            f"tok{seed[i % len(seed)]}{i} " for i in range(self.output_tokens)
+        ]
+
+    def _usage(self, messages: list[BaseMessage]) -> dict:
+        prompt = sum(len(str(m.content)) for m in messages) // 4
+        return {
+            "input_tokens": prompt,
+            "output_tokens": self.output_tokens,
+            "total_tokens": prompt + self.output_tokens,
+        }
+
+    def _total_delay(self) -> float:
+        return (
+            self.first_token_latency
+            + self.output_tokens / self.tokens_per_second
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._total_delay())
+        text = "".join(self._tokens(messages))
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(
+                content=text, usage_metadata=self._usage(messages)
+            ))]
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.blocking:
+            # Simula o comportamento antigo (chamada sincrona no event loop)
+            return self._generate(messages, stop=stop, **kwargs)
+        await asyncio.sleep(self._total_delay())
+        text = "".join(self._tokens(messages))
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(
+                content=text, usage_metadata=self._usage(messages)
+            ))]
+        )
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for token in self._tokens(messages):
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(messages)
+        ))
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for token in self._tokens(messages):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(messages)
+        ))
+
+
+def install_fake_llm(**params: Any) -> FakeChatModel:
+    """Substitui `_get_llm` do spec_agent pelo modelo falso."""
+    from app.agents import spec_agent
+
+    model = FakeChatModel(**params)
+    spec_agent._get_llm = lambda *args, **kwargs: model
+    return model
@@ -0,0 +1,131 @@
+"""Entrada de producao: varios workers, preload, desligamento gracioso e reciclagem.
+
+Com gunicorn instalado, o app e importado e aquecido (LangChain, grafo
+compilado) no processo mestre e os workers UvicornWorker nascem por fork
+ja com tudo carregado. Sem gunicorn (ex.: Windows), usa o supervisor do
+uvicorn: cada worker importa o app sozinho e aquece em segundo plano
+(APP_WARMUP).
+
+Nos dois casos, SIGTERM para de aceitar conexoes, espera as requisicoes
+abertas (inclusive streams SSE) por SHUTDOWN_GRACE_SECONDS e depois os
+jobs em segundo plano pelo mesmo prazo; cada worker e substituido por
+outro apos WEB_MAX_REQUESTS requisicoes.
+
+Cada worker tem o seu pool de extracao de PDF/DOCX, com DP_INGEST_WORKERS
+processos (padrao: CPUs / WEB_WORKERS). Ao mudar --workers, ajuste
+DP_INGEST_WORKERS junto (ou passe WEB_WORKERS no ambiente) para os pools
+somados nao disputarem mais CPUs do que o host tem. O status dos uploads
+e dos jobs fica em SQLite no CACHE_DIR, visivel de qualquer worker.
+
+Para desenvolvimento, com reload, use run.py.
+
+Uso:
+    python serve.py
+    python serve.py --workers 8 --max-requests 2000 --grace 120
+"""
+import argparse
+import logging
+import os
+
+import uvicorn
+
+from app.core.config import (
+    APP_HOST,
+    APP_PORT,
+    LOG_LEVEL,
+    SHUTDOWN_GRACE_SECONDS,
+    WEB_MAX_REQUESTS,
+    WEB_MAX_REQUESTS_JITTER,
+    WEB_WORKERS,
+)
+
+logger = logging.getLogger("serve")
+
+
+def serve_gunicorn(args: argparse.Namespace) -> None:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        # sem isso o uvicorn espera as conexoes para sempre e o gunicorn
+        # mata o worker antes do lifespan devolver os jobs para a fila
+        CONFIG_KWARGS = {
+            **UvicornWorker.CONFIG_KWARGS,
+            "timeout_graceful_shutdown": args.grace,
+        }
+
+    class Application(BaseApplication):
+        def load_config(self):
+            # requisicoes e depois jobs, cada um com o prazo, mais uma folga
+            deadline = int(2 * args.grace) + 5
+            for key, value in {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": Worker,
+                "preload_app": True,
+                "max_requests": args.max_requests,
+                "max_requests_jitter": args.max_requests_jitter,
+                "graceful_timeout": deadline,
+                # o heartbeat para durante o desligamento
+                "timeout": max(30, deadline),
+                "loglevel": LOG_LEVEL.lower(),
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # preload: roda no mestre, antes do fork
+            from app.agents.spec_agent import warm_up
+            from app.main import app
+
+            warm_up()
+            return app
+
+    Application().run()
+
+
+def serve_uvicorn(args: argparse.Namespace) -> None:
+    # lido pelos workers, que sao processos novos (spawn)
+    os.environ.setdefault("APP_WARMUP", "true")
+    max_requests = args.max_requests
+    if args.workers == 1 and max_requests:
+        # sem supervisor, o processo sairia e ninguem subiria outro
+        logger.warning("reciclagem desligada: precisa de --workers > 1")
+        max_requests = 0
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        limit_max_requests=max_requests or None,
+        timeout_graceful_shutdown=args.grace,
+        log_level=LOG_LEVEL.lower(),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=APP_HOST)
+    parser.add_argument("--port", type=int, default=APP_PORT)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--max-requests", type=int, default=WEB_MAX_REQUESTS,
+                        help="recicla o worker apos N requisicoes (0 = nunca)")
+    parser.add_argument("--max-requests-jitter", type=int,
+                        default=WEB_MAX_REQUESTS_JITTER,
+                        help="variacao aleatoria, para os workers nao "
+                             "reciclarem juntos (so gunicorn)")
+    parser.add_argument("--grace", type=float, default=SHUTDOWN_GRACE_SECONDS,
+                        help="segundos para terminar o que esta em andamento")
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL)
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        logger.info("gunicorn nao instalado; usando o supervisor do uvicorn")
+        serve_uvicorn(args)
+    else:
+        serve_gunicorn(args)
+
+
+if __name__ == "__main__":
+    main()